@@ -1,54 +1,80 @@
 """
 Concierge repository projects management CLI.
 """
-from gitlab import GitlabGetError
+from gitlab import GitlabGetError, GitlabUpdateError
+from gitlab.v4.objects import ProjectMergeRequest
 
 from .constants import GITLAB_PERMISSION_NAMES, GITLAB_PERMISSIONS
+from .records import Membership
 
 
 class Project:
     """
     Adapter wrapping a project from a repository service API
     """
+    __slots__ = ('api', 'project_id', 'name', 'topic_list')
 
     def __init__(self, api, project):
         """A GitLab API project, currently."""
-        self.group_project = project
+        self.api = api
+        self.project_id = project.id
         self.name = project.attributes['path_with_namespace']
         self.topic_list = project.attributes['tag_list']
-        self.topic_count = len(self.topic_list)
-        self.api = api
-
-        # a full-featured project (a group project has limited features)
-        self.project = self.api.projects.get(self.group_project.id, lazy=True)
 
-    def show_topics(self):
-        """Display the project name and project topics"""
-        if self.topic_count:
-            print(f"{self.topic_count} topics in {self.name}: "
-                  f"{str(self.topic_list)[1:-1]}")
-        else:
-            print(f"{self.name}")
+    @classmethod
+    def from_record(cls, api, record):
+        """A project restored from a record, without any API call"""
+        project = cls.__new__(cls)
+        project.api = api
+        project.project_id = record['id']
+        project.name = record['name']
+        project.topic_list = record['topics']
+        return project
+
+    def to_record(self):
+        """The project's data as a plain (JSON) record"""
+        return {'id': self.project_id, 'name': self.name,
+                'topics': self.topic_list}
+
+    @property
+    def topic_count(self):
+        """Number of topics on the project"""
+        return len(self.topic_list)
+
+    @property
+    def project(self):
+        """A full-featured project (a group project has limited features),
+        created only when needed for an API call"""
+        return self.api.projects.get(self.project_id, lazy=True)
 
     def set_topics(self, new_topics):
-        """Update the project topics"""
-        if self.topic_count:
-            print(f"Replacing topics on {self.name}: "
-                  f"{self.topic_list} -> {new_topics}")
-        else:
-            print(f"Setting new topics on {self.name}: {new_topics}")
-
-        self.project.tag_list = new_topics
-        self.project.save()
-
-        self.topic_list = new_topics
-        self.topic_count = len(new_topics)
-
-    def get_mergerequests(self, state='opened', labels=(), wip='no'):
-        """Return a list of the project's merge requests"""
+        """Update the project topics, and check the topics GitLab returns
+        (if any) without fetching the project again"""
+        project = self.project
+        project.tag_list = new_topics
+        project.save()
+
+        saved_topics = getattr(project, 'tag_list', new_topics)
+        if topic_set(saved_topics) != topic_set(new_topics):
+            raise GitlabUpdateError(f"Topics of {self.name} are"
+                                    f" {saved_topics} after the update")
+
+        self.topic_list = stored_topics(saved_topics)
+
+    def get_mergerequests(self, state='opened', labels=(), wip='no',
+                          **filters):
+        """Return a list of the project's merge requests, optionally
+        filtered further (e.g. by ``iids`` or ``source_branch``)"""
         return self.project.mergerequests.list(state=state,
                                                labels=labels,
-                                               wip=wip)
+                                               wip=wip,
+                                               **filters)
+
+    def bind_mergerequest(self, merge_request):
+        """Turn a merge request listed outside of the project into one of
+        the project's merge requests, without fetching it again"""
+        return ProjectMergeRequest(self.project.mergerequests,
+                                   merge_request.attributes)
 
     def __str__(self):
         """Project name and its namespace"""
@@ -59,57 +85,113 @@ class GroupMembership:
     """
     Adapter wrapping a group from a repository service API
     """
+    __slots__ = ('api', 'group_id', 'full_path', 'user_id', 'username',
+                 'access_level')
 
-    def __init__(self, group, user):
+    def __init__(self, api, group, user):
         """A GitLab API group, currently."""
-        self.group = group
-        self.user = user
+        self.api = api
+        self.group_id = group.id
+        self.full_path = group.full_path
+        self.user_id = user.id
+        self.username = user.username
         try:
-            self.member = self.group.members.get(self.user.id)
+            member = group.members.get(self.user_id)
         except GitlabGetError as err:
             if err.response_code != 404:
                 raise
-            self.member = None
-            self.is_member = False
             self.access_level = None
         else:
-            self.is_member = True
-            self.access_level = \
-                GITLAB_PERMISSION_NAMES[self.member.access_level]
-
-    def set_membership(self, permission_name):
-        """Update the user's permissions on the group"""
-        new_access_level = GITLAB_PERMISSIONS[permission_name]
-
+            self.access_level = GITLAB_PERMISSION_NAMES[member.access_level]
+
+    @classmethod
+    def from_record(cls, api, record):
+        """A group membership restored from a record, without any API call"""
+        group_user = cls.__new__(cls)
+        group_user.api = api
+        group_user.group_id = record['id']
+        group_user.full_path = record['name']
+        group_user.user_id = record['user_id']
+        group_user.username = record['username']
+        group_user.access_level = record['access_level']
+        return group_user
+
+    def to_record(self):
+        """The group membership's data as a plain (JSON) record"""
+        return {'id': self.group_id, 'name': self.full_path,
+                'user_id': self.user_id, 'username': self.username,
+                'access_level': self.access_level}
+
+    @property
+    def is_member(self):
+        """Whether the user is a member of the group"""
+        return self.access_level is not None
+
+    @property
+    def group(self):
+        """A group API object, created only when needed for an API call"""
+        return self.api.groups.get(self.group_id, lazy=True)
+
+    def change(self, permission_name):
+        """Description of the change setting the user's permissions on the
+        group takes, or None if they are set already"""
         if self.is_member:
             if permission_name == self.access_level:
-                return
+                return None
+            return (f"Group {self.full_path}: "
+                    f"Updating access level: '{self.access_level}' "
+                    f"-> '{permission_name}'")
+
+        if permission_name == GITLAB_PERMISSION_NAMES[None]:
+            return None
+        return (f"Group {self.full_path}: "
+                f"Adding {self.username} "
+                f"with access level '{permission_name}'")
 
-            print(f"Group {self.group.full_path}: "
-                  f"Updating access level: '{self.access_level}' "
-                  f"-> '{permission_name}'")
+    def set_membership(self, permission_name):
+        """Update the user's permissions on the group. Returns the
+        description of the change made, if any"""
+        change = self.change(permission_name)
+        if change is None:
+            return None
 
+        new_access_level = GITLAB_PERMISSIONS[permission_name]
+        if self.is_member:
             if permission_name == GITLAB_PERMISSION_NAMES[None]:
-                self.member.delete()
+                self.group.members.delete(self.user_id)
             else:
-                self.member.access_level = new_access_level
-                self.member.save()
+                self.group.members.update(self.user_id, {
+                    'access_level': new_access_level,
+                })
 
         else:
-            print(f"Group {self.group.full_path}: "
-                  f"Adding {self.user.username} "
-                  f"with access level '{permission_name}'")
-
             self.group.members.create({
-                'user_id': self.user.id,
+                'user_id': self.user_id,
                 'access_level': new_access_level,
             })
 
+        self.access_level = None \
+            if permission_name == GITLAB_PERMISSION_NAMES[None] \
+            else permission_name
+        return change
+
     def __str__(self):
         """Textual information about the group membership"""
-        access_level = \
-            f"has access level '{self.access_level}'" \
-            if self.is_member else 'is not a member.'
+        return str(Membership.from_membership(self))
+
+
+def stored_topics(topics):
+    """Topics as GitLab stores them, in order: without blanks, empty and
+    repeated topics (regardless of case, the first spelling is kept)"""
+    stored = {}
+    for topic in topics:
+        topic = (topic or '').strip()
+        if topic:
+            stored.setdefault(topic.casefold(), topic)
+    return list(stored.values())
+
 
-        return f"Group {self.group.full_path}: " \
-               f"{self.user.username} {access_level}"
+def topic_set(topics):
+    """Topics as GitLab stores them, for comparing: GitLab looks topics up
+    regardless of case, and keeps the spelling of an existing topic"""
+    return {topic.casefold() for topic in stored_topics(topics)}
@@ -0,0 +1,195 @@
+"""
+Recording of HTTP exchanges with GitLab into cassette files, and replay of
+cassettes through a local server, for deterministic performance tests.
+"""
+import json
+import re
+import sys
+
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from threading import Lock, Thread
+from time import monotonic, sleep
+from urllib.parse import parse_qsl, urlencode, urlparse
+
+RECORDED_HEADERS = [
+    'Content-Type',
+    'Link',
+    'X-Next-Page',
+    'X-Page',
+    'X-Per-Page',
+    'X-Prev-Page',
+    'X-Total',
+    'X-Total-Pages',
+]
+SCRUBBED = '[scrubbed]'
+SECRET_NAME = re.compile(r'token|password|secret', re.IGNORECASE)
+
+
+def request_key(method, url):
+    """
+    The method and the path of a request with its (sorted) query, without
+    secrets. Requests with the same key get the same responses on replay.
+    """
+    url = urlparse(url)
+    query = sorted((name, SCRUBBED if SECRET_NAME.search(name) else value)
+                   for name, value
+                   in parse_qsl(url.query, keep_blank_values=True))
+    return f"{method.upper()} {url.path}" + \
+        (f"?{urlencode(query)}" if query else '')
+
+
+def scrub(data):
+    """Replace the values of secret fields in JSON data."""
+    if isinstance(data, dict):
+        return {name: SCRUBBED if SECRET_NAME.search(name) else scrub(value)
+                for name, value in data.items()}
+    if isinstance(data, list):
+        return [scrub(value) for value in data]
+    return data
+
+
+class Recorder:
+    """
+    Records the HTTP exchanges of a python-gitlab client: the requests
+    made, and the responses with their status, pagination headers, body
+    and the time they took. Tokens are scrubbed, links are made relative.
+    """
+
+    def __init__(self):
+        """An empty recording."""
+        self.interactions = []
+        self.lock = Lock()
+
+    def install(self, api):
+        """Record all responses to requests of a python-gitlab client."""
+        if self.record not in api.session.hooks['response']:
+            api.session.hooks['response'].append(self.record)
+
+    def record(self, response, *_, **__):
+        """Record a response and the request it answers."""
+        base = re.escape(f"{urlparse(response.url).scheme}://"
+                         f"{urlparse(response.url).netloc}")
+        headers = {name: re.sub(base, '', response.headers[name])
+                   for name in RECORDED_HEADERS if name in response.headers}
+        try:
+            body = json.dumps(scrub(response.json()))
+        except ValueError:
+            body = response.text
+
+        with self.lock:
+            self.interactions.append({
+                'request': request_key(response.request.method,
+                                       response.request.url),
+                'status': response.status_code,
+                'headers': headers,
+                'body': body,
+                'elapsed': response.elapsed.total_seconds(),
+            })
+
+    def save(self, path):
+        """Write the recording into a cassette file."""
+        with open(path, 'w', encoding='utf-8') as cassette:
+            json.dump({'interactions': self.interactions}, cassette,
+                      indent=1)
+
+
+class ReplayServer(ThreadingMixIn, HTTPServer):
+    """
+    A local HTTP server answering requests with the responses recorded in
+    a cassette, in the order they were recorded (the last one repeats).
+    Responses are delayed by a fixed latency in seconds, by the time they
+    originally took ('original'), or not at all.
+    """
+    daemon_threads = True
+
+    def __init__(self, path, latency=None):
+        """Load a cassette, and listen on a free local port."""
+        with open(path, encoding='utf-8') as cassette:
+            interactions = json.load(cassette)['interactions']
+
+        self.responses = {}
+        for interaction in interactions:
+            self.responses.setdefault(interaction['request'], []) \
+                .append(interaction)
+        self.replayed = {}
+        self.request_count = 0
+        self.unrecorded = []
+        self.latency = latency
+        self.lock = Lock()
+        super().__init__(('127.0.0.1', 0), ReplayHandler)
+
+    @property
+    def uri(self):
+        """The base URI of the server."""
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def __enter__(self):
+        Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+        self.server_close()
+
+    def next_response(self, key):
+        """The next recorded response to a request, or None."""
+        with self.lock:
+            self.request_count += 1
+            responses = self.responses.get(key)
+            if not responses:
+                self.unrecorded.append(key)
+                return None
+            index = self.replayed.get(key, 0)
+            self.replayed[key] = index + 1
+            return responses[min(index, len(responses) - 1)]
+
+    def delay(self, response):
+        """Seconds to wait before sending a response."""
+        if self.latency == 'original':
+            return response['elapsed']
+        return self.latency or 0
+
+    def report(self, started):
+        """
+        Display the number of requests, and the wall time since a start
+        time (see ``time.monotonic()``), on stderr.
+        """
+        print(f"{self.request_count} requests replayed in"
+              f" {monotonic() - started:.2f}s.", file=sys.stderr)
+        for key in self.unrecorded:
+            print(f"Not recorded: {key}", file=sys.stderr)
+
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    """Answers a request to a replay server."""
+    protocol_version = 'HTTP/1.1'
+
+    def replay(self):
+        """Send the recorded response to a request, or a 404 error."""
+        length = int(self.headers.get('Content-Length') or 0)
+        self.rfile.read(length)
+
+        response = self.server.next_response(
+            request_key(self.command, self.path))
+        if response is None:
+            status, headers, body = 404, {}, '{"message": "Not recorded"}'
+        else:
+            sleep(self.server.delay(response))
+            status, headers, body = \
+                response['status'], response['headers'], response['body']
+
+        body = body.encode('utf-8')
+        self.send_response(status)
+        for name, value in headers.items():
+            if name == 'Link':
+                value = value.replace('<', f"<{self.server.uri}")
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST = do_PUT = do_DELETE = replay
+
+    def log_message(self, *_):
+        """Don't log requests."""
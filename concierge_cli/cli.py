@@ -1,15 +1,35 @@
 """
 CLI implementation for Concierge.
 """
+import re
+import shlex
+import sys
+
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from datetime import datetime, timedelta, timezone
+from time import monotonic
+from urllib.parse import urlparse
+
 import click
 
 from gitlab.exceptions import GitlabError
 from requests.exceptions import RequestException
 
-from .constants import GITLAB_DEFAULT_URI, GITLAB_PERMISSIONS
-from .manager import (
-    GroupManager, MergeRequestManager, ProjectManager, TopicManager
+from .cassette import Recorder, ReplayServer
+from .constants import (
+    DEFAULT_WORKERS, GITLAB_DEFAULT_URI, GITLAB_PERMISSIONS, ISO_DATE_FORMATS,
 )
+from .export import ExportManager
+from .journal import Journal
+from .manager import GroupManager, ProjectManager, TopicManager
+from .merging import MergeRequestManager
+from .output import merge_shards, tagged_stdout
+from .progress import Progress
+from .retry import RetryPolicy
+from .session import Session
+from .trace import Tracer
+from .transport import Transport
 
 
 def debug_option(*_, **kwargs):
@@ -30,6 +50,142 @@ def debug_option(*_, **kwargs):
     return click.decorators.option("--debug", **kwargs)
 
 
+def snapshot_option():
+    """
+    Add a ``--from-snapshot`` option to answer queries from a snapshot file.
+    """
+    return click.option('--from-snapshot', 'snapshot', metavar='FILE',
+                        type=click.Path(exists=True, dir_okay=False),
+                        help='Answer the query offline from a snapshot file'
+                             ' (see the export command) instead of GitLab.')
+
+
+def journal_options():
+    """
+    Add ``--journal`` and ``--resume`` options to record the progress of
+    bulk changes, and resume them after an interruption.
+    """
+    def decorator(function):
+        function = click.option(
+            '--resume', metavar='JOURNAL',
+            type=click.Path(exists=True, dir_okay=False),
+            help='Resume the changes recorded in a journal, skipping'
+                 ' completed ones and retrying failed ones.')(function)
+        return click.option(
+            '--journal', metavar='FILE', type=click.Path(dir_okay=False),
+            help='Record what is to be changed, and each change completed'
+                 ' or failed, in a journal file.')(function)
+
+    return decorator
+
+
+def shard_option():
+    """
+    Add a ``--shard`` option to split a run across several jobs.
+    """
+    def parse_shard(ctx, param, value):
+        if value is None:
+            return None
+        try:
+            index, count = (int(number) for number in value.split('/'))
+        except ValueError:
+            raise click.BadParameter('Use INDEX/COUNT, e.g. 2/4.',
+                                     ctx, param) from None
+        if not 1 <= index <= count:
+            raise click.BadParameter(f'No shard {index} of {count}.',
+                                     ctx, param)
+        return index, count
+
+    return click.option('--shard', metavar='INDEX/COUNT',
+                        callback=parse_shard,
+                        help='Work on one of COUNT shards of the groups only,'
+                             ' e.g. $CI_NODE_INDEX/$CI_NODE_TOTAL. Output'
+                             ' lines are tagged for merge-shards.')
+
+
+def subgroups_option():
+    """
+    Add a ``--subgroups`` option to include all groups nested in the groups
+    found.
+    """
+    return click.option('--subgroups', is_flag=True, default=False,
+                        help='Include all subgroups (at any depth) of the'
+                             ' groups found, e.g. to cover a subtree with'
+                             ' "customers/".')
+
+
+def parse_latency(ctx, param, value):
+    """A latency in seconds, 'original', or None."""
+    if value is None or value == 'original':
+        return value
+    try:
+        latency = float(value)
+    except ValueError:
+        latency = -1
+    if latency < 0:
+        raise click.BadParameter('Use a number of seconds or "original".',
+                                 ctx, param)
+    return latency
+
+
+def parse_updated_after(ctx, param, value):
+    """
+    A point in time as an ISO 8601 string, from a date (and time) or an age
+    in days or hours (e.g. 7d, 12h), or None.
+    """
+    if value is None:
+        return None
+    age = re.fullmatch(r'([0-9]+)([dh])', value)
+    if age:
+        unit = 'days' if age.group(2) == 'd' else 'hours'
+        return (datetime.now(timezone.utc) -
+                timedelta(**{unit: int(age.group(1))})).isoformat()
+    for date_format in ISO_DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format).isoformat()
+        except ValueError:
+            pass
+    raise click.BadParameter('Use a date, e.g. 2024-03-01, or an age,'
+                             ' e.g. 7d or 12h.', ctx, param)
+
+
+def estimate_option(changes):
+    """
+    Add an ``--estimate`` option to plan bulk changes before making them.
+    """
+    return click.option('--estimate', is_flag=True, default=False,
+                        help='Only estimate the requests and the time'
+                             f' {changes} takes, and show the plan, from the'
+                             ' first pages of the listings. Nothing is'
+                             ' changed.')
+
+
+def check_listen_options(ctx, watch, webhook_secret, shard):
+    """Refuse options listening for webhook events doesn't work with."""
+    if watch:
+        raise click.UsageError('Use either --watch or --listen, not both.')
+    if not webhook_secret:
+        raise click.UsageError('Listening requires a --webhook-secret, for'
+                               ' accepting events from GitLab only.')
+    if len(ctx.obj.get('uri')) > 1 or shard:
+        raise click.UsageError('Listening works with a single GitLab host,'
+                               ' unsharded, only.')
+
+
+def open_journal(ctx, journal, resume, changing):
+    """A journal for recording bulk changes, if one was requested."""
+    if not journal and not resume:
+        return None
+    if journal and resume:
+        raise click.UsageError('Use either --journal or --resume, not both.')
+    if not changing:
+        raise click.UsageError('A journal records changes only.')
+    if len(ctx.obj.get('uri')) > 1:
+        raise click.UsageError('Journals work with a single GitLab host'
+                               ' only.')
+    return Journal(resume or journal, resume=bool(resume))
+
+
 @click.group()
 @click.version_option()
 @debug_option()
@@ -37,25 +193,208 @@ def concierge_cli():
     """Concierge repository projects management CLI."""
 
 
+@concierge_cli.command('merge-shards')
+@click.argument('outputs', metavar='OUTPUT...', nargs=-1, required=True,
+                type=click.File())
+@debug_option()
+def merge_shards_command(outputs):
+    """
+    Combine the output of a sharded run (see --shard), in the same order
+    a single run produces.
+    """
+    for line in merge_shards(outputs):
+        click.echo(line)
+
+
 @concierge_cli.group()
 @click.pass_context
-@click.option('--uri', envvar='CONCIERGE_GITLAB_URI',
-              default=GITLAB_DEFAULT_URI, show_default=True,
-              help='Location of the GitLab host. Alternatively, you may set'
-                   ' the CONCIERGE_GITLAB_URI environment variable, or'
-                   ' specify a host in a configuration file (see'
+@click.option('--uri', envvar='CONCIERGE_GITLAB_URI', multiple=True,
+              default=[GITLAB_DEFAULT_URI], show_default=True,
+              help='Location of the GitLab host, or the name of a section in'
+                   ' a python-gitlab configuration file (see'
                    ' https://python-gitlab.readthedocs.io > CLI usage >'
-                   ' Configuration > Files).')
+                   ' Configuration > Files). Use multiple times to run the'
+                   ' command against several hosts in parallel.'
+                   ' Alternatively, you may set the CONCIERGE_GITLAB_URI'
+                   ' environment variable (separate several hosts with'
+                   ' spaces).')
 @click.option('--token', envvar='CONCIERGE_GITLAB_TOKEN',
               help='Optional access token (access is anonymous if none is'
                    ' supplied). Alternatively, you may set the'
                    ' CONCIERGE_GITLAB_TOKEN environment variable.')
 @click.option('--insecure', is_flag=True, default=False,
               help='Disable SSL certificate check and related warnings.')
+@click.option('--retries', type=click.IntRange(min=0), default=3,
+              show_default=True,
+              help='Retry API calls failing with a transient error (writes'
+                   ' only when they were certainly not carried out).')
+@click.option('--retry-backoff', type=click.FloatRange(min=0), default=1.0,
+              show_default=True, metavar='SECONDS',
+              help='Maximum wait before the first retry, doubled on each'
+                   ' further retry (randomized).')
+@click.option('--pool-size', type=click.IntRange(min=1),
+              help='Maximum number of connections kept open to the GitLab'
+                   ' host. Defaults to the number of concurrent API calls.')
+@click.option('--keep-alive/--no-keep-alive', default=True, show_default=True,
+              help='Reuse connections for further API calls.')
+@click.option('--compression/--no-compression', default=True,
+              show_default=True,
+              help='Ask for compressed (gzip) responses.')
+@click.option('--connect-timeout', type=click.FloatRange(min=0),
+              default=10.0, show_default=True, metavar='SECONDS',
+              help='Maximum wait for establishing a connection.')
+@click.option('--read-timeout', type=click.FloatRange(min=0),
+              default=60.0, show_default=True, metavar='SECONDS',
+              help='Maximum wait for data of a response.')
+@click.option('--transport-stats', is_flag=True, default=False,
+              help='Show the number of responses, connections and bytes'
+                   ' received (compressed and decoded) per command.')
+@click.option('--record', metavar='CASSETTE',
+              type=click.Path(dir_okay=False),
+              help='Record the HTTP exchanges with GitLab in a cassette file'
+                   ' (with tokens scrubbed).')
+@click.option('--replay', metavar='CASSETTE',
+              type=click.Path(exists=True, dir_okay=False),
+              help='Answer API calls from a cassette file through a local'
+                   ' server instead of GitLab, and show the number of'
+                   ' requests and the time taken.')
+@click.option('--replay-latency', metavar='SECONDS|original',
+              callback=parse_latency,
+              help='Delay replayed responses by some time, or by the time'
+                   ' they originally took.')
+@click.option('--progress', is_flag=True, default=False,
+              help='Show groups and projects scanned, requests per second,'
+                   ' writes done and failed, and the estimated time left on'
+                   ' stderr while a command runs.')
+@click.option('--trace', metavar='FILE', type=click.Path(dir_okay=False),
+              help='Write spans for the command, the listings and checks of'
+                   ' managers, and each HTTP request into a trace file (Chrome'
+                   ' trace event format, e.g. for ui.perfetto.dev).')
 @debug_option()
-def gitlab(ctx, uri, token, insecure):
+def gitlab(ctx, **options):
     """GitLab sub-commands."""
-    ctx.obj = {"uri": uri, "token": token, "insecure": insecure}
+    ctx.obj = dict(
+        options,
+        progress=Progress(sys.stderr) if options['progress'] else None,
+        recorder=Recorder() if options['record'] else None,
+        tracer=Tracer() if options['trace'] else None)
+
+
+def run(ctx, manager_class, method, *args, **kwargs):
+    """
+    Create a manager for each GitLab instance and call one of its methods.
+    Several instances are processed in parallel, with each output line
+    tagged by the instance it belongs to.
+    """
+    uris = [None] if kwargs.get('snapshot') else ctx.obj.get('uri')
+    if kwargs.get('snapshot') and kwargs.get('subgroups'):
+        raise click.UsageError('Subgroups cannot be crawled in a snapshot.')
+    if kwargs.get('shard') and len(uris) > 1:
+        raise click.UsageError('Sharding works with a single GitLab host'
+                               ' only.')
+    if ctx.obj.get('token') and \
+            len([uri for uri in uris if '://' in str(uri)]) > 1:
+        raise click.UsageError('An access token works with a single GitLab'
+                               ' URL only. Use configuration sections for'
+                               ' several hosts.')
+    if (ctx.obj.get('record') or ctx.obj.get('replay')) and len(uris) > 1:
+        raise click.UsageError('Recording and replaying work with a single'
+                               ' GitLab host only.')
+    recorder = None if kwargs.get('snapshot') else ctx.obj.get('recorder')
+    tracer = ctx.obj.get('tracer')
+
+    def run_on(uri):
+        if not tracer:
+            run_manager(uri)
+            return
+        try:
+            with tracer.span(ctx.command_path, 'command',
+                             uri=uri or kwargs.get('snapshot')):
+                run_manager(uri)
+        finally:
+            tracer.save(ctx.obj.get('trace'))
+
+    def run_manager(uri):
+        options = dict(kwargs)
+        if not options.get('snapshot'):
+            options['retry_policy'] = RetryPolicy(
+                retries=ctx.obj.get('retries'),
+                backoff=ctx.obj.get('retry_backoff'))
+            options['session'] = ctx.obj.get('session')
+            options['progress'] = ctx.obj.get('progress')
+            options['transport'] = Transport(
+                pool_size=ctx.obj.get('pool_size'),
+                keep_alive=ctx.obj.get('keep_alive'),
+                compression=ctx.obj.get('compression'),
+                connect_timeout=ctx.obj.get('connect_timeout'),
+                read_timeout=ctx.obj.get('read_timeout'))
+
+        manager = manager_class(uri=uri,
+                                token=ctx.obj.get('token'),
+                                insecure=ctx.obj.get('insecure'),
+                                **options)
+        if recorder:
+            recorder.install(manager.api)
+        if tracer:
+            tracer.instrument(manager)
+            if not options.get('snapshot'):
+                tracer.install(manager.api)
+        try:
+            getattr(manager, method)(*args)
+        finally:
+            manager.report_retries()
+            if ctx.obj.get('transport_stats'):
+                manager.report_transport()
+            if recorder:
+                recorder.save(ctx.obj.get('record'))
+
+    with ExitStack() as stack:
+        if ctx.obj.get('progress') and not kwargs.get('snapshot'):
+            stack.callback(ctx.obj.get('progress').finish)
+        if len(uris) > 1:
+            run_in_parallel(uris, run_on)
+            return
+
+        if kwargs.get('shard'):
+            stack.enter_context(tagged_stdout())
+        if ctx.obj.get('replay') and not kwargs.get('snapshot'):
+            server = stack.enter_context(ReplayServer(
+                ctx.obj.get('replay'), ctx.obj.get('replay_latency')))
+            stack.callback(server.report, monotonic())
+            uris = [server.uri]
+        run_on(uris[0])
+
+
+def run_in_parallel(uris, run_on):
+    """
+    Call ``run_on`` for several GitLab instances in parallel, with each
+    output line tagged by the instance it belongs to.
+    """
+    with tagged_stdout() as output, \
+            ThreadPoolExecutor(max_workers=len(uris)) as executor:
+
+        def run_tagged(uri):
+            output.tag(instance_name(uri))
+            try:
+                run_on(uri)
+            finally:
+                output.flush()
+
+        futures = [executor.submit(run_tagged, uri) for uri in uris]
+
+    errors = []
+    for uri, future in zip(uris, futures):
+        if future.exception():
+            click.echo(f"[{instance_name(uri)}] {future.exception()}",
+                       err=True)
+            errors.append(future.exception())
+    if errors:
+        raise errors[0]
+
+
+def instance_name(uri):
+    """Short name of a GitLab instance, for tagging output."""
+    return urlparse(uri).netloc or uri
 
 
 @gitlab.command()
@@ -66,8 +405,24 @@ def gitlab(ctx, uri, token, insecure):
 @click.option('--set-topic', multiple=True,
               help='Use multiple times to set more than one topic.'
                    ' Use "" to clear topics.')
+@click.option('--update-snapshot', metavar='FILE',
+              type=click.Path(exists=True, dir_okay=False),
+              help='Also update the topics set in a snapshot file.')
+@click.option('--writers', type=click.IntRange(min=1), metavar='COUNT',
+              help='Number of projects to update concurrently when setting'
+                   f' topics. Defaults to {DEFAULT_WORKERS}.')
+@click.option('--stats', is_flag=True, default=False,
+              help='Show topic frequency, topics used together and the'
+                   ' number of projects without topics.')
+@estimate_option('setting topics')
+@journal_options()
+@shard_option()
+@subgroups_option()
+@snapshot_option()
 @debug_option()
-def topics(ctx, group_project_filter, empty, set_topic):
+def topics(ctx, group_project_filter, empty, set_topic, update_snapshot,
+           writers, stats, estimate, journal, resume, shard, subgroups,
+           snapshot):
     """
     List and manage topics on GitLab projects.
 
@@ -80,23 +435,40 @@ def topics(ctx, group_project_filter, empty, set_topic):
 
     - /bar ... filter for projects only, match any group
     """
+    # pylint: disable=too-many-locals
     try:
         group_filter, project_filter = group_project_filter.split('/')
     except ValueError:
         group_filter, project_filter = '', group_project_filter
 
-    topic_manager = TopicManager(
-        uri=ctx.obj.get('uri'),
-        token=ctx.obj.get('token'),
-        insecure=ctx.obj.get('insecure'),
+    if set_topic and snapshot:
+        raise click.UsageError('Topics cannot be set on a snapshot.')
+    if set_topic and stats:
+        raise click.UsageError('Topics cannot be set and counted at once.')
+    if estimate and not set_topic:
+        raise click.UsageError('Estimates are made for setting topics only.')
+    journal = open_journal(ctx, journal, resume,
+                           bool(set_topic) and not estimate)
+
+    if estimate:
+        action = ('estimate', list(set_topic))
+    elif set_topic:
+        action = ('set', list(set_topic))
+    elif stats:
+        action = ('show_stats',)
+    else:
+        action = ('show',)
+
+    run(ctx, TopicManager, *action,
         group_filter=group_filter,
         project_filter=project_filter,
         empty=empty,
-    )
-    if set_topic:
-        topic_manager.set(list(set_topic))
-    else:
-        topic_manager.show()
+        update_snapshot=update_snapshot,
+        writers=writers,
+        journal=journal,
+        shard=shard,
+        subgroups=subgroups,
+        snapshot=snapshot)
 
 
 @gitlab.command()
@@ -104,12 +476,56 @@ def topics(ctx, group_project_filter, empty, set_topic):
 @click.argument('group-project-filter', default='/')
 @click.option('--label', multiple=True,
               help='Use multiple times to filter with more than one label.')
+@click.option('--author', metavar='USERNAME',
+              help='Select MRs opened by a user only, e.g. renovate-bot.')
+@click.option('--target-branch', metavar='BRANCH',
+              help='Select MRs targeting a branch only.')
+@click.option('--source-branch-prefix', metavar='PREFIX', default='',
+              help='Select MRs whose source branch starts with a prefix only,'
+                   ' e.g. renovate/.')
+@click.option('--updated-after', metavar='DATE|AGE',
+              callback=parse_updated_after,
+              help='Select MRs updated after a date (and time), or within an'
+                   ' age, e.g. 2024-03-01 or 7d (days) or 12h (hours).')
+@click.option('--draft/--no-draft', default=None,
+              help='Select draft MRs (or non-draft MRs) only. Draft MRs are'
+                   ' left out by default.')
 @click.option('--merge', default='no', show_default=True,
               type=click.Choice(['yes', 'no', 'automatic']),
               help='Merge all identified merge requests. With "yes", will '
-                   'ask for confirmation interactively on each MR.')
+                   'show a table of mergeable MRs to select from.')
+@click.option('--when-pipeline-succeeds', is_flag=True, default=False,
+              help='Let GitLab merge MRs with a running pipeline as soon as'
+                   ' the pipeline succeeds.')
+@click.option('--watch', type=click.IntRange(min=1), metavar='INTERVAL',
+              help='Keep polling for updated merge requests every INTERVAL'
+                   ' seconds, and merge them as soon as they become eligible.')
+@click.option('--queue', is_flag=True, default=False,
+              help='With --merge automatic, merge the MRs of a project and'
+                   ' target branch one after another, rebasing the remaining'
+                   ' ones after each merge and waiting for their pipelines.')
+@click.option('--queue-timeout', type=click.FloatRange(min=0), default=3600,
+              show_default=True, metavar='SECONDS',
+              help='Maximum wait for a queued MR to become eligible.')
+@click.option('--listen', type=click.IntRange(min=0, max=65535),
+              metavar='PORT',
+              help='Receive GitLab webhook events (merge request and pipeline'
+                   ' events) on PORT, and merge the merge requests affected'
+                   ' as soon as they become eligible. Requires a webhook'
+                   ' secret.')
+@click.option('--webhook-secret', envvar='CONCIERGE_WEBHOOK_SECRET',
+              help='Accept webhook events with this secret token only.'
+                   ' Alternatively, you may set the CONCIERGE_WEBHOOK_SECRET'
+                   ' environment variable.')
+@journal_options()
+@shard_option()
+@subgroups_option()
+@snapshot_option()
 @debug_option()
-def mrs(ctx, group_project_filter, label, merge):
+def mrs(ctx, group_project_filter, label, author, target_branch,
+        source_branch_prefix, updated_after, draft, merge,
+        when_pipeline_succeeds, queue, queue_timeout, watch, listen,
+        webhook_secret, journal, resume, shard, subgroups, snapshot):
     """
     List and manage merge requests of GitLab projects.
 
@@ -122,24 +538,63 @@ def mrs(ctx, group_project_filter, label, merge):
 
     - /bar ... filter for projects only, match any group
     """
+    # pylint: disable=too-many-locals
     try:
         group_filter, project_filter = group_project_filter.split('/')
     except ValueError:
         group_filter, project_filter = '', group_project_filter
 
-    mr_manager = MergeRequestManager(
-        uri=ctx.obj.get('uri'),
-        token=ctx.obj.get('token'),
-        insecure=ctx.obj.get('insecure'),
+    filters = {name: value for name, value in [
+        ('author_username', author),
+        ('target_branch', target_branch),
+        ('updated_after', updated_after),
+        ('wip', None if draft is None else 'yes' if draft else 'no'),
+    ] if value is not None}
+
+    if snapshot and (merge != 'no' or watch or listen is not None):
+        raise click.UsageError('Merge requests in a snapshot cannot be'
+                               ' merged or watched.')
+    if snapshot and (filters or source_branch_prefix):
+        raise click.UsageError('Merge requests in a snapshot cannot be'
+                               ' filtered by author, branch, age or draft'
+                               ' state.')
+    if queue and (merge != 'automatic' or when_pipeline_succeeds or watch
+                  or listen is not None):
+        raise click.UsageError('Merge queues work with --merge automatic'
+                               ' only, without --when-pipeline-succeeds,'
+                               ' --watch or --listen.')
+    if listen is not None:
+        check_listen_options(ctx, watch, webhook_secret, shard)
+    if merge == 'yes' and len(ctx.obj.get('uri')) > 1:
+        raise click.UsageError('Interactive merging works with a single'
+                               ' GitLab host only.')
+    if merge == 'yes' and shard:
+        raise click.UsageError('Interactive merging cannot be sharded.')
+    journal = open_journal(ctx, journal, resume,
+                           merge != 'no' and not watch and listen is None)
+
+    if watch:
+        action = ('watch', watch)
+    elif listen is not None:
+        action = ('listen', listen, webhook_secret)
+    elif merge in ['yes', 'automatic']:
+        action = ('merge_all',)
+    else:
+        action = ('show',)
+
+    run(ctx, MergeRequestManager, *action,
         group_filter=group_filter,
         project_filter=project_filter,
         labels=list(label),
+        filters=filters,
+        source_branch_prefix=source_branch_prefix,
         merge_style=merge,
-    )
-    if merge in ['yes', 'automatic']:
-        mr_manager.merge_all()
-    else:
-        mr_manager.show()
+        when_pipeline_succeeds=when_pipeline_succeeds,
+        queue_timeout=queue_timeout if queue else None,
+        journal=journal,
+        shard=shard,
+        subgroups=subgroups,
+        snapshot=snapshot)
 
 
 @gitlab.command()
@@ -147,8 +602,10 @@ def mrs(ctx, group_project_filter, label, merge):
 @click.argument('group-project-filter', default='/')
 @click.option('--topic', multiple=True,
               help='Use multiple times to filter with more than one topic.')
+@subgroups_option()
+@snapshot_option()
 @debug_option()
-def projects(ctx, group_project_filter, topic):
+def projects(ctx, group_project_filter, topic, subgroups, snapshot):
     """
     List projects on GitLab, optionally by topic, ignoring archived ones.
 
@@ -166,15 +623,12 @@ def projects(ctx, group_project_filter, topic):
     except ValueError:
         group_filter, project_filter = '', group_project_filter
 
-    project_manager = ProjectManager(
-        uri=ctx.obj.get('uri'),
-        token=ctx.obj.get('token'),
-        insecure=ctx.obj.get('insecure'),
+    run(ctx, ProjectManager, 'show',
         group_filter=group_filter,
         project_filter=project_filter,
         topic_list=list(topic),
-    )
-    project_manager.show()
+        subgroups=subgroups,
+        snapshot=snapshot)
 
 
 @gitlab.command()
@@ -187,23 +641,99 @@ def projects(ctx, group_project_filter, topic):
 @click.option('--set-permission',
               type=click.Choice(GITLAB_PERMISSIONS.keys()),
               help='Set user permission level on all matching groups.')
+@estimate_option('setting the permission level')
+@journal_options()
+@shard_option()
+@subgroups_option()
+@snapshot_option()
 @debug_option()
-def groups(ctx, username, group_filter, member, set_permission):
+def groups(ctx, username, group_filter, member, set_permission, estimate,
+           journal, resume, shard, subgroups, snapshot):
     """
     Manage the access level for a user on GitLab groups.
     """
-    group_manager = GroupManager(
-        uri=ctx.obj.get('uri'),
-        token=ctx.obj.get('token'),
-        insecure=ctx.obj.get('insecure'),
+    if set_permission and snapshot:
+        raise click.UsageError('Permissions cannot be set on a snapshot.')
+    if estimate and not set_permission:
+        raise click.UsageError('Estimates are made for setting permissions'
+                               ' only.')
+    journal = open_journal(ctx, journal, resume,
+                           bool(set_permission) and not estimate)
+
+    if estimate:
+        action = ('estimate', set_permission)
+    elif set_permission:
+        action = ('set', set_permission)
+    else:
+        action = ('show',)
+
+    run(ctx, GroupManager, *action,
         group_filter=group_filter,
         is_member=member,
         username=username,
-    )
-    if set_permission:
-        group_manager.set(set_permission)
-    else:
-        group_manager.show()
+        journal=journal,
+        shard=shard,
+        subgroups=subgroups,
+        snapshot=snapshot)
+
+
+@gitlab.command()
+@click.pass_context
+@click.argument('snapshot-file', type=click.Path(dir_okay=False))
+@click.argument('group-project-filter', default='/')
+@debug_option()
+def export(ctx, snapshot_file, group_project_filter):
+    """
+    Export an inventory of GitLab into an SQLite file.
+
+    Writes groups, group memberships, projects, topics and open merge
+    requests with their status into SNAPSHOT_FILE. Use the --from-snapshot
+    option of other commands to query the snapshot offline.
+
+    Filter syntax: see topics, projects, mrs.
+    """
+    if len(ctx.obj.get('uri')) > 1:
+        raise click.UsageError('Export works with a single GitLab host only.')
+
+    try:
+        group_filter, project_filter = group_project_filter.split('/')
+    except ValueError:
+        group_filter, project_filter = '', group_project_filter
+
+    run(ctx, ExportManager, 'export', snapshot_file,
+        group_filter=group_filter,
+        project_filter=project_filter)
+
+
+@gitlab.command()
+@click.pass_context
+@click.argument('batch-file', type=click.File())
+@debug_option()
+def batch(ctx, batch_file):
+    """
+    Run a sequence of commands from a file in one process.
+
+    Each line of BATCH_FILE is a command with its arguments, e.g.
+    "topics puppet/ --set-topic Puppet". Empty lines and comments (#) are
+    ignored. The commands share their connections to GitLab, and reuse the
+    groups and projects found by earlier commands. Processing stops at the
+    first command that fails.
+    """
+    ctx.obj['session'] = Session()
+
+    for line_number, line in enumerate(batch_file, 1):
+        args = shlex.split(line, comments=True)
+        if not args:
+            continue
+
+        command = gitlab.get_command(ctx, args[0])
+        if command is None or command is batch:
+            raise click.UsageError(f"Line {line_number}: No such command:"
+                                   f" {args[0]}")
+
+        click.echo(f"$ {' '.join(args)}")
+        with command.make_context(args[0], args[1:], parent=ctx) as sub_ctx:
+            command.invoke(sub_ctx)
 
 
 def main():
@@ -3,7 +3,16 @@ Constants for Concierge CLI.
 """
 import gitlab
 
+DEFAULT_WORKERS = 8
 GITLAB_DEFAULT_URI = 'https://gitlab.com'
+ISO_DATE_FORMATS = [
+    '%Y-%m-%d',
+    '%Y-%m-%dT%H:%M',
+    '%Y-%m-%dT%H:%M:%S',
+]
+MERGE_QUEUE_POLL_INTERVAL = 10
+MERGE_STATUS_RECHECK_INTERVAL = 2
+MERGE_STATUS_RECHECK_TIMEOUT = 30
 GITLAB_PERMISSIONS = {
     'owner': gitlab.OWNER_ACCESS,
     'maintainer': gitlab.MAINTAINER_ACCESS,
@@ -20,3 +29,16 @@ GITLAB_PERMISSION_NAMES = {
     gitlab.GUEST_ACCESS: 'guest',
     None: 'none',
 }
+GITLAB_MERGE_STATUS_UNCHECKED = [
+    'unchecked',
+    'checking',
+    'cannot_be_merged_recheck',
+]
+GITLAB_PIPELINE_PENDING_STATES = [
+    'created',
+    'waiting_for_resource',
+    'preparing',
+    'pending',
+    'running',
+    'scheduled',
+]
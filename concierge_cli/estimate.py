@@ -0,0 +1,111 @@
+"""
+Estimates of the requests and time bulk changes take, made from the first
+pages of listings before changing anything.
+"""
+from itertools import islice
+from threading import Lock
+
+
+class FirstPage:
+    """
+    The first page of a listing, with the totals GitLab reports for the
+    whole listing (``X-Total``, ``X-Total-Pages``).
+    """
+    __slots__ = ('items', 'total', 'pages')
+
+    def __init__(self, manager, **filters):
+        """Request the first page of a python-gitlab listing only."""
+        listing = manager.list(iterator=True, **filters)
+        self.items = list(islice(listing, listing.per_page or 0))
+        # GitLab doesn't count listings of more than 10,000 items
+        self.total = listing.total if listing.total is not None \
+            else len(self.items)
+        self.pages = listing.total_pages or 1
+
+
+class Estimate:
+    """
+    A plan of the steps of a run, each with the number of requests it
+    takes, and the latency and rate limit of the responses received while
+    probing, for predicting how long the run takes.
+    """
+
+    def __init__(self):
+        """An empty plan."""
+        self.steps = []
+        self.latencies = []
+        self.rate_limit = None
+        self.rate_limit_remaining = None
+        self.lock = Lock()
+
+    def install(self, api):
+        """Time the responses of a python-gitlab client."""
+        if self.record not in api.session.hooks['response']:
+            api.session.hooks['response'].append(self.record)
+
+    def record(self, response, *_, **__):
+        """Note the latency of a response, and the rate limit (if any)."""
+        with self.lock:
+            self.latencies.append(response.elapsed.total_seconds())
+            if 'RateLimit-Limit' in response.headers:
+                self.rate_limit = int(response.headers['RateLimit-Limit'])
+                self.rate_limit_remaining = int(response.headers.get(
+                    'RateLimit-Remaining', self.rate_limit))
+
+    def step(self, description, requests=0, concurrency=1, write=False):
+        """Add a step, making ``requests`` requests ``concurrency`` at once."""
+        self.steps.append((description, requests, concurrency, write))
+
+    @property
+    def latency(self):
+        """Mean latency of the responses received, in seconds."""
+        with self.lock:
+            return sum(self.latencies) / max(len(self.latencies), 1)
+
+    def duration(self):
+        """
+        Expected duration of all steps in seconds, at the latency observed,
+        but no faster than the rate limit (requests per minute) allows.
+        """
+        duration = sum(requests / concurrency * self.latency
+                       for _, requests, concurrency, _ in self.steps)
+        if self.rate_limit:
+            requests = sum(requests for _, requests, _, _ in self.steps)
+            duration = max(duration, requests * 60 / self.rate_limit)
+        return duration
+
+    def report(self):
+        """Display the plan, the requests and the duration expected."""
+        reads = round(sum(requests for _, requests, _, write in self.steps
+                          if not write))
+        writes = round(sum(requests for _, requests, _, write in self.steps
+                           if write))
+
+        print("Plan:")
+        for number, (description, requests, _, _) in \
+                enumerate(self.steps, 1):
+            print(f"  {number}. {description}" +
+                  (f" ({round(requests)} requests)" if requests else ''))
+        print(f"Expected requests: {reads} reads, {writes} writes")
+
+        rate = f"{self.latency:.2f}s per request"
+        if self.rate_limit:
+            rate += f", rate limit {self.rate_limit}/min with" \
+                f" {self.rate_limit_remaining} left"
+        print(f"Expected duration: {format_duration(self.duration())}"
+              f" ({rate})")
+        if self.rate_limit and reads + writes > self.rate_limit_remaining:
+            print("The run exceeds the requests left within the rate limit.")
+        print(f"Estimated from {len(self.latencies)} requests, extrapolating"
+              f" the first page of each listing.")
+
+
+def format_duration(seconds):
+    """A duration for humans, e.g. 1h 05m, 3m 12s or 45s."""
+    minutes, seconds = divmod(round(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f"{hours}h {minutes:02}m"
+    if minutes:
+        return f"{minutes}m {seconds:02}s"
+    return f"{seconds}s"
@@ -0,0 +1,51 @@
+"""
+Export of an inventory of a GitLab instance into a snapshot file.
+"""
+from .adapter import Project
+from .manager import GitlabAPI
+from .snapshot import SnapshotWriter
+
+
+class ExportManager(GitlabAPI):
+    """
+    Exports an inventory of a GitLab instance into a snapshot file.
+    """
+
+    def __init__(self, group_filter, project_filter, **kwargs):
+        """
+        An inventory filtered by group and project.
+        """
+        super().__init__(**kwargs)
+        self.group_filter = group_filter
+        self.project_filter = project_filter
+
+    def export(self, path):
+        """
+        Crawl groups, group memberships, projects, topics and open merge
+        requests (with their status) and write them into a snapshot file.
+        """
+        group_count = project_count = mr_count = 0
+
+        with SnapshotWriter(path) as snapshot:
+            for group in self.list_groups(self.group_filter):
+                snapshot.add_group(group)
+                group_count += 1
+                self.progress.scanned(1)
+
+                archived = {group_project.id for group_project in
+                            self.list_projects(group, self.project_filter,
+                                               archived=True)}
+                for group_project in \
+                        self.list_projects(group, self.project_filter):
+                    snapshot.add_project(group, group_project,
+                                         group_project.id in archived)
+                    project_count += 1
+                    self.progress.scanned(project_count=1)
+
+                    project = Project(self.api, group_project)
+                    for merge_request in project.get_mergerequests():
+                        snapshot.add_merge_request(merge_request)
+                        mr_count += 1
+
+        print(f"Exported {group_count} groups, {project_count} projects"
+              f" and {mr_count} merge requests to {path}.")
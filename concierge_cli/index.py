@@ -0,0 +1,49 @@
+"""
+Inverted topic index for GitLab projects.
+"""
+from collections import Counter, defaultdict
+from itertools import combinations
+
+
+class TopicIndex:
+    """
+    Maps topics to the IDs of the projects that carry them, for topic
+    statistics. Projects are added while they are enumerated.
+    """
+
+    def __init__(self):
+        """An empty index."""
+        self.project_topics = {}
+        self.topic_projects = defaultdict(set)
+
+    def add(self, project_id, topics):
+        """Index a project with its topics, replacing what was indexed."""
+        for topic in self.project_topics.get(project_id, ()):
+            self.topic_projects[topic].discard(project_id)
+            if not self.topic_projects[topic]:
+                del self.topic_projects[topic]
+
+        self.project_topics[project_id] = tuple(topics)
+        for topic in topics:
+            self.topic_projects[topic].add(project_id)
+
+    @property
+    def untagged_count(self):
+        """Number of indexed projects without any topics."""
+        return sum(1 for topics in self.project_topics.values()
+                   if not topics)
+
+    def frequency(self):
+        """Number of projects per topic, most frequent first."""
+        return Counter({topic: len(project_ids) for topic, project_ids
+                        in self.topic_projects.items()}).most_common()
+
+    def cooccurrence(self):
+        """Number of projects per pair of topics, most frequent first."""
+        return Counter(pair for topics in self.project_topics.values()
+                       for pair in combinations(sorted(set(topics)), 2)
+                       ).most_common()
+
+    def __len__(self):
+        """Number of indexed projects."""
+        return len(self.project_topics)
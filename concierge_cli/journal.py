@@ -0,0 +1,120 @@
+"""
+Journal of bulk operations, for resuming them after an interruption.
+"""
+import json
+
+from contextlib import contextmanager
+from pathlib import Path
+from threading import Lock
+
+from gitlab.exceptions import GitlabError
+
+
+class Journal:
+    """
+    Append-only record of a bulk operation: the items it works on (the
+    result of the enumeration), followed by one line per item completed or
+    failed. Without a path, nothing is recorded and nothing is skipped.
+    """
+
+    def __init__(self, path=None, resume=False):
+        """
+        Start a fresh journal file, replacing any existing one, or continue
+        an existing journal to resume the operation recorded in it.
+        """
+        self.path = path
+        self.plan = None
+        self.completed = set()
+        self.failed = {}
+        self.dump = None
+        self.torn = False
+        self.lock = Lock()
+
+        if path and resume:
+            self.load()
+        elif path:
+            Path(path).write_text('', encoding='utf-8')
+
+    def load(self):
+        """Read the plan and the progress of an operation from the file."""
+        with open(self.path, encoding='utf-8') as journal:
+            for line in journal:
+                # the last line lacks its end when written while interrupted
+                self.torn = not line.endswith('\n')
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if 'operation' in entry:
+                    self.plan = entry
+                elif 'done' in entry:
+                    self.completed.add(entry['done'])
+                    self.failed.pop(entry['done'], None)
+                elif 'failed' in entry:
+                    self.failed[entry['failed']] = entry['error']
+
+        if self.plan is None:
+            raise ValueError(f"Not a journal: {self.path}")
+
+    def write(self, entry):
+        """
+        Append an entry to the journal file, on a line of its own after an
+        incomplete last line.
+        """
+        with self.lock, open(self.path, 'a', encoding='utf-8') as journal:
+            if self.torn:
+                journal.write('\n')
+                self.torn = False
+            journal.write(json.dumps(entry) + '\n')
+
+    def start(self, operation, arguments, items, dump, load):
+        """
+        Return the items an operation works on. When resuming, these are
+        the items recorded in the journal that were not completed, restored
+        with ``load`` (no enumeration takes place). Otherwise, the items are
+        enumerated and recorded in the journal, using ``dump`` to turn them
+        into JSON records that have an ``id`` and a ``name``.
+        """
+        self.dump = dump
+
+        if not self.path:
+            return items
+
+        arguments = json.loads(json.dumps(arguments))
+        if self.plan:
+            if [self.plan['operation'], self.plan['arguments']] != \
+                    [operation, arguments]:
+                raise ValueError(
+                    f"Journal {self.path} is for {self.plan['operation']}"
+                    f" {self.plan['arguments']}, not {operation}"
+                    f" {arguments}")
+            print(f"Resuming {operation}: {len(self.completed)} of"
+                  f" {len(self.plan['items'])} done, {len(self.failed)}"
+                  " failed before.")
+            return [load(record) for record in self.plan['items']
+                    if record['id'] not in self.completed]
+
+        items = list(items)
+        self.plan = {'operation': operation, 'arguments': arguments,
+                     'items': [dump(item) for item in items]}
+        self.write(self.plan)
+        return items
+
+    @contextmanager
+    def record(self, item):
+        """
+        Record an item as completed when the block finishes, or as failed
+        when it raises a GitLab error (which is passed on).
+        """
+        if not self.path:
+            yield
+            return
+
+        record = self.dump(item)
+        try:
+            yield
+        except GitlabError as err:
+            self.write({'failed': record['id'], 'name': record['name'],
+                        'error': str(err.error_message)})
+            raise
+        self.write({'done': record['id'], 'name': record['name']})
@@ -1,31 +1,109 @@
 """
 Concierge repository projects management CLI.
 """
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from zlib import crc32
+
 from gitlab import Gitlab
 from gitlab.config import GitlabConfigMissingError
+from gitlab.exceptions import GitlabError
+from gitlab.v4.objects import Group
+from requests.exceptions import RequestException
 
 from .adapter import GroupMembership, Project
-from .constants import GITLAB_DEFAULT_URI
+from .constants import DEFAULT_WORKERS, GITLAB_DEFAULT_URI
+from .estimate import Estimate, FirstPage
+from .index import TopicIndex
+from .journal import Journal
+from .output import tag_output
+from .progress import Progress
+from .records import Membership, ProjectRecord, TopicSet
+from .snapshot import SnapshotAPI, SnapshotWriter
+
+
+class SharedExecutor:
+    """
+    An executor supplied by the caller, as a context that leaves it running.
+    """
+
+    def __init__(self, executor):
+        """Wrap a running executor."""
+        self.executor = executor
+
+    def __enter__(self):
+        return self.executor
+
+    def __exit__(self, *_):
+        return False
 
 
 class GitlabAPI:
     """
     Establishes an API connection to a GitLab instance.
     """
+    # pylint: disable=too-many-instance-attributes
 
-    def __init__(self, uri, token, insecure):
+    def __init__(self, uri=None, token=None, insecure=False, snapshot=None,
+                 retry_policy=None, workers=DEFAULT_WORKERS, session=None,
+                 shard=None, transport=None, progress=None, subgroups=False,
+                 api=None, executor=None, writers=None):
         """
         Connects to a GitLab instance using connection details from one of the
         local configuration files (see https://python-gitlab.readthedocs.io >
         Configuration > Files). Connects to GitLab.com by default if no config
         file is found. Specify an URI to override the config file lookup, the
-        token is optional (anonymous access if none is supplied).
+        token is optional (anonymous access if none is supplied). An URI
+        without a scheme selects a section of the configuration file.
+        With a snapshot file, answers queries from the file instead (offline).
+        A retry policy and HTTP transport settings, if supplied, apply to
+        all API calls. Up to ``workers`` API calls are made concurrently,
+        where a manager can, and up to ``writers`` changes (by default, as
+        many as ``workers``); the connection pool is sized for either.
+        Within a session, the connection and the groups and projects listed
+        are shared with other managers connecting the same way. A shard
+        (index, count) restricts all work to a share of the groups.
+        Groups and projects scanned, requests and writes are counted in a
+        progress display, if supplied. With subgroups, all groups nested in
+        the groups found are worked on, too.
+        For embedding, an existing python-gitlab client (``api``) and an
+        executor for concurrent API calls can be shared with other code.
         """
-        if not uri:
+        # pylint: disable=too-many-locals
+        self.retry_policy = None
+        self.transport = None
+        self.workers = workers
+        self.writers = writers or workers
+        self.session = None
+        self.shard = shard
+        self.subgroups = subgroups
+        self.positions = {}
+        self.progress = progress or Progress()
+        self.shared_executor = executor
+
+        if snapshot:
+            self.api = SnapshotAPI(snapshot)
+            return
+
+        self.session = session
+        self.connection = (api,) if api else (uri, token, insecure)
+        if session and session.connection(self.connection):
+            self.api, self.retry_policy, self.transport = \
+                session.connection(self.connection)
+            self.progress.install(self.api)
+            return
+
+        if api:
+            self.api = api
+            uri = None
+        elif not uri:
             try:
                 self.api = Gitlab.from_config()
             except GitlabConfigMissingError:
                 uri = GITLAB_DEFAULT_URI
+        elif '://' not in uri:
+            self.api = Gitlab.from_config(uri)
+            uri = None
 
         if uri:
             self.api = Gitlab(uri, private_token=token, per_page=100)
@@ -38,146 +116,322 @@ class GitlabAPI:
             filterwarnings('ignore', category=InsecureRequestWarning)
             self.api.ssl_verify = False
 
+        if transport:
+            transport.install(self.api, max(workers, self.writers))
+            self.transport = transport
+
+        if retry_policy:
+            retry_policy.install(self.api)
+            self.retry_policy = retry_policy
+
+        self.progress.install(self.api)
+
+        if session:
+            session.add_connection(self.connection, self.api,
+                                   self.retry_policy, self.transport)
+
+    def report_retries(self):
+        """Display how many API calls had to be retried, if any."""
+        if self.retry_policy:
+            self.retry_policy.report()
+
+    def report_transport(self):
+        """Display HTTP transport statistics, if any."""
+        if self.transport:
+            self.transport.report()
+
+    def pool(self, max_workers=None):
+        """
+        An executor for concurrent API calls, as a context: the shared one,
+        if supplied (left running), else a pool of ``max_workers`` threads
+        (by default, ``workers``) shut down with the context.
+        """
+        if self.shared_executor:
+            return SharedExecutor(self.shared_executor)
+        return ThreadPoolExecutor(max_workers=max_workers or self.workers)
+
+    def memoize(self, key, function):
+        """
+        The result of a listing, remembered in the session (if any) for
+        other managers connecting the same way.
+        """
+        if not self.session:
+            return function()
+        return self.session.memoize((self.connection,) + key, function)
+
+    def list_groups(self, search, nested=True):
+        """
+        List all groups that match a search pattern, in our shard only.
+        With subgroups, the groups nested in the groups found are listed too,
+        or, if not ``nested``, only the topmost groups found (whose projects
+        include the ones of their subgroups, see list_projects).
+        """
+        groups = self.memoize(
+            ('groups', search),
+            lambda: self.api.groups.list(search=search, all=True))
+        if self.subgroups:
+            groups = topmost_groups(groups)
+            if nested:
+                groups = self.memoize(('group tree', search),
+                                      lambda: self.crawl_subgroups(groups))
+        if not self.shard:
+            self.progress.planned(len(groups))
+            return groups
+
+        sharded_groups = []
+        for position, group in enumerate(groups):
+            if in_shard(group.id, self.shard):
+                self.positions[group.id] = position
+                sharded_groups.append(group)
+        self.progress.planned(len(sharded_groups))
+        return sharded_groups
+
+    def crawl_subgroups(self, groups):
+        """
+        The groups and all groups nested in them, in tree order. The nested
+        groups of each group are listed concurrently.
+        """
+        def descendants(group):
+            subgroups = group.descendant_groups.list(all=True)
+            return sorted((Group(self.api.groups, subgroup.attributes)
+                           for subgroup in subgroups),
+                          key=lambda subgroup: subgroup.full_path)
+
+        with self.pool() as executor:
+            nested_groups = list(executor.map(descendants, groups))
+        return [tree_group
+                for group, subgroups in zip(groups, nested_groups)
+                for tree_group in [group] + subgroups]
+
+    def estimate_groups(self, estimate, search, nested=True):
+        """
+        Plan how list_groups finds the groups, from the first pages of the
+        listings only. Returns the groups of the first page as a sample
+        (the topmost ones, with subgroups) and the number of groups
+        expected in our shard.
+        """
+        page = FirstPage(self.api.groups, search=search)
+        estimate.step(f'List groups matching "{search}": {page.total}'
+                      f' groups', page.pages)
+        groups, group_count = page.items, page.total
+
+        if self.subgroups:
+            groups = topmost_groups(groups)
+            group_count = page.total * len(groups) / max(len(page.items), 1)
+            estimate.step(f"Keep the topmost groups: ~{group_count:.0f}"
+                          f" groups")
+        if self.subgroups and nested:
+            with self.pool() as executor:
+                pages = list(executor.map(
+                    lambda group: FirstPage(group.descendant_groups),
+                    groups))
+            scale = group_count / max(len(groups), 1)
+            subgroup_count = sum(page.total for page in pages) * scale
+            estimate.step(f"Crawl the subgroups of each group:"
+                          f" ~{subgroup_count:.0f} subgroups",
+                          sum(page.pages for page in pages) * scale,
+                          concurrency=self.workers)
+            group_count += subgroup_count
+        if self.shard:
+            group_count /= self.shard[1]
+            estimate.step(f"Keep shard {self.shard[0]}/{self.shard[1]}:"
+                          f" ~{group_count:.0f} groups")
+
+        return groups, group_count
+
+    def tag_group(self, group_id):
+        """
+        When sharding, tag further output with the position of a group in
+        an unsharded run (see merge-shards). None stops tagging.
+        """
+        if self.shard:
+            tag_output(self.positions.get(group_id))
+
+    def list_projects(self, group, search, **filters):
+        """
+        List all projects of a group that match a search pattern, in their
+        minimal representation (no statistics, permissions and links).
+        With subgroups, the projects of nested groups are included.
+        """
+        if self.subgroups:
+            filters['include_subgroups'] = True
+        return self.memoize(
+            ('projects', group.id, search, tuple(sorted(filters.items()))),
+            lambda: group.projects.list(search=search, all=True, simple=True,
+                                        **filters))
+
 
 class TopicManager(GitlabAPI):
     """
     Manages topics on GitLab projects (visible in project settings).
     """
+    # pylint: disable=too-many-instance-attributes
 
     def __init__(self, group_filter, project_filter, empty,
-                 uri=None, token=None, insecure=False):
+                 update_snapshot=None, journal=None, **kwargs):
         """
         A topics filter by group, project and topic state (set or not set).
+        Topics set can also be updated in a snapshot file, and recorded in
+        a journal. Up to ``writers`` projects are updated concurrently (by
+        default, as many as API calls are made concurrently).
         """
-        super().__init__(uri, token, insecure)
+        super().__init__(**kwargs)
         self.group_filter = group_filter
         self.project_filter = project_filter
         self.empty = empty
+        self.update_snapshot = update_snapshot
+        self.journal = journal or Journal()
+        self.project_groups = {}
 
-    def projects(self):
+    def all_projects(self):
         """
         List all projects and their topics, filtered by an optional
         search pattern.
         """
-        for group in self.api.groups.list(search=self.group_filter, all=True):
-            for group_project in \
-                    group.projects.list(search=self.project_filter, all=True):
+        for group in self.list_groups(self.group_filter, nested=False):
+            self.tag_group(group.id)
+            group_projects = self.list_projects(group, self.project_filter)
+            self.progress.scanned(1, len(group_projects))
+            for group_project in group_projects:
                 project = Project(self.api, group_project)
-                if (self.empty and not project.topic_count) or \
-                        (not self.empty and project.topic_count):
-                    yield project
+                self.project_groups[project.project_id] = group.id
+                yield project
+        self.tag_group(None)
 
-    def show(self):
-        """Display all found projects and their topics."""
-        for project in self.projects():
-            project.show_topics()
-
-    def set(self, new_topics):
-        """Set a list of topics on the projects found."""
-        for project in self.projects():
-            project.set_topics(new_topics)
+    def projects(self):
+        """
+        List all projects with an empty (or non-empty) topic list.
+        """
+        for project in self.all_projects():
+            if self.selects(project):
+                yield project
 
+    def selects(self, project):
+        """Whether a project's topic list is empty (or non-empty)."""
+        return bool(project.topic_count) != self.empty
 
-class MergeRequestManager(GitlabAPI):
-    """
-    Retrieves information about GitLab merge requests and allows to perform
-    actions on them.
-    """
+    def records(self):
+        """The projects found, as ProjectRecord records."""
+        for project in self.projects():
+            yield ProjectRecord.from_project(project)
 
-    def __init__(self, group_filter, project_filter, labels, merge_style,
-                 uri=None, token=None, insecure=False):
+    def show(self):
+        """Display all found projects and their topics."""
+        for record in self.records():
+            if record.topics:
+                print(f"{len(record.topics)} topics in {record.name}: "
+                      f"{str(record.topics)[1:-1]}")
+            else:
+                print(f"{record.name}")
+
+    def show_stats(self):
         """
-        A collection of merge requests filtered by group, project and topic(s).
+        Display topic frequency, co-occurrence of topics and the number of
+        untagged projects, collected in a single pass over all projects.
         """
-        super().__init__(uri, token, insecure)
-        self.group_filter = group_filter
-        self.project_filter = project_filter
-        self.labels = labels
-        self.merged_count = 0
-        self.merge_executor = {
-            'no': None,
-            'yes': self.confirm_and_merge,
-            'automatic': self.merge_directly,
-        }[merge_style]
-
-    def merge_requests(self):
+        index = TopicIndex()
+        for project in self.all_projects():
+            index.add(project.project_id, project.topic_list)
+
+        print(f"{len(index)} projects, "
+              f"{index.untagged_count} without topics.")
+        print("Topic frequency:")
+        for topic, count in index.frequency():
+            print(f"{count:6} {topic}")
+        print("Topics used together:")
+        for (topic, other_topic), count in index.cooccurrence():
+            print(f"{count:6} {topic} + {other_topic}")
+
+    def set_topics(self, new_topics):
         """
-        Fetch a list all merge requests from all projects that match the
-        optional search pattern and labels.
+        Set a list of topics on the projects found, and yield a TopicSet
+        record for each project, in the order of the projects. All projects
+        are found first, then updated concurrently, each once (even if found
+        more than once). A failed update carries its error.
         """
-        mr_list = []
-
-        for group in self.api.groups.list(search=self.group_filter, all=True):
-            for group_project in \
-                    group.projects.list(search=self.project_filter, all=True):
-                project = Project(self.api, group_project)
-                mr_list += project.get_mergerequests(labels=self.labels)
-
-        return mr_list
+        projects = self.journal.start(
+            'set_topics', new_topics, self.projects(), Project.to_record,
+            lambda record: Project.from_record(self.api, record))
+        projects = {project.project_id: project for project in projects}
+
+        def set_topics(project):
+            topic_set = TopicSet(project.project_id, project.name,
+                                 project.topic_list, new_topics, None)
+            try:
+                with self.journal.record(project), self.progress.write():
+                    project.set_topics(new_topics)
+            except Exception as err:  # pylint: disable=broad-except
+                return topic_set._replace(error=err)
+            return topic_set
+
+        with ExitStack() as stack:
+            writer = stack.enter_context(
+                SnapshotWriter(self.update_snapshot, fresh=False)
+            ) if self.update_snapshot else None
+            executor = stack.enter_context(self.pool(self.writers))
+
+            updates = [executor.submit(set_topics, project)
+                       for project in projects.values()]
+            for update in updates:
+                topic_set = update.result()
+                if writer and not topic_set.error:
+                    writer.update_topics(
+                        topic_set.id, projects[topic_set.id].topic_list)
+                yield topic_set
+
+        if self.session:
+            self.session.forget(self.connection, 'projects')
 
-    def show(self):
-        """Display all merge requests found with some status information."""
-        if self.labels:
-            print("Open merge requests matching labels: "
-                  f"[{']['.join(self.labels)}]")
-        else:
-            print("Open merge requests: (mergeable, pipeline status)")
-
-        for merge_request in self.merge_requests():
-            pipelines = merge_request.pipelines()
-            pl_status = '✓' if pipelines and pipelines[0]['status'] == \
-                        'success' else '✗'
-            mr_status = '✓' if merge_request.merge_status == \
-                        'can_be_merged' else '✗'
-            mr_labels = f" [{']['.join(merge_request.labels)}]" \
-                        if merge_request.labels else ''
-            print(f"{mr_status}{pl_status}"
-                  f" {merge_request.references['full']}:"
-                  f" {merge_request.title}{mr_labels}")
-
-    def merge_all(self):
-        """Merge all identified merge requests."""
-        if self.labels:
-            print("Merging merge requests that match labels: "
-                  f"[{']['.join(self.labels)}]")
-        else:
-            print("Merging merge requests:")
-
-        for merge_request in self.merge_requests():
-            if merge_request.merge_status != 'can_be_merged':
-                print(f"Ignoring {merge_request.references['full']}:"
-                      f" {merge_request.title} ✗ Can't be merged")
-                continue
-
-            pipelines = merge_request.pipelines()
-            if not pipelines or pipelines[0]['status'] != 'success':
-                print(f"Skipping {merge_request.references['full']}:"
-                      f" {merge_request.title} ✗ Pipeline not succeeded")
-                continue
-
-            self.merge_executor(merge_request)
-
-        count = self.merged_count if self.merged_count else 'No'
-        print(f"{count} MRs merged.")
-
-    def confirm_and_merge(self, merge_request):
-        """Ask for confirmation interactively, then merge the MR."""
-        choice = input("Proceed with merging"  # nosec
-                       f" ✓✓ {merge_request.references['full']}:"
-                       f" {merge_request.title} ? (y/n) [n] ")
-        if choice == 'y':
-            self._merge(merge_request)
-
-    def merge_directly(self, merge_request):
-        """Merge MR without prior confirmation."""
-        print(f"Merging {merge_request.references['full']}:"
-              f" {merge_request.title}")
-        self._merge(merge_request)
-
-    def _merge(self, merge_request):
-        """Triggers the low-level merge API call."""
-        merge_request.merge(should_remove_source_branch=True)
-        self.merged_count += 1
+    def set(self, new_topics):
+        """
+        Set a list of topics on the projects found (see set_topics).
+        Updates are reported in the order of the projects. The first update
+        failing is raised after all updates are done.
+        """
+        errors = []
+        for topic_set in self.set_topics(new_topics):
+            self.tag_group(self.project_groups.get(topic_set.id))
+            print(str(topic_set))
+            if topic_set.error:
+                errors.append(topic_set.error)
+        self.tag_group(None)
+
+        if errors:
+            raise errors[0]
+
+    def estimate(self, new_topics):
+        """
+        Display the plan, the requests and the time setting topics takes
+        (see set), without changing anything. The projects of the groups
+        on the first page of groups are counted from the first page of
+        their listings, and extrapolated to all groups.
+        """
+        estimate = Estimate()
+        estimate.install(self.api)
+        groups, group_count = self.estimate_groups(
+            estimate, self.group_filter, nested=False)
+        filters = {'include_subgroups': True} if self.subgroups else {}
+
+        with self.pool() as executor:
+            pages = list(executor.map(
+                lambda group: FirstPage(group.projects,
+                                        search=self.project_filter,
+                                        simple=True, **filters),
+                groups))
+        scale = group_count / max(len(groups), 1)
+        project_count = sum(page.total for page in pages) * scale
+        selected_count = scale * sum(
+            page.total * sum(self.selects(Project(self.api, item))
+                             for item in page.items) / len(page.items)
+            for page in pages if page.items)
+
+        estimate.step(f"List the projects of each group:"
+                      f" ~{project_count:.0f} projects",
+                      sum(page.pages for page in pages) * scale)
+        estimate.step(f"Set topics {new_topics} on ~{selected_count:.0f}"
+                      f" projects, {self.writers} at a time",
+                      selected_count, concurrency=self.writers, write=True)
+        estimate.report()
 
 
 class ProjectManager(GitlabAPI):
@@ -185,12 +439,11 @@ class ProjectManager(GitlabAPI):
     Retrieves information about GitLab projects.
     """
 
-    def __init__(self, group_filter, project_filter, topic_list,
-                 uri=None, token=None, insecure=False):
+    def __init__(self, group_filter, project_filter, topic_list, **kwargs):
         """
         A projects filter by group, project and topic(s).
         """
-        super().__init__(uri, token, insecure)
+        super().__init__(**kwargs)
         self.group_filter = group_filter
         self.project_filter = project_filter
         self.topic_list = topic_list
@@ -200,20 +453,29 @@ class ProjectManager(GitlabAPI):
         List all projects and their topics, filtered by an optional
         search pattern.
         """
-        for group in self.api.groups.list(search=self.group_filter, all=True):
-            for group_project in \
-                    group.projects.list(search=self.project_filter, all=True,
-                                        archived=False):
+        topic_filter = {'topic': ','.join(self.topic_list)} \
+            if self.topic_list else {}
+
+        for group in self.list_groups(self.group_filter, nested=False):
+            group_projects = self.list_projects(
+                group, self.project_filter, archived=False, **topic_filter)
+            self.progress.scanned(1, len(group_projects))
+            for group_project in group_projects:
                 project = Project(self.api, group_project)
                 topics_match = set(project.topic_list) \
                     & set(self.topic_list) == set(self.topic_list)
                 if topics_match or not self.topic_list:
                     yield project
 
+    def records(self):
+        """The projects found, as ProjectRecord records."""
+        for project in self.projects():
+            yield ProjectRecord.from_project(project)
+
     def show(self):
         """Display all found projects as a YAML list."""
-        for project in self.projects():
-            print(f"- {project}")
+        for record in self.records():
+            print(f"- {record}")
 
 
 class GroupManager(GitlabAPI):
@@ -221,12 +483,14 @@ class GroupManager(GitlabAPI):
     Manages permissions for users on GitLab project groups (= namespaces).
     """
 
-    def __init__(self, group_filter, username, is_member=True,
-                 uri=None, token=None, insecure=False):
+    def __init__(self, group_filter, username, is_member=True, journal=None,
+                 **kwargs):
         """
-        A groups filter by group, project and topic(s).
+        A groups filter by group, project and topic(s). Permissions set can
+        be recorded in a journal.
         """
-        super().__init__(uri, token, insecure)
+        super().__init__(**kwargs)
+        self.journal = journal or Journal()
 
         users = self.api.users.list(username=username)
         if len(users) != 1:
@@ -235,30 +499,174 @@ class GroupManager(GitlabAPI):
         self.group_filter = group_filter
         self.user = users[0]
         self.is_member = is_member
+        self.failed_count = 0
 
-    def groups(self):
+    def lookups(self):
         """
-        List all groups and the current access level for our user,
-        filtered by an optional search pattern.
+        Look up the current access level of our user in all groups,
+        filtered by an optional search pattern, concurrently. Yields
+        (group, group membership, error) for the groups our user is (or is
+        not) a member of, as selected, and for the groups whose lookup
+        failed (without a membership), in the order of the groups.
         """
-        for group in self.api.groups.list(search=self.group_filter, all=True):
+        groups = self.list_groups(self.group_filter)
+
+        with self.pool() as executor:
+            lookups = executor.map(self.lookup, groups)
+            for group, (group_user, error) in zip(groups, lookups):
+                self.tag_group(group.id)
+                self.progress.scanned(1)
+
+                if error or \
+                        (not group_user.is_member and not self.is_member) or \
+                        (group_user.is_member and self.is_member):
+                    yield group, group_user, error
+        self.tag_group(None)
 
-            group_user = GroupMembership(group, self.user)
+    def lookup(self, group):
+        """
+        The current access level of our user in a group, as a pair of the
+        group membership and None, or of None and the error looking it up.
+        """
+        try:
+            return GroupMembership(self.api, group, self.user), None
+        except (GitlabError, RequestException) as err:
+            return None, err
 
-            if (not group_user.is_member and not self.is_member) or \
-                    (group_user.is_member and self.is_member):
+    def groups(self):
+        """
+        List all groups and the current access level for our user (see
+        lookups). Failed lookups are reported, and counted in a summary.
+        """
+        for group, group_user, error in self.lookups():
+            if error:
+                self.report_failure(group.full_path, 'looking up', error)
+            else:
                 yield group_user
 
+    def memberships(self):
+        """The groups found, as Membership records of our user."""
+        for group_user in self.groups():
+            yield Membership.from_membership(group_user)
+
     def show(self):
         """
         Display all found groups and the user's current access level.
         """
-        for group_user in self.groups():
-            print(group_user)
+        for membership in self.memberships():
+            print(membership)
+        self.print_summary()
 
     def set(self, permission_name):
         """
-        Ensure the user has privileges to access the selected groups.
+        Ensure the user has privileges to access the selected groups. The
+        changes are made concurrently, and reported in the order of the
+        groups, along with failed lookups. Failures are counted in a
+        summary.
         """
-        for group_user in self.groups():
-            group_user.set_membership(permission_name)
+        found = []
+
+        def selected():
+            for group, group_user, error in self.lookups():
+                found.append((group.id, group.full_path, group_user, error))
+                if not error:
+                    yield group_user
+
+        group_users = list(self.journal.start(
+            'set_membership', [self.user.username, permission_name],
+            selected(), GroupMembership.to_record,
+            lambda record: GroupMembership.from_record(self.api, record)))
+        # when resuming, the groups are not looked up again
+        found = found or [(group_user.group_id, group_user.full_path,
+                           group_user, None) for group_user in group_users]
+
+        def set_membership(group_user):
+            change = group_user.change(permission_name)
+            try:
+                with self.journal.record(group_user), self.progress.write():
+                    group_user.set_membership(permission_name)
+            except (GitlabError, RequestException) as err:
+                return change, err
+            return change, None
+
+        with self.pool() as executor:
+            changes = [(group_id, full_path, error, None if error else
+                        executor.submit(set_membership, group_user))
+                       for group_id, full_path, group_user, error in found]
+
+            for group_id, full_path, error, change in changes:
+                self.tag_group(group_id)
+                action = 'looking up'
+                if change:
+                    text, error = change.result()
+                    action = 'setting'
+                    if text:
+                        print(text)
+                if error:
+                    self.report_failure(full_path, action, error)
+            self.tag_group(None)
+
+        self.print_summary()
+
+    def report_failure(self, full_path, action, error):
+        """Display a failure of a group, and count it."""
+        print(f"Group {full_path}: Failed {action} access level ✗"
+              f" {error_message(error)}")
+        self.failed_count += 1
+
+    def print_summary(self):
+        """Display the number of groups failed, if any."""
+        if self.failed_count:
+            print(f"{self.failed_count} groups failed.")
+
+    def estimate(self, permission_name):
+        """
+        Display the plan, the requests and the time setting the user's
+        access level takes (see set), without changing anything. Every
+        group found may need a change.
+        """
+        estimate = Estimate()
+        estimate.install(self.api)
+        _, group_count = self.estimate_groups(estimate, self.group_filter)
+
+        estimate.step(f"Look up the access level of {self.user.username}"
+                      f" in each group", group_count,
+                      concurrency=self.workers)
+        estimate.step(f"Set access level '{permission_name}' on up to"
+                      f" {group_count:.0f} groups {self.user.username} is"
+                      f" {'' if self.is_member else 'not '}a member of",
+                      group_count, concurrency=self.workers, write=True)
+        estimate.report()
+
+
+def error_message(error):
+    """The message of a GitLab error, or of a connection error."""
+    if isinstance(error, GitlabError):
+        return error.error_message
+    return str(error)
+
+
+def in_shard(item_id, shard):
+    """
+    Whether an item belongs to a shard (index, count), by a hash of its ID
+    that is the same on every machine.
+    """
+    index, count = shard
+    return crc32(str(item_id).encode()) % count == index - 1
+
+
+def topmost_groups(groups):
+    """
+    The groups not nested in any other of the groups (the others are in
+    the subtree of one of them).
+    """
+    paths = {group.full_path for group in groups}
+    return [group for group in groups
+            if not any(path in paths
+                       for path in parent_paths(group.full_path))]
+
+
+def parent_paths(full_path):
+    """The full paths of the groups a group is nested in."""
+    parts = full_path.split('/')
+    return ['/'.join(parts[:length]) for length in range(1, len(parts))]
@@ -0,0 +1,623 @@
+"""
+Merging of GitLab merge requests: at once, in merge queues, by watching
+merge requests (polling) or by listening for webhook events.
+"""
+from datetime import datetime, timezone
+from threading import Lock
+from time import monotonic, sleep
+
+from gitlab.exceptions import GitlabError
+from requests.exceptions import RequestException
+
+from .adapter import Project
+from .constants import (
+    GITLAB_MERGE_STATUS_UNCHECKED, MERGE_QUEUE_POLL_INTERVAL,
+    MERGE_STATUS_RECHECK_INTERVAL, MERGE_STATUS_RECHECK_TIMEOUT,
+)
+from .journal import Journal
+from .manager import GitlabAPI, error_message, topmost_groups
+from .output import output_tag, tag_output
+from .records import MergeRequestStatus, merge_state
+from .snapshot import SnapshotAPI
+from .webhook import WebhookServer
+
+
+class MergeRequestManager(GitlabAPI):
+    """
+    Retrieves information about GitLab merge requests and allows to perform
+    actions on them.
+    """
+    # pylint: disable=too-many-instance-attributes,too-many-public-methods
+
+    def __init__(self, group_filter, project_filter, labels, merge_style,
+                 when_pipeline_succeeds=False, journal=None,
+                 queue_timeout=None, filters=None, source_branch_prefix='',
+                 **kwargs):
+        """
+        A collection of merge requests filtered by group, project and topic(s).
+        Further filters (e.g. ``author_username``, ``target_branch``,
+        ``updated_after``, ``wip``) are passed on to the API, MRs whose
+        source branch doesn't start with a prefix are left out.
+        Optionally, MRs with a running pipeline are set to merge when their
+        pipeline succeeds. Merges can be recorded in a journal. With a queue
+        timeout, MRs are merged through merge queues (see merge_queued),
+        waiting up to that many seconds for each MR to become eligible.
+        """
+        super().__init__(**kwargs)
+        self.group_filter = group_filter
+        self.project_filter = project_filter
+        self.labels = labels
+        self.filters = filters or {}
+        self.source_branch_prefix = source_branch_prefix
+        self.when_pipeline_succeeds = when_pipeline_succeeds
+        self.journal = journal or Journal()
+        self.queue_timeout = queue_timeout
+        self.interactive = merge_style == 'yes'
+        self.merged_count = 0
+        self.scheduled_count = 0
+        self.failed_count = 0
+        self.project_groups = {}
+        self.listed_groups = {}
+        self.lock = Lock()
+        self.merge_executor = {
+            'no': None,
+            'yes': self.confirm_and_merge,
+            'automatic': self.merge_directly,
+        }[merge_style]
+
+    def projects(self):
+        """
+        List all projects that match the optional search pattern.
+        """
+        for group in self.list_groups(self.group_filter, nested=False):
+            self.listed_groups[group.id] = group
+            group_projects = self.list_projects(group, self.project_filter)
+            self.progress.scanned(1, len(group_projects))
+            for group_project in group_projects:
+                self.project_groups[group_project.id] = group.id
+                yield Project(self.api, group_project)
+
+    def merge_requests(self):
+        """
+        Fetch a list all merge requests from all projects that match the
+        optional search pattern and labels, with their merge status
+        determined by GitLab where possible.
+        """
+        mr_list = []
+
+        for project in self.projects():
+            mr_list += self.project_merge_requests(
+                project, with_merge_status_recheck=True)
+
+        return self.recheck(mr_list)
+
+    def recheck(self, merge_requests):
+        """
+        Wait (a bounded time) for GitLab to determine whether merge requests
+        can be merged, where it hasn't yet. Only those MRs are fetched again,
+        concurrently, until determined. Returns the (refreshed) MRs.
+        """
+        if isinstance(self.api, SnapshotAPI) or not any(
+                merge_request.merge_status in GITLAB_MERGE_STATUS_UNCHECKED
+                for merge_request in merge_requests):
+            return merge_requests
+
+        deadline = monotonic() + MERGE_STATUS_RECHECK_TIMEOUT
+
+        def determine(merge_request):
+            while merge_request.merge_status in \
+                    GITLAB_MERGE_STATUS_UNCHECKED and monotonic() < deadline:
+                sleep(MERGE_STATUS_RECHECK_INTERVAL)
+                merge_request = merge_request.manager.get(merge_request.iid)
+            return merge_request
+
+        with self.pool() as executor:
+            return list(executor.map(determine, merge_requests))
+
+    def project_merge_requests(self, project, **filters):
+        """
+        Fetch the open merge requests of a project that match our labels
+        and filters, and any further filters.
+        """
+        return self.source_branch_filter(project.get_mergerequests(
+            labels=self.labels, **self.filters, **filters))
+
+    def source_branch_filter(self, merge_requests):
+        """
+        Leave out merge requests whose source branch doesn't start with our
+        prefix (the API only filters by a complete branch name).
+        """
+        if not self.source_branch_prefix:
+            return merge_requests
+        return [merge_request for merge_request in merge_requests
+                if merge_request.source_branch.startswith(
+                    self.source_branch_prefix)]
+
+    def updated_merge_requests(self, projects, updated_after):
+        """
+        Fetch the open merge requests updated after a point in time, for
+        the projects specified (a dict of projects by their ID). Uses one
+        listing per group the projects were found in (the topmost ones, as
+        the listing of a group includes its subgroups) instead of querying
+        each project.
+        """
+        filters = {'wip': 'no', **self.filters,
+                   'updated_after': updated_after.isoformat()}
+        for group in topmost_groups(list(self.listed_groups.values())):
+            for merge_request in self.source_branch_filter(
+                    group.mergerequests.list(
+                        state='opened', labels=self.labels,
+                        with_merge_status_recheck=True, all=True,
+                        **filters)):
+                project = projects.get(merge_request.project_id)
+                if project:
+                    yield project.bind_mergerequest(merge_request)
+
+    def show(self):
+        """Display all merge requests found with some status information."""
+        if self.labels:
+            print("Open merge requests matching labels: "
+                  f"[{']['.join(self.labels)}]")
+        else:
+            print("Open merge requests: (mergeable, pipeline status)")
+
+        for status in self.statuses():
+            self.tag_group(self.project_groups.get(status.project_id))
+            print(str(status))
+        self.tag_group(None)
+
+    def statuses(self):
+        """
+        The merge requests found, as MergeRequestStatus records. The latest
+        pipelines of the merge requests are looked up concurrently.
+        """
+        with self.pool() as executor:
+            yield from executor.map(MergeRequestStatus.from_merge_request,
+                                    self.merge_requests())
+
+    def merge_all(self):
+        """Merge all identified merge requests."""
+        if self.labels:
+            print("Merging merge requests that match labels: "
+                  f"[{']['.join(self.labels)}]")
+        else:
+            print("Merging merge requests:")
+
+        merge_requests = self.journal.start(
+            'merge', {'labels': self.labels,
+                      'when_pipeline_succeeds': self.when_pipeline_succeeds},
+            self.merge_requests(), self.dump_merge_request,
+            self.load_merge_request)
+        merge_requests = [merge_request for merge_request in merge_requests
+                          if merge_request is not None]
+        states = self.check_all(merge_requests)
+
+        if self.interactive:
+            self.review_and_merge(merge_requests, states)
+        elif self.queue_timeout is not None:
+            self.merge_queued(merge_requests, states)
+        else:
+            for merge_request, state in zip(merge_requests, states):
+                self.tag_group(
+                    self.project_groups.get(merge_request.project_id))
+                self.process(merge_request, state)
+            self.tag_group(None)
+
+        self.print_summary()
+
+    def check_all(self, merge_requests):
+        """Determine the state of all merge requests, concurrently."""
+        with self.pool() as executor:
+            return list(executor.map(self.check, merge_requests))
+
+    def review_and_merge(self, merge_requests, states):
+        """
+        Display a table of all mergeable MRs, let the user select MRs by
+        index or range, then merge the selected MRs concurrently.
+        """
+        candidates = []
+        for merge_request, state in zip(merge_requests, states):
+            if state == 'eligible' or \
+                    (state == 'pending' and self.when_pipeline_succeeds):
+                candidates.append((merge_request, state == 'pending'))
+            else:
+                self.process(merge_request, state)
+
+        if not candidates:
+            return
+
+        selection = self.select(candidates)
+        with self.pool() as executor:
+            futures = [executor.submit(self._try_merge, *candidates[index - 1])
+                       for index in selection]
+        for future in futures:
+            future.result()
+
+    def merge_queued(self, merge_requests, states):
+        """
+        Merge the MRs of each project and target branch one after another,
+        in a merge queue: after each merge, the MRs remaining in the queue
+        are rebased, and merged in turn once their new pipeline succeeded.
+        The queues are worked on concurrently, with output tagged like ours.
+        """
+        queues = {}
+        for merge_request, state in zip(merge_requests, states):
+            if state == 'failed':
+                self.tag_group(
+                    self.project_groups.get(merge_request.project_id))
+                self.process(merge_request, state)
+            else:
+                queues.setdefault((merge_request.project_id,
+                                   merge_request.target_branch),
+                                  []).append(merge_request)
+        self.tag_group(None)
+
+        tag = output_tag()
+        with self.pool() as executor:
+            list(executor.map(lambda queue: self.drain(queue, tag),
+                              queues.values()))
+
+    def drain(self, queue, tag=None):
+        """
+        Merge the MRs of a merge queue in turn, tagging output with a tag
+        (e.g. of the GitLab instance), if any.
+        """
+        tag_output(tag)
+        self.tag_group(self.project_groups.get(queue[0].project_id))
+        rebased = False
+        for position, merge_request in enumerate(queue):
+            merge_request, state = self.settle(merge_request, rebased)
+            if state != 'eligible':
+                self.process(merge_request, state)
+            elif self._try_merge(merge_request):
+                rebased = self.rebase_all(queue[position + 1:]) or rebased
+        tag_output(None)
+
+    def settle(self, merge_request, rebased=False):
+        """
+        Wait until a merge request is neither being rebased, nor checked by
+        GitLab, nor waiting for its pipeline (for its latest commit, when
+        rebased), or the queue timeout passed. Returns the refreshed merge
+        request and its state.
+        """
+        deadline = monotonic() + self.queue_timeout
+        while True:
+            merge_request = merge_request.manager.get(
+                merge_request.iid, include_rebase_in_progress=True)
+            state = 'unchecked'
+            if not merge_request.attributes.get('rebase_in_progress'):
+                state = self.check(merge_request)
+                if state == 'eligible' and rebased and \
+                        merge_request.pipelines()[0].get('sha') != \
+                        merge_request.sha:
+                    state = 'pending'
+            if state not in ['pending', 'unchecked'] or \
+                    monotonic() >= deadline:
+                return merge_request, state
+            sleep(MERGE_QUEUE_POLL_INTERVAL)
+
+    @staticmethod
+    def rebase_all(merge_requests):
+        """
+        Rebase merge requests onto their target branch. Returns whether
+        there were any.
+        """
+        for merge_request in merge_requests:
+            print(f"Rebasing {merge_request.references['full']}:"
+                  f" {merge_request.title}")
+            try:
+                merge_request.rebase()
+            except GitlabError as err:
+                print(f"Failed rebasing {merge_request.references['full']}:"
+                      f" {merge_request.title} ✗ {err.error_message}")
+        return bool(merge_requests)
+
+    @staticmethod
+    def select(candidates):
+        """
+        Display a table of (merge request, scheduled) candidates, and ask
+        for a selection until a valid one is entered. Returns indexes.
+        """
+        for index, (merge_request, scheduled) in enumerate(candidates, 1):
+            status = '✓…' if scheduled else '✓✓'
+            when = ' (when pipeline succeeds)' if scheduled else ''
+            print(f"{index:4} {status} {merge_request.references['full']}:"
+                  f" {merge_request.title}{when}")
+
+        while True:
+            answer = input("Merge which MRs? (e.g. 1,3-5 or all)"  # nosec
+                           " [none] ")
+            try:
+                return parse_selection(answer, len(candidates))
+            except ValueError as err:
+                print(str(err))
+
+    @staticmethod
+    def dump_merge_request(merge_request):
+        """A merge request as a plain (JSON) record, for the journal."""
+        return {'id': merge_request.id,
+                'name': merge_request.references['full'],
+                'project_id': merge_request.project_id,
+                'iid': merge_request.iid}
+
+    def load_merge_request(self, record):
+        """
+        Fetch the current state of a merge request from a record. An MR
+        merged or closed in the meantime is recorded as done, and skipped
+        (None is returned).
+        """
+        merge_request = self.api.projects.get(
+            record['project_id'], lazy=True).mergerequests.get(record['iid'])
+        if merge_request.state == 'opened':
+            return merge_request
+
+        print(f"Skipping {merge_request.references['full']}:"
+              f" {merge_request.title} ✗ Already {merge_request.state}")
+        with self.journal.record(merge_request):
+            return None
+
+    def watch(self, interval, polls=None):
+        """
+        Poll merge requests periodically and merge them as soon as they
+        become eligible. The projects are enumerated once, subsequent polls
+        only fetch merge requests updated since the previous poll. Status
+        is re-checked only for MRs that changed, or that wait for a pipeline
+        or for GitLab to determine whether they can be merged (fetched again).
+        A failed poll, check or merge is reported, and watching goes on.
+        """
+        print(f"Watching merge requests every {interval} seconds:")
+
+        projects = {project.project_id: project
+                    for project in self.projects()}
+        fingerprints = {}
+        waiting = {}
+        updated_after = None
+
+        try:
+            while polls is None or polls > 0:
+                poll_started = datetime.now(timezone.utc)
+
+                try:
+                    changed = self.poll(projects, updated_after)
+                    rechecked = self.recheck(list(waiting.values()))
+                except (GitlabError, RequestException) as err:
+                    print(f"Failed polling merge requests ✗"
+                          f" {error_message(err)}")
+                else:
+                    waiting = dict(zip(waiting, rechecked))
+                    for merge_request in changed:
+                        key = (merge_request.project_id, merge_request.iid)
+                        fingerprint = (merge_request.sha,
+                                       merge_request.merge_status)
+                        if fingerprints.get(key) != fingerprint:
+                            fingerprints[key] = fingerprint
+                            waiting[key] = merge_request
+                    updated_after = poll_started
+
+                self.process_waiting(waiting, fingerprints)
+                if polls is not None:
+                    polls -= 1
+                if polls != 0:
+                    sleep(interval)
+        except KeyboardInterrupt:
+            print("Stopped watching.")
+
+        self.print_summary()
+
+    def poll(self, projects, updated_after=None):
+        """
+        The open merge requests of the projects (a dict of projects by
+        their ID): all of them, or those updated after a point in time.
+        """
+        if updated_after is None:
+            return [merge_request
+                    for project in projects.values()
+                    for merge_request in self.project_merge_requests(
+                        project, with_merge_status_recheck=True)]
+        return list(self.updated_merge_requests(projects, updated_after))
+
+    def process_waiting(self, waiting, fingerprints):
+        """
+        Check the merge requests waiting (a dict by project ID and IID), and
+        process the ones no longer waiting for a pipeline or a merge status.
+        Processed MRs are forgotten, unless they can't be merged (until
+        they change). A failed check leaves an MR waiting.
+        """
+        for key, merge_request in list(waiting.items()):
+            state = self.try_check(merge_request)
+            if state is None or state == 'unchecked' or (
+                    state == 'pending' and not self.when_pipeline_succeeds):
+                continue
+            del waiting[key]
+            if self.try_process(merge_request, state) and \
+                    state != 'unmergeable':
+                del fingerprints[key]
+
+    def listen(self, port, secret=None, limit=None):
+        """
+        Receive webhook events of merge requests and pipelines on a port,
+        and merge the affected MRs as soon as they become eligible. The
+        projects are enumerated once, events of other projects are ignored.
+        """
+        projects = {project.project_id: project
+                    for project in self.projects()}
+
+        with WebhookServer(port, secret) as server:
+            print(f"Listening for webhook events on port {server.port}:")
+            try:
+                for project_id, filters in server.events(limit):
+                    project = projects.get(project_id)
+                    if project:
+                        self.merge_on_event(project, filters)
+            except KeyboardInterrupt:
+                print("Stopped listening.")
+
+        self.print_summary()
+
+    def merge_on_event(self, project, filters):
+        """
+        Check and process the open MRs of a project an event is about, if
+        they match our labels and filters. Failures are reported, and
+        listening goes on.
+        """
+        self.tag_group(self.project_groups.get(project.project_id))
+        try:
+            merge_requests = self.recheck(self.project_merge_requests(
+                project, with_merge_status_recheck=True, **filters))
+        except (GitlabError, RequestException) as err:
+            print(f"Failed listing merge requests of {project.name} ✗"
+                  f" {error_message(err)}")
+            merge_requests = []
+
+        for merge_request in merge_requests:
+            state = self.try_check(merge_request)
+            if state is not None:
+                self.try_process(merge_request, state)
+        self.tag_group(None)
+
+    @staticmethod
+    def check(merge_request):
+        """
+        Determine whether a merge request can be merged. Returns 'eligible',
+        'unchecked' (mergeability not yet computed), 'unmergeable', 'pending'
+        (pipeline not yet finished) or 'failed' (pipeline not succeeded).
+        """
+        if merge_request.merge_status != 'can_be_merged':
+            return merge_state(merge_request.merge_status)
+
+        pipelines = merge_request.pipelines()
+        return merge_state(merge_request.merge_status,
+                           pipelines[0]['status'] if pipelines else None)
+
+    def try_check(self, merge_request):
+        """
+        Determine the state of a merge request (see check), report a
+        failure instead of raising it. Returns the state, or None.
+        """
+        try:
+            return self.check(merge_request)
+        except (GitlabError, RequestException) as err:
+            print(f"Failed checking {merge_request.references['full']}:"
+                  f" {merge_request.title} ✗ {error_message(err)}")
+            return None
+
+    def process(self, merge_request, state):
+        """
+        Merge an eligible MR, or hand it over to GitLab for merging when
+        its pipeline succeeds (if configured). Report any other MR.
+        """
+        if state == 'eligible':
+            self.merge_or_report(merge_request)
+        elif state == 'pending' and self.when_pipeline_succeeds:
+            self.merge_or_report(merge_request, when_pipeline_succeeds=True)
+        elif state in ['unchecked', 'unmergeable']:
+            print(f"Ignoring {merge_request.references['full']}:"
+                  f" {merge_request.title} ✗ Can't be merged")
+        else:
+            print(f"Skipping {merge_request.references['full']}:"
+                  f" {merge_request.title} ✗ Pipeline not succeeded")
+
+    def try_process(self, merge_request, state):
+        """
+        Process an MR (see process), report a failed merge instead of
+        raising it. Returns whether processing succeeded.
+        """
+        try:
+            self.process(merge_request, state)
+        except (GitlabError, RequestException) as err:
+            print(f"Failed merging {merge_request.references['full']}:"
+                  f" {merge_request.title} ✗ {error_message(err)}")
+            with self.lock:
+                self.failed_count += 1
+            return False
+        return True
+
+    def merge_or_report(self, merge_request, when_pipeline_succeeds=False):
+        """Merge an eligible MR, or just report it when not merging."""
+        if self.merge_executor:
+            self.merge_executor(merge_request, when_pipeline_succeeds)
+        else:
+            print(f"Ready to merge {merge_request.references['full']}:"
+                  f" {merge_request.title}")
+
+    def print_summary(self):
+        """Display the number of MRs merged or scheduled for merging."""
+        count = self.merged_count if self.merged_count else 'No'
+        print(f"{count} MRs merged.")
+        if self.scheduled_count:
+            print(f"{self.scheduled_count} MRs set to merge when pipeline"
+                  " succeeds.")
+        if self.failed_count:
+            print(f"{self.failed_count} MRs failed to merge.")
+
+    def confirm_and_merge(self, merge_request, when_pipeline_succeeds=False):
+        """Ask for confirmation interactively, then merge the MR."""
+        status = '✓…' if when_pipeline_succeeds else '✓✓'
+        when = ' when pipeline succeeds' if when_pipeline_succeeds else ''
+        choice = input("Proceed with merging"  # nosec
+                       f" {status} {merge_request.references['full']}:"
+                       f" {merge_request.title}{when} ? (y/n) [n] ")
+        if choice == 'y':
+            self._merge(merge_request, when_pipeline_succeeds)
+
+    def merge_directly(self, merge_request, when_pipeline_succeeds=False):
+        """Merge MR without prior confirmation."""
+        when = ' when pipeline succeeds' if when_pipeline_succeeds else ''
+        print(f"Merging {merge_request.references['full']}:"
+              f" {merge_request.title}{when}")
+        self._merge(merge_request, when_pipeline_succeeds)
+
+    def _try_merge(self, merge_request, when_pipeline_succeeds=False):
+        """
+        Merge an MR, report a failure instead of raising it. Returns whether
+        the merge succeeded.
+        """
+        try:
+            self.merge_directly(merge_request, when_pipeline_succeeds)
+        except GitlabError as err:
+            print(f"Failed merging {merge_request.references['full']}:"
+                  f" {merge_request.title} ✗ {err.error_message}")
+            with self.lock:
+                self.failed_count += 1
+            return False
+        return True
+
+    def _merge(self, merge_request, when_pipeline_succeeds=False):
+        """
+        Triggers the low-level merge API call, and records the MR in the
+        journal. MRs only reported are left out, to be reconsidered when
+        resuming.
+        """
+        if when_pipeline_succeeds:
+            with self.journal.record(merge_request), self.progress.write():
+                merge_request.merge(should_remove_source_branch=True,
+                                    merge_when_pipeline_succeeds=True)
+            with self.lock:
+                self.scheduled_count += 1
+        else:
+            with self.journal.record(merge_request), self.progress.write():
+                merge_request.merge(should_remove_source_branch=True)
+            with self.lock:
+                self.merged_count += 1
+
+
+def parse_selection(answer, count):
+    """
+    Turn a selection like "1,3-5", "all" or "" (none) into a sorted list of
+    indices between 1 and ``count``.
+    """
+    answer = answer.strip().lower()
+    if answer == 'all':
+        return list(range(1, count + 1))
+
+    selection = set()
+    for part in filter(None, answer.replace(' ', '').split(',')):
+        first, _, last = part.partition('-')
+        try:
+            first, last = int(first), int(last or first)
+        except ValueError:
+            raise ValueError(f"Invalid selection: {part}") from None
+        if not 1 <= first <= last <= count:
+            raise ValueError(f"Out of range (1-{count}): {part}")
+        selection.update(range(first, last + 1))
+    return sorted(selection)
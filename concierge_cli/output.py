@@ -0,0 +1,113 @@
+"""
+Output helpers for running commands against several GitLab instances, or
+in several shards.
+"""
+import re
+import sys
+
+from contextlib import contextmanager
+from threading import Lock, local
+
+# a line of output tagged with a number, e.g. the position of a group
+NUMBER_TAG = re.compile(r'\[([0-9]+)\] (.*)')
+
+
+class TaggedOutput:
+    """
+    Replacement for ``sys.stdout`` that prefixes every line a thread writes
+    with the tag registered for that thread. Output of threads without a
+    tag is passed through unchanged.
+    """
+
+    def __init__(self, stream):
+        """Wrap an output stream, usually ``sys.stdout``."""
+        self.stream = stream
+        self.lock = Lock()
+        self.local = local()
+
+    def tag(self, label):
+        """
+        Tag all output of the current thread with a label. A label of None
+        stops tagging.
+        """
+        self.local.tag = label
+        self.local.buffer = ''
+
+    def write(self, text):
+        """Write complete lines of tagged output, buffer the rest."""
+        tag = getattr(self.local, 'tag', None)
+        if tag is None:
+            return self.stream.write(text)
+
+        *lines, self.local.buffer = (self.local.buffer + text).split('\n')
+        with self.lock:
+            for line in lines:
+                self.stream.write(f"[{tag}] {line}\n")
+        return len(text)
+
+    def flush(self):
+        """Write out a pending, incomplete line of the current thread."""
+        tag = getattr(self.local, 'tag', None)
+        if tag is not None and self.local.buffer:
+            with self.lock:
+                self.stream.write(f"[{tag}] {self.local.buffer}")
+            self.local.buffer = ''
+        self.stream.flush()
+
+    def __getattr__(self, name):
+        """Delegate everything else to the wrapped stream."""
+        return getattr(self.stream, name)
+
+
+@contextmanager
+def tagged_stdout():
+    """Temporarily replace ``sys.stdout`` with a :class:`TaggedOutput`."""
+    original_stdout = sys.stdout
+    output = TaggedOutput(original_stdout)
+    sys.stdout = output
+    try:
+        yield output
+    finally:
+        sys.stdout = original_stdout
+
+
+def output_tag():
+    """The tag of the current thread's output, if output is tagged at all."""
+    if isinstance(sys.stdout, TaggedOutput):
+        return getattr(sys.stdout.local, 'tag', None)
+    return None
+
+
+def tag_output(label):
+    """Tag the current thread's output, if output is tagged at all."""
+    if isinstance(sys.stdout, TaggedOutput):
+        sys.stdout.tag(label)
+
+
+def merge_shards(outputs):
+    """
+    Combine the output of several shards of a run into the output of a
+    single run. Lines are tagged with the position of the group they belong
+    to, and are ordered by it. Untagged lines leading the output are taken
+    from the first shard only, other untagged lines are appended per shard.
+    """
+    tagged_lines = []
+    header, footer = None, []
+
+    for output in outputs:
+        lines = output.read().splitlines()
+        leading = 0
+        while leading < len(lines) and not NUMBER_TAG.match(lines[leading]):
+            leading += 1
+        if header is None:
+            header = lines[:leading]
+
+        for line in lines[leading:]:
+            match = NUMBER_TAG.match(line)
+            if match:
+                tagged_lines.append((int(match.group(1)), match.group(2)))
+            else:
+                footer.append(line)
+
+    tagged_lines.sort(key=lambda tagged_line: tagged_line[0])
+    return (header or []) + [line for _, line in tagged_lines] + footer
@@ -0,0 +1,133 @@
+"""
+Live progress of long runs, on stderr.
+"""
+from contextlib import contextmanager
+from threading import Lock
+from time import monotonic
+from urllib.parse import urlparse
+
+
+class Progress:  # pylint: disable=too-many-instance-attributes
+    """
+    Counts the groups and projects scanned, API requests made and writes
+    done or failed, and displays them with the request rate and an
+    estimated time to completion. Without a stream, nothing is counted and
+    nothing is displayed.
+    """
+
+    def __init__(self, stream=None, interval=None):
+        """
+        Display progress on a stream, at most every ``interval`` seconds
+        (by default, twice a second on a terminal, else every 10 seconds).
+        """
+        self.stream = stream
+        self.interactive = bool(stream) and stream.isatty()
+        self.interval = interval if interval is not None else \
+            0.5 if self.interactive else 10
+        self.lock = Lock()
+        self.reset()
+
+    def reset(self):
+        """Start counting from zero."""
+        self.started = monotonic()
+        self.displayed = self.started
+        self.group_total = None
+        self.group_count = 0
+        self.project_count = 0
+        self.request_count = 0
+        self.done_count = 0
+        self.failed_count = 0
+
+    def install(self, api):
+        """Count the requests of a python-gitlab client."""
+        if not self.stream:
+            return
+        if self.record not in api.session.hooks['response']:
+            api.session.hooks['response'].append(self.record)
+
+    def record(self, response, *_, **__):
+        """
+        Count a response. The total of a group listing (``X-Total``) gives
+        the number of groups to scan, before all pages are received.
+        """
+        total = response.headers.get('X-Total')
+        with self.lock:
+            self.request_count += 1
+            if total and self.group_total is None and \
+                    urlparse(response.request.url).path.endswith('/groups'):
+                self.group_total = int(total)
+        self.update()
+
+    def planned(self, group_count):
+        """Set the number of groups to scan."""
+        if not self.stream:
+            return
+        with self.lock:
+            self.group_total = group_count
+        self.update()
+
+    def scanned(self, group_count=0, project_count=0):
+        """Count groups and projects scanned."""
+        if not self.stream:
+            return
+        with self.lock:
+            self.group_count += group_count
+            self.project_count += project_count
+        self.update()
+
+    @contextmanager
+    def write(self):
+        """Count a write as done, or as failed when it raises an error."""
+        if not self.stream:
+            yield
+            return
+        try:
+            yield
+        except Exception:
+            with self.lock:
+                self.failed_count += 1
+            raise
+        else:
+            with self.lock:
+                self.done_count += 1
+        finally:
+            self.update()
+
+    def status(self):
+        """A line with the counts, the request rate and the ETA."""
+        elapsed = monotonic() - self.started
+        groups = f"{self.group_count}" + \
+            (f"/{self.group_total}" if self.group_total is not None else '')
+        line = (f"{groups} groups, {self.project_count} projects scanned,"
+                f" {self.request_count / max(elapsed, 0.001):.1f} req/s")
+        if self.done_count or self.failed_count:
+            line += f", {self.done_count} written, {self.failed_count} failed"
+        if self.group_total and 0 < self.group_count < self.group_total:
+            remaining = elapsed / self.group_count * \
+                (self.group_total - self.group_count)
+            line += f", ETA {remaining:.0f}s"
+        return line
+
+    def update(self, force=False):
+        """Display the status, unless it was displayed very recently."""
+        now = monotonic()
+        with self.lock:
+            if not force and now - self.displayed < self.interval:
+                return
+            self.displayed = now
+            line = self.status()
+        if self.interactive:
+            self.stream.write(f"\r\x1b[K{line}\r")
+        else:
+            self.stream.write(f"{line}\n")
+        self.stream.flush()
+
+    def finish(self):
+        """Display the final status of a run, and start counting anew."""
+        if not self.stream:
+            return
+        self.update(force=True)
+        if self.interactive:
+            self.stream.write('\n')
+        with self.lock:
+            self.reset()
@@ -0,0 +1,114 @@
+"""
+Lightweight, immutable records of what the managers find and change, for
+using concierge-cli as a library. The CLI displays them as they are.
+"""
+from collections import namedtuple
+
+from .constants import (
+    GITLAB_MERGE_STATUS_UNCHECKED, GITLAB_PIPELINE_PENDING_STATES,
+)
+
+
+class ProjectRecord(namedtuple('ProjectRecord', ['id', 'name', 'topics'])):
+    """A project, by ID and full path, with its topics."""
+    __slots__ = ()
+
+    @classmethod
+    def from_project(cls, project):
+        """The record of a project adapter"""
+        return cls(project.project_id, project.name, list(project.topic_list))
+
+    def __str__(self):
+        """Project name and its namespace"""
+        return self.name
+
+
+class TopicSet(namedtuple('TopicSet', ['id', 'name', 'old_topics', 'topics',
+                                       'error'])):
+    """Topics set on a project, replacing its old topics, or the error
+    that prevented it."""
+    __slots__ = ()
+
+    def __str__(self):
+        """The change of topics"""
+        if self.old_topics:
+            return f"Replacing topics on {self.name}: " \
+                   f"{self.old_topics} -> {self.topics}"
+        return f"Setting new topics on {self.name}: {self.topics}"
+
+
+class MergeRequestStatus(namedtuple('MergeRequestStatus', [
+        'project_id', 'iid', 'reference', 'title', 'labels', 'merge_status',
+        'pipeline_status'])):
+    """An open merge request, with its merge status and the status of its
+    latest pipeline (if any)."""
+    __slots__ = ()
+
+    @classmethod
+    def from_merge_request(cls, merge_request):
+        """The record of a merge request, fetching its latest pipeline"""
+        pipelines = merge_request.pipelines()
+        return cls(merge_request.project_id, merge_request.iid,
+                   merge_request.references['full'], merge_request.title,
+                   list(merge_request.labels), merge_request.merge_status,
+                   pipelines[0]['status'] if pipelines else None)
+
+    @property
+    def state(self):
+        """Whether the merge request can be merged (see merge_state)"""
+        return merge_state(self.merge_status, self.pipeline_status)
+
+    def __str__(self):
+        """Mergeability, pipeline status, reference, title and labels"""
+        mr_status = '✓' if self.merge_status == 'can_be_merged' else '✗'
+        pl_status = '✓' if self.pipeline_status == 'success' else '✗'
+        mr_labels = f" [{']['.join(self.labels)}]" if self.labels else ''
+        return f"{mr_status}{pl_status} {self.reference}:" \
+               f" {self.title}{mr_labels}"
+
+
+class Membership(namedtuple('Membership', ['group_id', 'full_path',
+                                           'user_id', 'username',
+                                           'access_level'])):
+    """A user's access level on a group, None if not a member."""
+    __slots__ = ()
+
+    @classmethod
+    def from_membership(cls, group_user):
+        """The record of a group membership adapter"""
+        return cls(group_user.group_id, group_user.full_path,
+                   group_user.user_id, group_user.username,
+                   group_user.access_level)
+
+    @property
+    def is_member(self):
+        """Whether the user is a member of the group"""
+        return self.access_level is not None
+
+    def __str__(self):
+        """Textual information about the group membership"""
+        access_level = \
+            f"has access level '{self.access_level}'" \
+            if self.is_member else 'is not a member.'
+
+        return f"Group {self.full_path}: " \
+               f"{self.username} {access_level}"
+
+
+def merge_state(merge_status, pipeline_status=None):
+    """
+    Whether a merge request can be merged: 'eligible', 'unchecked'
+    (mergeability not yet computed), 'unmergeable', 'pending' (pipeline not
+    yet finished) or 'failed' (pipeline not succeeded).
+    """
+    if merge_status != 'can_be_merged':
+        if merge_status in GITLAB_MERGE_STATUS_UNCHECKED:
+            return 'unchecked'
+        return 'unmergeable'
+
+    if pipeline_status != 'success':
+        if pipeline_status in GITLAB_PIPELINE_PENDING_STATES:
+            return 'pending'
+        return 'failed'
+
+    return 'eligible'
@@ -0,0 +1,159 @@
+"""
+Retry policy and circuit breaker for GitLab API calls.
+"""
+import random
+import re
+import sys
+
+from threading import Lock
+from time import monotonic, sleep
+from urllib.parse import urlparse
+
+from gitlab.exceptions import GitlabError, GitlabHttpError
+from requests.exceptions import (
+    ConnectionError as RequestsConnectionError,
+    ConnectTimeout,
+    Timeout,
+)
+
+READ_METHODS = ['get', 'head', 'options']
+RETRY_STATUS_CODES = [429, 500, 502, 503, 504]
+# responses that guarantee a write was not carried out
+SAFE_WRITE_STATUS_CODES = [429, 503]
+
+
+class CircuitOpenError(GitlabError):
+    """
+    An API endpoint failed persistently, calls to it fail fast for a while.
+    """
+
+
+class RetryPolicy:  # pylint: disable=too-many-instance-attributes
+    """
+    Retries failed API calls with exponential backoff and full jitter.
+    Reads are retried on transient errors, writes only when the request was
+    certainly not processed. Endpoints that keep failing are cut off by a
+    circuit breaker for some time.
+    """
+
+    def __init__(self, retries=3, backoff=1.0, max_backoff=30.0,
+                 failure_threshold=5, reset_timeout=60.0):
+        """
+        Retry up to ``retries`` times, waiting up to ``backoff`` seconds
+        (doubled on each attempt, capped at ``max_backoff``). Open the
+        circuit for an endpoint after ``failure_threshold`` failed calls
+        in a row, for ``reset_timeout`` seconds.
+        """
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self.retry_count = 0
+        self.time_lost = 0.0
+        self.failures = {}
+        self.opened = {}
+        self.lock = Lock()
+
+    def install(self, api):
+        """Route all HTTP requests of a python-gitlab client through us."""
+        http_request = api.http_request
+
+        def retrying_http_request(verb, path, *args, **kwargs):
+            return self.call(verb, path, http_request,
+                             verb, path, *args, **kwargs)
+
+        api.http_request = retrying_http_request
+
+    def call(self, verb, path, function, *args, **kwargs):
+        """Call a function performing an API request, applying the policy."""
+        endpoint = self.endpoint(verb, path)
+        self.check_circuit(endpoint)
+
+        attempt = 0
+        while True:
+            started = monotonic()
+            try:
+                return self.record_success(endpoint,
+                                           function(*args, **kwargs))
+            except (GitlabHttpError, RequestsConnectionError, Timeout) as err:
+                if not self.is_transient(err):
+                    raise
+                if attempt == self.retries or \
+                        not self.is_retryable(verb, err):
+                    self.record_failure(endpoint)
+                    raise
+            sleep(self.delay(attempt))
+            attempt += 1
+            with self.lock:
+                self.retry_count += 1
+                self.time_lost += monotonic() - started
+
+    @staticmethod
+    def endpoint(verb, path):
+        """An endpoint name, with IDs replaced by placeholders."""
+        path = urlparse(path).path
+        path = path[path.find('/api/v4') + len('/api/v4'):] \
+            if '/api/v4' in path else path
+        return f"{verb.upper()} {re.sub(r'/[0-9]+(?=/|$)', '/:id', path)}"
+
+    @staticmethod
+    def is_transient(err):
+        """Whether an error may go away when trying again."""
+        if isinstance(err, GitlabHttpError):
+            return err.response_code in RETRY_STATUS_CODES
+        return True
+
+    @staticmethod
+    def is_retryable(verb, err):
+        """Whether it is safe to repeat a failed request."""
+        if verb.lower() in READ_METHODS:
+            return True
+        if isinstance(err, GitlabHttpError):
+            return err.response_code in SAFE_WRITE_STATUS_CODES
+        return isinstance(err, ConnectTimeout)
+
+    def delay(self, attempt):
+        """Seconds to wait before the next attempt (full jitter)."""
+        ceiling = min(self.max_backoff, self.backoff * 2 ** attempt)
+        return random.uniform(0, ceiling)  # nosec
+
+    def check_circuit(self, endpoint):
+        """Fail fast if the circuit for an endpoint is open."""
+        with self.lock:
+            opened = self.opened.get(endpoint)
+            if opened is None:
+                return
+            if monotonic() - opened < self.reset_timeout:
+                raise CircuitOpenError(
+                    f"{endpoint} failed {self.failures[endpoint]} times in a"
+                    f" row, not calling it for {self.reset_timeout:.0f}s")
+            # let a trial call pass, a further failure opens it again
+            del self.opened[endpoint]
+
+    def record_failure(self, endpoint):
+        """Count a failed call, and open the circuit when it's too many."""
+        with self.lock:
+            self.failures[endpoint] = self.failures.get(endpoint, 0) + 1
+            if self.failures[endpoint] >= self.failure_threshold:
+                self.opened[endpoint] = monotonic()
+
+    def record_success(self, endpoint, result):
+        """Close the circuit for an endpoint again, pass on the result."""
+        with self.lock:
+            self.failures.pop(endpoint, None)
+        return result
+
+    def report(self):
+        """
+        Display retry statistics on stderr, if there were retries since the
+        last report.
+        """
+        if self.retry_count:
+            print(f"{self.retry_count} API calls retried,"
+                  f" {self.time_lost:.1f}s lost to retries.",
+                  file=sys.stderr)
+        with self.lock:
+            self.retry_count = 0
+            self.time_lost = 0.0
@@ -0,0 +1,48 @@
+"""
+Connections and inventory shared by several commands run in one process.
+"""
+from threading import Lock
+
+
+class Session:
+    """
+    Keeps the API connections to GitLab instances open across commands, and
+    remembers the groups and projects listed, so that later commands reuse
+    what earlier ones fetched.
+    """
+
+    def __init__(self):
+        """An empty session."""
+        self.connections = {}
+        self.listings = {}
+        self.lock = Lock()
+
+    def connection(self, key):
+        """
+        An API client with its retry policy and transport, or None if not
+        connected.
+        """
+        with self.lock:
+            return self.connections.get(key)
+
+    def add_connection(self, key, api, retry_policy, transport):
+        """Remember an API client (and its settings) for reuse."""
+        with self.lock:
+            self.connections[key] = (api, retry_policy, transport)
+
+    def memoize(self, key, function):
+        """The result of a listing, fetched by calling ``function`` once."""
+        with self.lock:
+            if key in self.listings:
+                return self.listings[key]
+
+        result = function()
+        with self.lock:
+            return self.listings.setdefault(key, result)
+
+    def forget(self, *prefix):
+        """Drop all listings whose key starts with a prefix (they changed)."""
+        with self.lock:
+            for key in [key for key in self.listings
+                        if key[:len(prefix)] == prefix]:
+                del self.listings[key]
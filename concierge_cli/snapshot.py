@@ -0,0 +1,312 @@
+"""
+Inventory snapshots of a GitLab instance, stored in an SQLite file.
+"""
+import json
+import sqlite3
+
+from pathlib import Path
+from threading import Lock
+
+from gitlab import GitlabGetError
+
+SCHEMA = """
+CREATE TABLE groups (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    path TEXT NOT NULL,
+    full_path TEXT NOT NULL
+);
+CREATE TABLE projects (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    path TEXT NOT NULL,
+    path_with_namespace TEXT NOT NULL,
+    archived INTEGER NOT NULL
+);
+CREATE TABLE group_projects (
+    group_id INTEGER NOT NULL REFERENCES groups (id),
+    project_id INTEGER NOT NULL REFERENCES projects (id),
+    PRIMARY KEY (group_id, project_id)
+);
+CREATE TABLE topics (
+    project_id INTEGER NOT NULL REFERENCES projects (id),
+    position INTEGER NOT NULL,
+    topic TEXT NOT NULL,
+    PRIMARY KEY (project_id, position)
+);
+CREATE TABLE merge_requests (
+    project_id INTEGER NOT NULL REFERENCES projects (id),
+    iid INTEGER NOT NULL,
+    reference TEXT NOT NULL,
+    title TEXT NOT NULL,
+    labels TEXT NOT NULL,
+    merge_status TEXT NOT NULL,
+    pipeline_status TEXT,
+    PRIMARY KEY (project_id, iid)
+);
+CREATE TABLE users (
+    id INTEGER PRIMARY KEY,
+    username TEXT NOT NULL UNIQUE
+);
+CREATE TABLE memberships (
+    group_id INTEGER NOT NULL REFERENCES groups (id),
+    user_id INTEGER NOT NULL REFERENCES users (id),
+    access_level INTEGER NOT NULL,
+    PRIMARY KEY (group_id, user_id)
+);
+CREATE INDEX group_projects_project ON group_projects (project_id);
+CREATE INDEX topics_topic ON topics (topic);
+CREATE INDEX memberships_user ON memberships (user_id);
+"""
+
+
+class SnapshotWriter:
+    """
+    Writes an inventory of a GitLab instance into a new SQLite file.
+    """
+
+    def __init__(self, path, fresh=True):
+        """
+        Create a fresh snapshot file, replacing any existing one, or open an
+        existing snapshot for updating.
+        """
+        if fresh and Path(path).exists():
+            Path(path).unlink()
+        self.db = sqlite3.connect(path)
+        if fresh:
+            self.db.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.db.commit()
+        self.db.close()
+
+    def add_group(self, group):
+        """Store a group and its (direct) members."""
+        self.db.execute("INSERT OR IGNORE INTO groups VALUES (?, ?, ?, ?)",
+                        (group.id, group.name, group.path, group.full_path))
+
+        for member in group.members.list(all=True):
+            self.db.execute("INSERT OR IGNORE INTO users VALUES (?, ?)",
+                            (member.id, member.username))
+            self.db.execute("INSERT OR REPLACE INTO memberships"
+                            " VALUES (?, ?, ?)",
+                            (group.id, member.id, member.access_level))
+
+    def add_project(self, group, group_project, archived):
+        """Store a project, its topics and its relation to a group."""
+        attributes = group_project.attributes
+        self.db.execute("INSERT OR IGNORE INTO projects"
+                        " VALUES (?, ?, ?, ?, ?)",
+                        (group_project.id, attributes['name'],
+                         attributes['path'],
+                         attributes['path_with_namespace'], archived))
+        self.db.execute("INSERT OR IGNORE INTO group_projects VALUES (?, ?)",
+                        (group.id, group_project.id))
+        self.db.executemany("INSERT OR IGNORE INTO topics VALUES (?, ?, ?)",
+                            [(group_project.id, position, topic)
+                             for position, topic
+                             in enumerate(attributes['tag_list'])])
+
+    def update_topics(self, project_id, topics):
+        """Replace the topics of a project."""
+        self.db.execute("DELETE FROM topics WHERE project_id = ?",
+                        (project_id,))
+        self.db.executemany("INSERT INTO topics VALUES (?, ?, ?)",
+                            [(project_id, position, topic)
+                             for position, topic in enumerate(topics)])
+
+    def add_merge_request(self, merge_request):
+        """Store an open merge request with its status."""
+        pipelines = merge_request.pipelines()
+        pipeline_status = pipelines[0]['status'] if pipelines else None
+        self.db.execute("INSERT OR REPLACE INTO merge_requests"
+                        " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (merge_request.project_id, merge_request.iid,
+                         merge_request.references['full'],
+                         merge_request.title,
+                         json.dumps(merge_request.labels),
+                         merge_request.merge_status, pipeline_status))
+
+
+class SnapshotAPI:
+    """
+    Read-only stand-in for a python-gitlab client, answering the queries
+    the managers make from a snapshot file instead of a GitLab instance.
+    Search patterns match names and paths case-insensitively, like GitLab.
+    """
+
+    def __init__(self, path):
+        """Open an existing snapshot file."""
+        self.db = sqlite3.connect(f"file:{path}?mode=ro", uri=True,
+                                  check_same_thread=False)
+        self.lock = Lock()
+        self.groups = SnapshotGroups(self)
+        self.projects = SnapshotProjects(self)
+        self.users = SnapshotUsers(self)
+
+    def query(self, sql, *params):
+        """Return all rows of a query."""
+        with self.lock:
+            return self.db.execute(sql, params).fetchall()
+
+
+class SnapshotRecord:
+    """An API object with attributes, like a python-gitlab RESTObject."""
+
+    def __init__(self, **attributes):
+        self.attributes = attributes
+        self.__dict__.update(attributes)
+
+
+class SnapshotGroups:
+    """Group listing from a snapshot."""
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+
+    def list(self, search='', **_):
+        """List groups whose name or path contains the search pattern."""
+        return [SnapshotGroup(self.snapshot, *row)
+                for row in self.snapshot.query(
+                    "SELECT id, name, path, full_path FROM groups"
+                    " WHERE instr(lower(name), lower(?1))"
+                    " OR instr(lower(path), lower(?1))"
+                    " ORDER BY full_path", search or '')]
+
+
+class SnapshotGroup(SnapshotRecord):
+    """A group from a snapshot, with its projects and members."""
+
+    def __init__(self, snapshot, group_id, name, path, full_path):
+        super().__init__(id=group_id, name=name, path=path,
+                         full_path=full_path)
+        self.projects = SnapshotGroupProjects(snapshot, group_id)
+        self.members = SnapshotGroupMembers(snapshot, group_id)
+
+
+class SnapshotGroupProjects:
+    """Project listing of a group from a snapshot."""
+
+    def __init__(self, snapshot, group_id):
+        self.snapshot = snapshot
+        self.group_id = group_id
+
+    def list(self, search='', archived=None, topic=None, **_):
+        """
+        List projects whose name or path contains the search pattern.
+        Projects carrying all of the (comma-separated) topics are looked up
+        in the topic index, instead of checking every project.
+        """
+        topics = sorted(set(topic.split(','))) if topic else []
+        rows = self.snapshot.query(
+            "SELECT p.id, p.name, p.path, p.path_with_namespace, p.archived"
+            " FROM projects p JOIN group_projects g ON g.project_id = p.id"
+            " WHERE g.group_id = ? AND (instr(lower(p.name), lower(?))"
+            " OR instr(lower(p.path), lower(?)))"
+            " AND (? IS NULL OR p.archived = ?)"
+            " AND (? = 0 OR p.id IN (SELECT project_id FROM topics"
+            " WHERE topic IN (SELECT value FROM json_each(?))"
+            " GROUP BY project_id HAVING count(DISTINCT topic) = ?))"
+            " ORDER BY p.path_with_namespace",
+            self.group_id, search or '', search or '', archived, archived,
+            len(topics), json.dumps(topics), len(topics))
+        return [SnapshotRecord(
+            id=project_id, name=name, path=path,
+            path_with_namespace=path_with_namespace,
+            archived=bool(is_archived),
+            tag_list=[topic for topic, in self.snapshot.query(
+                "SELECT topic FROM topics WHERE project_id = ?"
+                " ORDER BY position", project_id)],
+        ) for project_id, name, path, path_with_namespace, is_archived
+            in rows]
+
+
+class SnapshotGroupMembers:
+    """Direct members of a group from a snapshot."""
+
+    def __init__(self, snapshot, group_id):
+        self.snapshot = snapshot
+        self.group_id = group_id
+
+    def get(self, user_id):
+        """Return a membership, raise a 404 error for non-members."""
+        rows = self.snapshot.query(
+            "SELECT access_level FROM memberships"
+            " WHERE group_id = ? AND user_id = ?", self.group_id, user_id)
+        if not rows:
+            raise GitlabGetError('404 Not found', response_code=404)
+        return SnapshotRecord(id=user_id, access_level=rows[0][0])
+
+
+class SnapshotProjects:
+    """Project access by ID from a snapshot."""
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+
+    def get(self, project_id, **_):
+        """A project offering its merge requests."""
+        return SnapshotProject(self.snapshot, project_id)
+
+
+class SnapshotProject(SnapshotRecord):
+    """A project from a snapshot, with its merge requests."""
+
+    def __init__(self, snapshot, project_id):
+        super().__init__(id=project_id)
+        self.mergerequests = SnapshotMergeRequests(snapshot, project_id)
+
+
+class SnapshotMergeRequests:
+    """Open merge requests of a project from a snapshot."""
+
+    def __init__(self, snapshot, project_id):
+        self.snapshot = snapshot
+        self.project_id = project_id
+
+    def list(self, labels=(), **_):
+        """List the project's open merge requests that carry all labels."""
+        merge_requests = []
+        for iid, reference, title, mr_labels, merge_status, pipeline_status \
+                in self.snapshot.query(
+                    "SELECT iid, reference, title, labels, merge_status,"
+                    " pipeline_status FROM merge_requests"
+                    " WHERE project_id = ? ORDER BY iid DESC",
+                    self.project_id):
+            mr_labels = json.loads(mr_labels)
+            if not set(labels) <= set(mr_labels):
+                continue
+            merge_requests.append(SnapshotMergeRequest(
+                project_id=self.project_id, iid=iid, title=title,
+                references={'full': reference}, labels=mr_labels,
+                merge_status=merge_status, pipeline_status=pipeline_status,
+            ))
+        return merge_requests
+
+
+class SnapshotMergeRequest(SnapshotRecord):
+    """A merge request from a snapshot, with its latest pipeline status."""
+
+    def pipelines(self):
+        """The latest pipeline, if there was one."""
+        # pylint: disable=no-member
+        return [{'status': self.pipeline_status}] \
+            if self.pipeline_status else []
+
+
+class SnapshotUsers:
+    """User lookup from a snapshot (only users that are group members)."""
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+
+    def list(self, username=None, **_):
+        """Find users by username."""
+        return [SnapshotRecord(id=user_id, username=name)
+                for user_id, name in self.snapshot.query(
+                    "SELECT id, username FROM users WHERE username = ?",
+                    username)]
@@ -0,0 +1,114 @@
+"""
+Trace of a run: spans for commands, manager methods and HTTP requests, in
+the Chrome trace event format (see chrome://tracing or ui.perfetto.dev).
+"""
+import json
+import os
+
+from contextlib import contextmanager
+from functools import wraps
+from inspect import isgeneratorfunction
+from threading import Lock, current_thread, get_ident
+from time import perf_counter
+from urllib.parse import urlparse
+
+# manager methods that get a span of their own
+TRACED_METHODS = [
+    'crawl_subgroups',
+    'groups',
+    'list_groups',
+    'list_projects',
+    'merge_requests',
+    'projects',
+    'check',
+]
+
+
+class Tracer:
+    """
+    Collects spans, each with a start time and duration on the thread it
+    ran in. Spans on a thread nest by time, so HTTP requests show up within
+    the manager method that made them, and concurrent work in parallel
+    rows.
+    """
+
+    def __init__(self):
+        """An empty trace, starting now."""
+        self.started = perf_counter()
+        self.events = []
+        self.threads = set()
+        self.lock = Lock()
+
+    def add(self, name, category, start, end, **args):
+        """Add a span, with start and end times from ``perf_counter()``."""
+        thread_id = get_ident()
+        with self.lock:
+            if thread_id not in self.threads:
+                self.threads.add(thread_id)
+                self.events.append({
+                    'name': 'thread_name', 'ph': 'M', 'pid': os.getpid(),
+                    'tid': thread_id, 'args': {'name': current_thread().name},
+                })
+            self.events.append({
+                'name': name, 'cat': category, 'ph': 'X',
+                'ts': round((start - self.started) * 1e6),
+                'dur': round((end - start) * 1e6),
+                'pid': os.getpid(), 'tid': thread_id, 'args': args,
+            })
+
+    @contextmanager
+    def span(self, name, category, **args):
+        """A span lasting as long as the context."""
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, category, start, perf_counter(), **args)
+
+    def traced(self, function, name):
+        """
+        A function wrapped in a span. Generator functions are traced from
+        their first to their last item.
+        """
+        if isgeneratorfunction(function):
+            @wraps(function)
+            def traced_generator(*args, **kwargs):
+                with self.span(name, 'manager'):
+                    yield from function(*args, **kwargs)
+            return traced_generator
+
+        @wraps(function)
+        def traced_function(*args, **kwargs):
+            with self.span(name, 'manager'):
+                return function(*args, **kwargs)
+        return traced_function
+
+    def instrument(self, manager):
+        """Trace the methods of a manager that enumerate or check items."""
+        for name in TRACED_METHODS:
+            method = getattr(manager, name, None)
+            if callable(method):
+                setattr(manager, name, self.traced(
+                    method, f"{type(manager).__name__}.{name}"))
+
+    def install(self, api):
+        """Trace all HTTP requests of a python-gitlab client."""
+        if self.record not in api.session.hooks['response']:
+            api.session.hooks['response'].append(self.record)
+
+    def record(self, response, *_, **kwargs):
+        """Add a span for an HTTP request, from sending until received."""
+        start = perf_counter() - response.elapsed.total_seconds()
+        size = 0 if kwargs.get('stream') else len(response.content)
+        self.add(f"{response.request.method}"
+                 f" {urlparse(response.request.url).path}",
+                 'http', start, perf_counter(),
+                 status=response.status_code, bytes=size)
+
+    def save(self, path):
+        """Write the trace into a file."""
+        with self.lock:
+            events = list(self.events)
+        with open(path, 'w', encoding='utf-8') as trace:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'},
+                      trace)
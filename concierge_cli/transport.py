@@ -0,0 +1,106 @@
+"""
+HTTP transport settings and statistics for GitLab API calls.
+"""
+import sys
+
+from threading import Lock
+
+from requests.adapters import HTTPAdapter
+
+# encodings requests can decode without extra packages
+COMPRESSED_ENCODINGS = ['gzip', 'deflate']
+
+
+class Transport:  # pylint: disable=too-many-instance-attributes
+    """
+    Configures the connection pool, keep-alive, compression and timeouts
+    of a python-gitlab client's HTTP session, and collects statistics about
+    the responses received.
+    """
+
+    def __init__(self, pool_size=None, keep_alive=True, compression=True,
+                 connect_timeout=None, read_timeout=None):
+        """
+        Keep up to ``pool_size`` connections per host open (by default, as
+        many as API calls are made concurrently) and wait for a free one
+        instead of opening extra connections. Ask for compressed responses
+        unless ``compression`` is off. Timeouts are in seconds.
+        """
+        self.pool_size = pool_size
+        self.keep_alive = keep_alive
+        self.compression = compression
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+
+        self.adapter = None
+        self.reported_connections = 0
+        self.response_count = 0
+        self.compressed_count = 0
+        self.wire_bytes = 0
+        self.content_bytes = 0
+        self.lock = Lock()
+
+    def install(self, api, workers):
+        """Apply the settings to the HTTP session of a python-gitlab client."""
+        self.adapter = HTTPAdapter(pool_maxsize=self.pool_size or workers,
+                                   pool_block=True)
+        api.session.mount('https://', self.adapter)
+        api.session.mount('http://', self.adapter)
+
+        api.session.headers['Accept-Encoding'] = \
+            ', '.join(COMPRESSED_ENCODINGS) if self.compression \
+            else 'identity'
+        api.session.headers['Connection'] = \
+            'keep-alive' if self.keep_alive else 'close'
+
+        if self.connect_timeout or self.read_timeout:
+            api.timeout = (self.connect_timeout, self.read_timeout)
+
+        api.session.hooks['response'].append(self.record)
+
+    def record(self, response, *_, **kwargs):
+        """Count a response, its size on the wire and once decoded."""
+        if kwargs.get('stream'):
+            return
+        content_bytes = len(response.content)
+        wire_bytes = response.raw.tell() if response.raw else content_bytes
+        encoding = response.headers.get('Content-Encoding', '')
+
+        with self.lock:
+            self.response_count += 1
+            self.compressed_count += encoding in COMPRESSED_ENCODINGS
+            self.wire_bytes += wire_bytes
+            self.content_bytes += content_bytes
+
+    @property
+    def connection_count(self):
+        """Number of connections opened so far, in all pools."""
+        if not self.adapter:
+            return 0
+        pools = self.adapter.poolmanager.pools
+        return sum(pools[key].num_connections for key in pools.keys())
+
+    def report(self):
+        """
+        Display transport statistics since the last report on stderr, and
+        warn when compressed responses were asked for but none came back
+        compressed.
+        """
+        if not self.response_count:
+            return
+        connection_count = self.connection_count
+        print(f"{self.response_count} responses over"
+              f" {connection_count - self.reported_connections} new"
+              " connections,"
+              f" {self.compressed_count} compressed:"
+              f" {self.wire_bytes / 1024:.1f} KiB received,"
+              f" {self.content_bytes / 1024:.1f} KiB decoded.",
+              file=sys.stderr)
+        if self.compression and not self.compressed_count:
+            print("Warning: No response came back compressed. A proxy may"
+                  " be removing compression.", file=sys.stderr)
+
+        with self.lock:
+            self.reported_connections = connection_count
+            self.response_count = self.compressed_count = 0
+            self.wire_bytes = self.content_bytes = 0
@@ -0,0 +1,103 @@
+"""
+Receiver for GitLab webhook events, for merging as soon as an MR is ready.
+"""
+import json
+
+from hmac import compare_digest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from queue import Empty, Queue
+from threading import Thread
+
+
+def parse_event(payload):
+    """
+    The merge requests a webhook event may have made mergeable, as a
+    project ID and filters for listing them, or None. Merge request events
+    of open MRs and events of succeeded pipelines are of interest.
+    """
+    project_id = (payload.get('project') or {}).get('id')
+    attributes = payload.get('object_attributes') or {}
+
+    if payload.get('object_kind') == 'merge_request':
+        if attributes.get('state') != 'opened':
+            return None
+        return project_id, {'iids': [attributes['iid']]}
+
+    if payload.get('object_kind') == 'pipeline':
+        if attributes.get('status') != 'success':
+            return None
+        if payload.get('merge_request'):
+            return project_id, {'iids': [payload['merge_request']['iid']]}
+        return project_id, {'source_branch': attributes['ref']}
+
+    return None
+
+
+class WebhookServer(HTTPServer):
+    """
+    An HTTP server receiving GitLab webhook events (see Settings > Webhooks
+    of a group or project), and queueing the ones of interest. Events must
+    carry the secret token, if one is set.
+    """
+
+    def __init__(self, port, secret=None):
+        """Listen on a port of all interfaces (0 picks a free port)."""
+        self.secret = secret
+        self.queue = Queue()
+        super().__init__(('', port), WebhookHandler)
+
+    @property
+    def port(self):
+        """The port listened on."""
+        return self.server_address[1]
+
+    def __enter__(self):
+        Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+        self.server_close()
+
+    def events(self, limit=None, timeout=None):
+        """
+        Events received, as (project ID, filters), until ``limit`` events
+        are received or none is received for ``timeout`` seconds, if set.
+        """
+        while limit is None or limit > 0:
+            try:
+                yield self.queue.get(timeout=timeout)
+            except Empty:
+                return
+            if limit is not None:
+                limit -= 1
+
+
+class WebhookHandler(BaseHTTPRequestHandler):
+    """Receives a webhook event."""
+
+    def receive(self):
+        """Queue an event of interest, answer all valid events with 200."""
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length)
+
+        if self.server.secret and not compare_digest(
+                self.headers.get('X-Gitlab-Token', ''), self.server.secret):
+            self.send_error(401, 'Invalid token')
+            return
+        try:
+            event = parse_event(json.loads(body))
+        except (ValueError, KeyError, AttributeError):
+            self.send_error(400, 'Invalid event')
+            return
+
+        if event:
+            self.server.queue.put(event)
+        self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    do_POST = receive
+
+    def log_message(self, *_):
+        """Don't log requests."""
@@ -0,0 +1,12 @@
+"""
+Shared helpers for concierge-cli's tests
+"""
+from types import SimpleNamespace
+
+
+def mock_project(project_id, path, topics=()):
+    """Fake group project API object, as listed with ``simple=True``."""
+    attributes = dict(id=project_id, name=path.title(), path=path,
+                      path_with_namespace=f"puppet/{path}",
+                      tag_list=list(topics))
+    return SimpleNamespace(id=project_id, attributes=attributes)
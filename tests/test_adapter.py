@@ -1,16 +1,15 @@
 """
 Tests for concierge-cli's adapter classes
 """
-# from gitlab.v4.objects import (
-#     Group as Gitlab_Group,
-#     GroupMember as Gitlab_GroupMember,
-# )
+import pytest
+
+from gitlab import GitlabGetError, GitlabUpdateError
 from unittest.mock import Mock, patch
 
 from concierge_cli.manager import GitlabAPI
 from concierge_cli.adapter import (
-    # GITLAB_PERMISSIONS,
-    # GroupMembership,
+    GITLAB_PERMISSIONS,
+    GroupMembership,
     Project,
 )
 
@@ -63,6 +62,40 @@ def test_project_set_topics(mock_project):
     assert project.topic_count == len(new_topics)
 
 
+def test_project_set_topics_verified():
+    """
+    Is an update raised as failed when GitLab returns other topics, and
+    are the topics kept as GitLab stores them?
+    """
+    def save():
+        project.project.tag_list = ['foo']
+
+    project = Project(api=Mock(), project=mock_group_project())
+    project.api.projects.get.return_value.save.side_effect = save
+
+    project.set_topics([' foo ', '', 'foo'])
+    assert project.topic_list == ['foo']
+
+    with pytest.raises(GitlabUpdateError):
+        project.set_topics(['foo', 'bar'])
+    assert project.topic_list == ['foo']
+
+
+def test_project_set_topics_existing_spelling():
+    """
+    Is an update accepted when GitLab keeps the spelling of an existing
+    topic, and is that spelling kept?
+    """
+    def save():
+        project.project.tag_list = ['Puppet', 'Web']
+
+    project = Project(api=Mock(), project=mock_group_project())
+    project.api.projects.get.return_value.save.side_effect = save
+
+    project.set_topics(['puppet', 'web', 'WEB'])
+    assert project.topic_list == ['Puppet', 'Web']
+
+
 def test_project_get_mergerequests():
     """
     Does method invoke list() on the API's mergerequests manager?
@@ -76,67 +109,81 @@ def test_project_get_mergerequests():
     assert mock_mergerequests_list.called
 
 
+def mock_group_membership(access_level=None):
+    """A group membership of a user with a mocked API"""
+    group = Mock(id=7, full_path='foo/bar')
+    if access_level:
+        group.members.get.return_value = Mock(access_level=access_level)
+    else:
+        group.members.get.side_effect = GitlabGetError(response_code=404)
+
+    user = Mock(id=23, username='test.user')
+    api = Mock()
+    return GroupMembership(api=api, group=group, user=user)
+
+
+def test_project_keeps_no_api_objects():
+    """
+    Does a project adapter only hold its own fields?
+    """
+    project = Project(api=mock_gitlab_api_projects(),
+                      project=mock_group_project())
+
+    assert not hasattr(project, '__dict__')
+    assert project.project_id == 42
+    assert project.name == 'foo/bar'
+
+
 def test_groupmembership_join():
     """
     Is a non-member promoted to a member on the API endpoint and the object?
-    # TODO: patch GroupMembership.group.members.get()
-    """
-    # start with a non-member
-#     with patch.object(Gitlab_Group, 'members') as mock_members:
-#         group_user = GroupMembership(group=None, user=None)
-#         group_user.member = None
-#         group_user.is_member = False
-#         group_user.access_level = None
-#
-#     with patch.object(Gitlab_Group, 'members') as mock_members:
-#         group_user.set_membership('maintainer')
-#
-#         assert mock_members.assert_called('create') is None
-#         assert group_user.is_member
-#         assert group_user.access_level == 'maintainer'
-#         assert group_user.member.access_level == \
-#             GITLAB_PERMISSIONS['maintainer']
+    """
+    group_user = mock_group_membership()
+    assert not group_user.is_member
+    assert group_user.access_level is None
+
+    assert group_user.set_membership('maintainer') == \
+        "Group foo/bar: Adding test.user with access level 'maintainer'"
+
+    members = group_user.api.groups.get.return_value.members
+    assert group_user.api.groups.get.call_args[0] == (7,)
+    assert members.create.call_args[0] == ({
+        'user_id': 23,
+        'access_level': GITLAB_PERMISSIONS['maintainer'],
+    },)
+    assert group_user.is_member
+    assert group_user.access_level == 'maintainer'
 
 
 def test_groupmembership_update():
     """
     Is a member access level updated on the API endpoint and the object?
-    # TODO: patch GroupMembership.group.members.get()
-    """
-    # start with a member
-#     with patch.object(Gitlab_Group, 'members') as mock_members:
-#         group_user = GroupMembership(group=None, user=None)
-#         group_user.is_member = True
-#         group_user.access_level = 'maintainer'
-#         group_user.member = Mock('gitlab.v4.objects.GroupMember')
-#         group_user.member.access_level = GITLAB_PERMISSIONS['maintainer']
-#
-#     with patch.object(Gitlab_GroupMember, 'save') as mock_member_save:
-#         group_user.set_membership('owner')
-#
-#         assert mock_member_save.called
-#         assert group_user.is_member
-#         assert group_user.access_level == 'owner'
-#         assert group_user.member.access_level == GITLAB_PERMISSIONS['owner']
+    """
+    group_user = mock_group_membership(GITLAB_PERMISSIONS['maintainer'])
+    assert group_user.is_member
+    assert group_user.access_level == 'maintainer'
+
+    assert group_user.set_membership('owner') == \
+        "Group foo/bar: Updating access level: 'maintainer' -> 'owner'"
+    assert group_user.set_membership('owner') is None
+
+    members = group_user.api.groups.get.return_value.members
+    assert members.update.call_args[0] == (23, {
+        'access_level': GITLAB_PERMISSIONS['owner'],
+    })
+    assert group_user.is_member
+    assert group_user.access_level == 'owner'
 
 
 def test_groupmembership_withdraw():
     """
     Is a membership withdrawn on the API endpoint and the object?
-    # TODO: patch GroupMembership.group.members.get()
-    """
-    # start with a member
-#     with patch.object(Gitlab_Group, 'members') as mock_members:
-#         group_user = GroupMembership(group=None, user=None)
-#         group_user.is_member = True
-#         group_user.access_level = 'maintainer'
-#         group_user.member = Mock('gitlab.v4.objects.GroupMember')
-#         group_user.member.access_level = GITLAB_PERMISSIONS['maintainer']
-#
-#     with patch.object(Gitlab_GroupMember, 'delete') as mock_member_delete:
-#         group_user.set_membership('none')
-#
-#         assert mock_member_delete.called
-#         assert not group_user.member
-#         assert not group_user.is_member
-#         assert group_user.access_level == 'none'
+    """
+    group_user = mock_group_membership(GITLAB_PERMISSIONS['maintainer'])
+
+    group_user.set_membership('none')
+
+    members = group_user.api.groups.get.return_value.members
+    assert members.delete.call_args[0] == (23,)
+    assert not group_user.is_member
+    assert str(group_user) == 'Group foo/bar: test.user is not a member.'
@@ -0,0 +1,133 @@
+"""
+Tests for concierge-cli's recording and replay of HTTP exchanges
+"""
+import json
+
+from click.testing import CliRunner
+
+from concierge_cli.cassette import (
+    Recorder,
+    ReplayServer,
+    request_key,
+    scrub,
+)
+from concierge_cli.cli import concierge_cli
+from concierge_cli.manager import TopicManager
+
+
+def interaction(request, body, **headers):
+    """A recorded exchange, answered with a JSON body."""
+    return dict(request=request, status=200, body=json.dumps(body),
+                headers=dict(headers, **{'Content-Type': 'application/json'}),
+                elapsed=0.01)
+
+
+def group(group_id):
+    """JSON representation of a group."""
+    return dict(id=group_id, name=f"Group {group_id}",
+                path=f"group{group_id}", full_path=f"group{group_id}")
+
+
+def project(project_id, group_id, topics):
+    """Minimal JSON representation of a project."""
+    return dict(id=project_id, name=f"Project {project_id}",
+                path_with_namespace=f"group{group_id}/project{project_id}",
+                tag_list=topics, runners_token='secret')
+
+
+def write_cassette(path):
+    """A cassette with two pages of groups, and one project per group."""
+    interactions = [
+        interaction('GET /api/v4/groups?per_page=100&search=',
+                    [group(1)], Link='</api/v4/groups?page=2&per_page=100'
+                                     '&search=>; rel="next"'),
+        interaction('GET /api/v4/groups?page=2&per_page=100&search=',
+                    [group(2)]),
+        interaction('GET /api/v4/groups/1/projects'
+                    '?per_page=100&search=&simple=True',
+                    [project(11, 1, [])]),
+        interaction('GET /api/v4/groups/2/projects'
+                    '?per_page=100&search=&simple=True',
+                    [project(21, 2, ['Puppet'])]),
+    ]
+    path.write_text(json.dumps(dict(interactions=interactions)))
+
+
+def test_request_key():
+    """
+    Are query parameters sorted, and tokens in them scrubbed?
+    """
+    assert request_key('get', 'https://gitlab.example.com/api/v4/groups'
+                              '?search=foo&private_token=abc&all=1') == \
+        'GET /api/v4/groups?all=1&private_token=%5Bscrubbed%5D&search=foo'
+
+
+def test_scrub():
+    """
+    Are secret fields scrubbed at any level?
+    """
+    assert scrub([{'id': 1, 'runners_token': 'abc',
+                   'owner': {'password': 'x'}}]) == \
+        [{'id': 1, 'runners_token': '[scrubbed]',
+          'owner': {'password': '[scrubbed]'}}]
+
+
+def test_replay_topics(tmp_path, capsys):
+    """
+    Does topics make exactly the API calls recorded, no more?
+    """
+    cassette = tmp_path / 'topics.json'
+    write_cassette(cassette)
+
+    with ReplayServer(str(cassette)) as server:
+        TopicManager(group_filter='', project_filter='', empty=False,
+                     uri=server.uri, token='secret').show()
+
+    assert capsys.readouterr().out == \
+        "1 topics in group2/project21: 'Puppet'\n"
+    assert server.request_count == 4
+    assert server.unrecorded == []
+
+
+def test_record_replayed(tmp_path):
+    """
+    Does recording a replayed run give the same cassette, with relative
+    links and scrubbed tokens?
+    """
+    cassette = tmp_path / 'topics.json'
+    recording = tmp_path / 'recording.json'
+    write_cassette(cassette)
+    recorder = Recorder()
+
+    with ReplayServer(str(cassette), latency=0.01) as server:
+        topic_manager = TopicManager(group_filter='', project_filter='',
+                                     empty=True, uri=server.uri,
+                                     token='secret')
+        recorder.install(topic_manager.api)
+        list(topic_manager.projects())
+    recorder.save(str(recording))
+
+    original = json.loads(cassette.read_text())['interactions']
+    recorded = json.loads(recording.read_text())['interactions']
+    assert [entry['request'] for entry in recorded] == \
+        [entry['request'] for entry in original]
+    assert recorded[0]['headers']['Link'] == original[0]['headers']['Link']
+    assert recorded[0]['elapsed'] >= 0.01
+    assert json.loads(recorded[2]['body'])[0]['runners_token'] == \
+        '[scrubbed]'
+
+
+def test_cli_replay(tmp_path):
+    """
+    Does --replay run a command against the cassette and report on it?
+    """
+    cassette = tmp_path / 'topics.json'
+    write_cassette(cassette)
+
+    result = CliRunner().invoke(concierge_cli, [
+        'gitlab', '--replay', str(cassette), '--replay-latency', 'original',
+        'topics', '--no-empty'])
+
+    assert result.exit_code == 0
+    assert "1 topics in group2/project21: 'Puppet'" in result.output
+    assert '4 requests replayed in ' in result.output
@@ -6,9 +6,10 @@ import pytest
 
 from cli_test_helpers import ArgvContext, EnvironContext
 from click.testing import CliRunner
+from datetime import datetime, timedelta, timezone
 from gitlab.exceptions import GitlabError
 from requests.exceptions import RequestException
-from unittest.mock import call, patch
+from unittest.mock import ANY, call, patch
 
 import concierge_cli.cli
 
@@ -79,7 +80,9 @@ def test_gitlab_envvar_defaults(mock_manager):
     Are env variable defaults used if set the related values?
     """
     expected_call = call(
-        group_filter='', insecure=False, is_member=False,
+        group_filter='', insecure=False, is_member=False, journal=None,
+        progress=None, shard=None, subgroups=False, snapshot=None,
+        retry_policy=ANY, session=None, transport=ANY,
         token='secret-access-token',
         uri=concierge_cli.constants.GITLAB_DEFAULT_URI,
         username='my.user.name')
@@ -97,7 +100,9 @@ def test_gitlab_envvars(mock_manager):
     Do env variables set the related values?
     """
     expected_call = call(
-        group_filter='', insecure=False, is_member=False,
+        group_filter='', insecure=False, is_member=False, journal=None,
+        progress=None, shard=None, subgroups=False, snapshot=None,
+        retry_policy=ANY, session=None, transport=ANY,
         token='secret-access-token',
         uri='https://git.example.com/',
         username='my.user.name')
@@ -109,6 +114,61 @@ def test_gitlab_envvars(mock_manager):
     assert mock_manager.mock_calls[0] == expected_call
 
 
+@patch('concierge_cli.cli.ProjectManager')
+def test_gitlab_multiple_uris(mock_manager):
+    """
+    Is the command run against every GitLab host, with tagged output?
+    """
+    mock_manager.return_value.show.side_effect = \
+        lambda: print('- foo/bar')
+
+    result = launch_cli('gitlab',
+                        '--uri', 'https://git.example.com',
+                        '--uri', 'customer-gitlab',
+                        'projects')
+
+    assert sorted(kwargs['uri'] for _, kwargs in
+                  mock_manager.call_args_list) == [
+        'customer-gitlab',
+        'https://git.example.com',
+    ]
+    assert sorted(result.output.splitlines()) == [
+        '[customer-gitlab] - foo/bar',
+        '[git.example.com] - foo/bar',
+    ]
+
+
+@patch('concierge_cli.cli.ProjectManager')
+def test_gitlab_multiple_uris_token(mock_manager):
+    """
+    Is a single access token refused for several GitLab URLs?
+    """
+    result = launch_cli('gitlab', '--token', 'secret-access-token',
+                        '--uri', 'https://git.example.com',
+                        '--uri', 'https://gitlab.com', 'projects')
+
+    assert result.exit_code == 2
+    assert not mock_manager.called
+
+    launch_cli('gitlab', '--token', 'secret-access-token',
+               '--uri', 'https://git.example.com',
+               '--uri', 'customer-gitlab', 'projects')
+
+    assert mock_manager.call_count == 2
+
+
+@patch('concierge_cli.cli.MergeRequestManager')
+def test_gitlab_multiple_uris_interactive(mock_manager):
+    """
+    Is interactive merging refused for several GitLab hosts?
+    """
+    result = launch_cli('gitlab', '--uri', 'one', '--uri', 'two',
+                        'mrs', '--merge', 'yes')
+
+    assert result.exit_code == 2
+    assert not mock_manager.called
+
+
 def test_gitlab_mrs_command():
     """
     Is subcommand available?
@@ -147,6 +207,80 @@ def test_gitlab_mrs_merge_automatic(mock_manager):
     assert not mock_manager().show.called
 
 
+@patch('concierge_cli.cli.MergeRequestManager')
+def test_gitlab_mrs_filters(mock_manager):
+    """
+    Are MR filters passed on as API query parameters?
+    """
+    launch_cli('gitlab', 'mrs', 'some/project', '--author', 'renovate-bot',
+               '--target-branch', 'main', '--source-branch-prefix',
+               'renovate/', '--updated-after', '2024-03-01', '--draft')
+
+    kwargs = mock_manager.call_args[1]
+    assert kwargs['filters'] == {
+        'author_username': 'renovate-bot', 'target_branch': 'main',
+        'updated_after': '2024-03-01T00:00:00', 'wip': 'yes'}
+    assert kwargs['source_branch_prefix'] == 'renovate/'
+
+    launch_cli('gitlab', 'mrs', '--updated-after', '2024-03-01T12:30')
+    assert mock_manager.call_args[1]['filters']['updated_after'] == \
+        '2024-03-01T12:30:00'
+
+    launch_cli('gitlab', 'mrs', '--updated-after', '7d')
+    updated_after = datetime.strptime(
+        mock_manager.call_args[1]['filters']['updated_after'][:19],
+        '%Y-%m-%dT%H:%M:%S').replace(tzinfo=timezone.utc)
+    assert abs(datetime.now(timezone.utc) - timedelta(days=7) -
+               updated_after) < timedelta(minutes=1)
+
+    mock_manager.reset_mock()
+    result = launch_cli('gitlab', 'mrs', '--updated-after', 'last week')
+    assert result.exit_code == 2
+    assert not mock_manager.called
+
+
+@patch('concierge_cli.cli.MergeRequestManager')
+def test_gitlab_mrs_listen(mock_manager):
+    """
+    Does mrs --listen require a webhook secret?
+    """
+    result = launch_cli('gitlab', 'mrs', '--merge', 'automatic',
+                        '--listen', '8080')
+    assert result.exit_code == 2
+    assert not mock_manager.called
+
+    launch_cli('gitlab', 'mrs', '--merge', 'automatic', '--listen', '8080',
+               '--webhook-secret', 's3cret')
+    assert mock_manager().listen.call_args == call(8080, 's3cret')
+
+
+@patch('concierge_cli.cli.MergeRequestManager')
+def test_gitlab_mrs_queue(mock_manager):
+    """
+    Does mrs --queue pass a queue timeout, with automatic merging only?
+    """
+    launch_cli('gitlab', 'mrs', 'some/project', '--merge', 'automatic',
+               '--queue', '--queue-timeout', '600')
+    assert mock_manager.call_args[1]['queue_timeout'] == 600
+    assert mock_manager().merge_all.called
+
+    mock_manager.reset_mock()
+    result = launch_cli('gitlab', 'mrs', 'some/project', '--queue')
+    assert result.exit_code == 2
+    assert not mock_manager.called
+
+
+@patch('concierge_cli.cli.MergeRequestManager')
+def test_gitlab_mrs_watch(mock_manager):
+    """
+    Does mrs --watch trigger the manager's watch method?
+    """
+    launch_cli('gitlab', 'mrs', 'some/project', '--merge', 'automatic',
+               '--watch', '60')
+    assert mock_manager().watch.call_args == call(60)
+    assert not mock_manager().merge_all.called
+
+
 def test_gitlab_projects_command():
     """
     Is subcommand available?
@@ -190,6 +324,132 @@ def test_gitlab_topics_set(mock_manager):
     assert mock_manager().set.called
 
 
+@patch('concierge_cli.cli.GroupManager')
+@patch('concierge_cli.cli.TopicManager')
+def test_gitlab_estimate(mock_topics, mock_groups):
+    """
+    Does the estimate option run the estimate method instead of making
+    changes, and only for changes?
+    """
+    launch_cli('gitlab', 'topics', 'puppet/', '--set-topic', 'Puppet',
+               '--estimate')
+    assert mock_topics().estimate.call_args == call(['Puppet'])
+    assert not mock_topics().set.called
+
+    launch_cli('gitlab', 'groups', 'foo-user', '--set-permission',
+               'developer', '--estimate')
+    assert mock_groups().estimate.call_args == call('developer')
+    assert not mock_groups().set.called
+
+    mock_topics.reset_mock()
+    result = launch_cli('gitlab', 'topics', 'puppet/', '--estimate')
+    assert result.exit_code == 2
+    assert not mock_topics.called
+
+
+@patch('concierge_cli.cli.ExportManager')
+def test_gitlab_export(mock_manager):
+    """
+    Does export command run the manager's export method?
+    """
+    launch_cli('gitlab', 'export', 'inventory.sqlite', 'foo/')
+    assert mock_manager().export.call_args == call('inventory.sqlite')
+
+
+@patch('concierge_cli.cli.TopicManager')
+def test_gitlab_from_snapshot(mock_manager, tmp_path):
+    """
+    Is a snapshot passed on to the manager, and are writes refused?
+    """
+    snapshot = tmp_path / 'inventory.sqlite'
+    snapshot.touch()
+
+    launch_cli('gitlab', 'topics', '--from-snapshot', str(snapshot))
+    assert mock_manager.call_args[1]['snapshot'] == str(snapshot)
+    assert mock_manager().show.called
+
+    mock_manager.reset_mock()
+    result = launch_cli('gitlab', 'topics', '--from-snapshot', str(snapshot),
+                        '--set-topic', 'foo')
+    assert result.exit_code == 2
+    assert not mock_manager.called
+
+
+@patch('concierge_cli.cli.TopicManager')
+def test_gitlab_journal(mock_manager, tmp_path):
+    """
+    Is a journal passed on to the manager for changes only?
+    """
+    journal = tmp_path / 'topics.journal'
+
+    launch_cli('gitlab', 'topics', '--set-topic', 'foo',
+               '--journal', str(journal))
+    assert mock_manager.call_args[1]['journal'].path == str(journal)
+    assert mock_manager().set.called
+    assert journal.exists()
+
+    mock_manager.reset_mock()
+    result = launch_cli('gitlab', 'topics', '--journal', str(journal))
+    assert result.exit_code == 2
+    assert not mock_manager.called
+
+
+@patch('concierge_cli.cli.ProjectManager')
+@patch('concierge_cli.cli.TopicManager')
+def test_gitlab_batch(mock_topics, mock_projects, tmp_path):
+    """
+    Are all commands of a batch file run with one shared session?
+    """
+    batch_file = tmp_path / 'commands.txt'
+    batch_file.write_text('# tag puppet modules\n'
+                          'topics puppet/ --set-topic Puppet\n'
+                          '\n'
+                          'projects --topic Puppet\n')
+
+    result = launch_cli('gitlab', 'batch', str(batch_file))
+
+    assert result.exit_code == 0
+    assert mock_topics.call_args[1]['session'] is \
+        mock_projects.call_args[1]['session']
+    assert mock_topics().set.called
+    assert mock_projects().show.called
+    assert result.output.splitlines() == [
+        '$ topics puppet/ --set-topic Puppet',
+        '$ projects --topic Puppet',
+    ]
+
+    batch_file.write_text('batch other.txt\n')
+    result = launch_cli('gitlab', 'batch', str(batch_file))
+    assert result.exit_code == 2
+
+
+@patch('concierge_cli.cli.GroupManager')
+def test_gitlab_shard(mock_manager):
+    """
+    Is a shard passed on to the manager, and are bad shards refused?
+    """
+    launch_cli('gitlab', 'groups', 'foo-user', '--shard', '2/4')
+    assert mock_manager.call_args[1]['shard'] == (2, 4)
+
+    for shard in ['5/4', '0/4', 'two']:
+        mock_manager.reset_mock()
+        result = launch_cli('gitlab', 'groups', 'foo-user', '--shard', shard)
+        assert result.exit_code == 2
+        assert not mock_manager.called
+
+
+def test_merge_shards(tmp_path):
+    """
+    Are shard outputs combined in the order of the tags?
+    """
+    (tmp_path / 'shard1.txt').write_text('[1] two\n')
+    (tmp_path / 'shard2.txt').write_text('[0] one\n')
+
+    result = launch_cli('merge-shards', str(tmp_path / 'shard1.txt'),
+                        str(tmp_path / 'shard2.txt'))
+    assert result.output == 'one\ntwo\n'
+
+
 @patch('concierge_cli.cli.concierge_cli', side_effect=GitlabError)
 def test_handle_gitlab_errors(mock_cli):
     """
@@ -0,0 +1,162 @@
+"""
+Tests for concierge-cli's estimates of bulk changes
+"""
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest.mock import Mock, patch
+
+from requests import Session
+
+from concierge_cli.estimate import Estimate, FirstPage, format_duration
+from concierge_cli.manager import GroupManager, TopicManager
+
+from conftest import mock_project
+
+
+class ListingMock:
+    """Fake python-gitlab listing, with the first page received only."""
+
+    def __init__(self, items, total, total_pages, per_page):
+        self.items = items
+        self.total = total
+        self.total_pages = total_pages
+        self.per_page = per_page
+
+    def __iter__(self):
+        """Items of the first page, then of further pages (not expected)."""
+        yield from self.items
+        if self.total_pages > 1:
+            raise AssertionError('Further page requested')
+
+
+def mock_manager(*items, total=None, total_pages=1, per_page=100):
+    """Fake python-gitlab manager, listing a first page of items."""
+    manager = Mock()
+    manager.list.return_value = ListingMock(
+        list(items), len(items) if total is None else total, total_pages,
+        per_page)
+    return manager
+
+
+def mock_response(elapsed, **headers):
+    """Fake response taking some seconds, with headers."""
+    return Mock(elapsed=timedelta(seconds=elapsed), headers=headers)
+
+
+def test_first_page():
+    """
+    Is only the first page of a listing requested, with its totals?
+    """
+    manager = mock_manager(1, 2, total=5, total_pages=3, per_page=2)
+
+    page = FirstPage(manager, search='foo')
+
+    assert (page.items, page.total, page.pages) == ([1, 2], 5, 3)
+    assert manager.list.call_args[1] == dict(iterator=True, search='foo')
+
+
+def test_estimate_report(capsys):
+    """
+    Are requests summed up, and the duration bounded by the latency
+    observed and the rate limit?
+    """
+    estimate = Estimate()
+    api = SimpleNamespace(session=Session())
+    estimate.install(api)
+    estimate.install(api)
+    assert api.session.hooks['response'] == [estimate.record]
+
+    estimate.record(mock_response(0.5))
+    estimate.record(mock_response(1.5))
+    estimate.step('List things', 10)
+    estimate.step('Change things', 40, concurrency=4, write=True)
+    assert estimate.duration() == 20
+
+    estimate.record(mock_response(1.0, **{'RateLimit-Limit': '60',
+                                          'RateLimit-Remaining': '30'}))
+    assert estimate.duration() == 50
+    estimate.report()
+
+    assert capsys.readouterr().out == (
+        "Plan:\n"
+        "  1. List things (10 requests)\n"
+        "  2. Change things (40 requests)\n"
+        "Expected requests: 10 reads, 40 writes\n"
+        "Expected duration: 50s (1.00s per request, rate limit 60/min"
+        " with 30 left)\n"
+        "The run exceeds the requests left within the rate limit.\n"
+        "Estimated from 3 requests, extrapolating the first page of each"
+        " listing.\n")
+
+
+def test_format_duration():
+    """
+    Are durations shown in the largest units sensible?
+    """
+    assert format_duration(45.2) == '45s'
+    assert format_duration(192) == '3m 12s'
+    assert format_duration(3900) == '1h 05m'
+
+
+def test_topicmanager_estimate():
+    """
+    Are the expected listings and writes planned?
+    """
+    groups = [Mock(id=1, full_path='a'), Mock(id=2, full_path='b')]
+    groups[0].projects = mock_manager(
+        mock_project(11, 'p11', []), mock_project(12, 'p12', ['Puppet']),
+        total=10, total_pages=5, per_page=2)
+    groups[1].projects = mock_manager(mock_project(21, 'p21', []))
+    api = Mock()
+    api.groups = mock_manager(*groups, total=4, total_pages=2, per_page=2)
+
+    topic_manager = TopicManager(group_filter='', project_filter='',
+                                 empty=True, writers=2,
+                                 uri='https://some.gitlab.host')
+    topic_manager.api = api
+    with patch('concierge_cli.manager.Estimate') as mock_estimate:
+        topic_manager.estimate(['Puppet'])
+
+    steps = [step[0] + tuple(step[1].values())
+             for step in mock_estimate().step.call_args_list]
+    assert steps == [
+        ('List groups matching "": 4 groups', 2),
+        ('List the projects of each group: ~22 projects', 12),
+        ("Set topics ['Puppet'] on ~12 projects, 2 at a time", 12, 2, True),
+    ]
+    assert mock_estimate().report.called
+
+
+def test_groupmanager_estimate():
+    """
+    Are the subgroups crawled, membership lookups and writes planned for
+    the groups of our shard?
+    """
+    groups = [Mock(id=1, full_path='a'), Mock(id=2, full_path='a/b'),
+              Mock(id=3, full_path='c')]
+    groups[0].descendant_groups = mock_manager(
+        groups[1], Mock(), total=30, total_pages=1)
+    groups[2].descendant_groups = mock_manager(total=0)
+    api = Mock()
+    api.users.list.return_value = [Mock(username='my.user')]
+    api.groups = mock_manager(*groups, total=6, total_pages=2, per_page=3)
+
+    with patch('concierge_cli.manager.Gitlab', return_value=api):
+        group_manager = GroupManager(group_filter='', username='my.user',
+                                     is_member=False, workers=4,
+                                     shard=(1, 2), subgroups=True,
+                                     uri='https://some.gitlab.host')
+    with patch('concierge_cli.manager.Estimate') as mock_estimate:
+        group_manager.estimate('developer')
+
+    steps = [step[0] + tuple(step[1].values())
+             for step in mock_estimate().step.call_args_list]
+    assert steps == [
+        ('List groups matching "": 6 groups', 2),
+        ('Keep the topmost groups: ~4 groups',),
+        ('Crawl the subgroups of each group: ~60 subgroups', 4.0, 4),
+        ('Keep shard 1/2: ~32 groups',),
+        ('Look up the access level of my.user in each group', 32.0, 4),
+        ("Set access level 'developer' on up to 32 groups my.user is not"
+         " a member of", 32.0, 4, True),
+    ]
@@ -0,0 +1,31 @@
+"""
+Tests for concierge-cli's topic index
+"""
+from concierge_cli.index import TopicIndex
+
+
+def test_topic_index_update():
+    """
+    Does re-adding a project replace its topics in the index?
+    """
+    index = TopicIndex()
+    index.add(1, ['Puppet', 'Ansible'])
+    index.add(1, ['Ansible'])
+
+    assert index.frequency() == [('Ansible', 1)]
+    assert len(index) == 1
+
+
+def test_topic_index_stats():
+    """
+    Are topic frequency, co-occurrence and untagged projects counted?
+    """
+    index = TopicIndex()
+    index.add(1, ['Puppet', 'Ansible', 'Web'])
+    index.add(2, ['Puppet', 'Ansible'])
+    index.add(3, ['Puppet'])
+    index.add(4, [])
+
+    assert index.frequency() == [('Puppet', 3), ('Ansible', 2), ('Web', 1)]
+    assert index.cooccurrence()[0] == (('Ansible', 'Puppet'), 2)
+    assert index.untagged_count == 1
@@ -0,0 +1,208 @@
+"""
+Tests for concierge-cli's journal of bulk operations
+"""
+import json
+import pytest
+
+from unittest.mock import Mock, call, patch
+
+from gitlab.exceptions import GitlabUpdateError
+
+from concierge_cli.adapter import Project
+from concierge_cli.journal import Journal
+from concierge_cli.manager import TopicManager
+from concierge_cli.merging import MergeRequestManager
+
+from conftest import mock_project
+
+
+def dump(item):
+    """Record of a fake item."""
+    return {'id': item, 'name': f"item {item}"}
+
+
+def test_journal_without_path():
+    """
+    Are items passed through, and errors raised, when not journaling?
+    """
+    journal = Journal()
+    items = iter([1, 2])
+
+    assert journal.start('count', [], items, dump, None) is items
+    with pytest.raises(GitlabUpdateError), journal.record(1):
+        raise GitlabUpdateError('boom')
+
+
+def test_journal_resume(tmp_path):
+    """
+    Are completed items skipped on resume, failed ones retried, and is an
+    incomplete last line ignored, and not continued?
+    """
+    path = tmp_path / 'bulk.journal'
+    journal = Journal(str(path))
+
+    assert journal.start('count', ['a'], iter([1, 2, 3]), dump, None) == \
+        [1, 2, 3]
+    with journal.record(1):
+        pass
+    with pytest.raises(GitlabUpdateError), journal.record(2):
+        raise GitlabUpdateError('boom')
+    with path.open('a') as journal_file:
+        journal_file.write('{"done": 3, "na')
+
+    resumed = Journal(str(path), resume=True)
+    items = Mock(side_effect=AssertionError('enumerated again'))
+
+    assert resumed.completed == {1}
+    assert resumed.failed == {2: 'boom'}
+    assert resumed.start('count', ['a'], items, dump,
+                         lambda record: record['id'] * 10) == [20, 30]
+
+    with resumed.record(3):
+        pass
+
+    assert Journal(str(path), resume=True).completed == {1, 3}
+
+
+def test_journal_resume_other_operation(tmp_path):
+    """
+    Is resuming a journal with a different operation refused?
+    """
+    path = tmp_path / 'bulk.journal'
+    Journal(str(path)).start('count', ['a'], [1], dump, None)
+
+    with pytest.raises(ValueError):
+        Journal(str(path), resume=True).start('count', ['b'], [1], dump,
+                                              None)
+
+    other = tmp_path / 'other.txt'
+    other.write_text('hello\n')
+    with pytest.raises(ValueError):
+        Journal(str(other), resume=True)
+
+
+def test_topicmanager_set_resume(tmp_path, capsys):
+    """
+    Does a resumed topics update retry the failed project only, without
+    listing groups and projects again?
+    """
+    path = tmp_path / 'topics.journal'
+    api = Mock()
+    api.projects.get.return_value.save.side_effect = \
+        [None, GitlabUpdateError('boom')]
+    group = Mock()
+    group.projects.list.return_value = [
+        mock_project(11, 'apache', []),
+        mock_project(12, 'nginx', []),
+    ]
+    api.groups.list.return_value = [group]
+
+    topic_manager = TopicManager(group_filter='', project_filter='',
+                                 empty=True, journal=Journal(str(path)),
+                                 writers=1, uri='https://some.gitlab.host')
+    topic_manager.api = api
+
+    with pytest.raises(GitlabUpdateError):
+        topic_manager.set(['Puppet'])
+
+    entries = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [record['id'] for record in entries[0]['items']] == [11, 12]
+    assert entries[1:] == [
+        {'done': 11, 'name': 'puppet/apache'},
+        {'failed': 12, 'name': 'puppet/nginx', 'error': 'boom'},
+    ]
+
+    api.reset_mock()
+    api.projects.get.return_value.save.side_effect = None
+    topic_manager.journal = Journal(str(path), resume=True)
+    topic_manager.set(['Puppet'])
+
+    assert not api.groups.list.called
+    assert api.projects.get.call_args_list == [call(12, lazy=True)]
+    assert 'Resuming set_topics: 1 of 2 done, 1 failed before.' in \
+        capsys.readouterr().out
+
+
+def mock_merge_request(merge_request_id, iid):
+    """Fake merge request API object, with the fields journaled."""
+    return Mock(id=merge_request_id, iid=iid, project_id=1,
+                references={'full': f"puppet/apache!{iid}"})
+
+
+@patch.object(MergeRequestManager, 'check',
+              side_effect=['eligible', 'failed', 'unmergeable'])
+def test_mergerequestmanager_merge_journal(mock_check, tmp_path):
+    """
+    Are merged MRs only recorded as done, not the ones just reported?
+    """
+    path = tmp_path / 'merge.journal'
+    mr_manager = MergeRequestManager(group_filter='', project_filter='',
+                                     labels=[], merge_style='automatic',
+                                     journal=Journal(str(path)),
+                                     uri='https://some.gitlab.host')
+    mr_manager.merge_requests = Mock(return_value=[
+        mock_merge_request(101, 1),
+        mock_merge_request(102, 2),
+        mock_merge_request(103, 3),
+    ])
+
+    mr_manager.merge_all()
+
+    assert mock_check.call_count == 3
+    resumed = Journal(str(path), resume=True)
+    assert resumed.completed == {101}
+    assert not resumed.failed
+
+
+@patch.object(MergeRequestManager, 'check', return_value='eligible')
+def test_mergerequestmanager_merge_resume(mock_check, tmp_path, capsys):
+    """
+    Are MRs merged or closed since the interruption skipped on resume, and
+    recorded as done, instead of merged (which GitLab refuses)?
+    """
+    path = tmp_path / 'merge.journal'
+    mr_manager = MergeRequestManager(group_filter='', project_filter='',
+                                     labels=[], merge_style='automatic',
+                                     journal=Journal(str(path)),
+                                     uri='https://some.gitlab.host')
+    mr_manager.merge_requests = Mock(return_value=[
+        mock_merge_request(101, 1),
+        mock_merge_request(102, 2),
+        mock_merge_request(103, 3),
+    ])
+    mr_manager.journal.start('merge', {'labels': [],
+                                       'when_pipeline_succeeds': False},
+                             mr_manager.merge_requests(),
+                             mr_manager.dump_merge_request, None)
+
+    fetched = {iid: mock_merge_request(100 + iid, iid) for iid in [1, 2, 3]}
+    fetched[1].state = 'merged'
+    fetched[2].state = 'closed'
+    fetched[3].state = 'opened'
+    mr_manager.api = Mock()
+    mr_manager.api.projects.get.return_value.mergerequests.get.side_effect = \
+        fetched.get
+    mr_manager.journal = Journal(str(path), resume=True)
+
+    mr_manager.merge_all()
+
+    assert mock_check.call_args_list == [call(fetched[3])]
+    assert not fetched[1].merge.called
+    assert not fetched[2].merge.called
+    assert fetched[3].merge.called
+    output = capsys.readouterr().out
+    assert 'Skipping puppet/apache!1: ' in output
+    assert '✗ Already merged' in output
+    assert '✗ Already closed' in output
+    assert Journal(str(path), resume=True).completed == {101, 102, 103}
+
+
+def test_project_record():
+    """
+    Does a project restored from its record equal the original?
+    """
+    project = Project(None, mock_project(11, 'apache', ['Puppet']))
+    restored = Project.from_record(None, project.to_record())
+
+    assert restored.to_record() == project.to_record()
+    assert str(restored) == 'puppet/apache'
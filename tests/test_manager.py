@@ -1,8 +1,19 @@
 """
 Tests for concierge-cli's manager classes
 """
+import io
+import pytest
+
+from concurrent.futures import ThreadPoolExecutor
 from gitlab import Gitlab
 from gitlab.config import GitlabConfigMissingError
+from gitlab.exceptions import (
+    GitlabCreateError,
+    GitlabGetError,
+    GitlabMRClosedError,
+)
+from requests.exceptions import ConnectionError as RequestsConnectionError
+from time import sleep
 from unittest.mock import call, patch, Mock
 from urllib3.exceptions import InsecureRequestWarning
 
@@ -10,10 +21,14 @@ from concierge_cli.manager import (
     # GITLAB_DEFAULT_URI,
     GitlabAPI,
     GroupManager,
-    MergeRequestManager,
     ProjectManager,
     TopicManager,
+    in_shard,
+    topmost_groups,
 )
+from concierge_cli.merging import MergeRequestManager, parse_selection
+from concierge_cli.output import merge_shards, tagged_stdout
+from concierge_cli.transport import Transport
 
 TEST_URI = 'https://some.gitlab.host'
 TEST_TOKEN = '1234567890abcdefghijklmnopqrstuvwxyz'
@@ -31,6 +46,9 @@ def mock_ref(iid):
 
 class MergeRequestMock:
     """Fake merge request API object."""
+    iid = 42
+    project_id = 1
+    sha = 'abcdef'
     labels = []
     merge_status = 'can_be_merged'
     pipelines = mock_pipelines('success', 'failed')
@@ -70,6 +88,16 @@ def test_gitlabapi_no_uri_without_config(mock_gitlab, mock_from_config):
 #                                           per_page=100) is None
 
 
+@patch.object(Gitlab, 'from_config')
+def test_gitlabapi_config_section(mock_from_config):
+    """
+    Is an URI without a scheme used as a python-gitlab config section?
+    """
+    GitlabAPI(uri='customer-gitlab', token=None, insecure=False)
+
+    assert mock_from_config.call_args == call('customer-gitlab')
+
+
 @patch('gitlab.Gitlab')
 def test_gitlabapi_uri(mock_gitlab):
     """
@@ -95,11 +123,53 @@ def test_gitlabapi_insecure(mock_gitlab, mock_filterwarnings):
     assert api.api.ssl_verify is False
 
 
+def test_gitlabapi_shared_client_and_executor():
+    """
+    Are a python-gitlab client and an executor supplied used, and the
+    executor left running?
+    """
+    group = Mock(id=1, full_path='puppet')
+    group.projects.list.return_value = [Mock(id=11, attributes=dict(
+        path_with_namespace='puppet/apache', tag_list=['Puppet']))]
+    api = Mock()
+    api.groups.list.return_value = [group]
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        project_manager = ProjectManager(group_filter='', project_filter='',
+                                         topic_list=[], api=api,
+                                         executor=executor)
+        with project_manager.pool() as pool:
+            assert pool is executor
+
+        assert project_manager.api is api
+        assert list(project_manager.records()) == [
+            (11, 'puppet/apache', ['Puppet'])]
+        assert executor.submit(sum, [1, 2]).result() == 3
+
+
+def test_gitlabapi_pool_size_writers():
+    """
+    Is the connection pool sized for the writers, when there are more
+    writers than workers?
+    """
+    transport = Transport()
+    topic_manager = TopicManager(group_filter='', project_filter='',
+                                 empty=True, uri=TEST_URI, workers=4,
+                                 writers=12, transport=transport)
+
+    assert topic_manager.writers == 12
+    assert transport.adapter._pool_maxsize == 12
+
+
+@patch('builtins.print')
 @patch('concierge_cli.adapter.Project')
-def test_topicmanager_show(mock_project):
+def test_topicmanager_show(mock_project, mock_print):
     """
     Is the show() method iterating over the list of projects?
     """
+    mock_project.name = 'puppet/apache'
+    mock_project.topic_list = ['Puppet', 'Apache']
+
     with patch.object(TopicManager, 'projects', return_value=[
         mock_project,
         mock_project,
@@ -118,13 +188,15 @@ def test_topicmanager_show(mock_project):
 
         topic_manager.show()
         assert mock_manager_projects.called
-        assert mock_project.show_topics.call_count == 3
+        assert mock_print.mock_calls == 3 * [
+            call("2 topics in puppet/apache: 'Puppet', 'Apache'")]
 
 
 @patch('concierge_cli.adapter.Project')
 def test_topicmanager_set(mock_project):
     """
-    Is the set() method iterating over the list of projects?
+    Is the set() method iterating over the list of projects, updating a
+    project found several times once?
     """
     with patch.object(TopicManager, 'projects', return_value=[
         mock_project,
@@ -144,14 +216,17 @@ def test_topicmanager_set(mock_project):
 
         topic_manager.set([None])
         assert mock_manager_projects.called
-        assert mock_project.set_topics.call_count == 3
+        assert mock_project.set_topics.call_count == 1
 
 
+@patch('builtins.print')
 @patch('concierge_cli.adapter.Project')
-def test_projectmanager_show(mock_project):
+def test_projectmanager_show(mock_project, mock_print):
     """
     Is the show() method iterating over the list of projects?
     """
+    mock_project.name = 'puppet/apache'
+
     with patch.object(ProjectManager, 'projects', return_value=[
         mock_project,
         mock_project,
@@ -170,6 +245,7 @@ def test_projectmanager_show(mock_project):
 
         project_manager.show()
         assert mock_manager_projects.called
+        assert mock_print.mock_calls == 3 * [call('- puppet/apache')]
 
 
 def test_projectmanager_projects_list_args():
@@ -202,7 +278,7 @@ def test_projectmanager_projects_list_args():
         call(search='foo', all=True)
     ]
     assert mock_projects_list.call_args_list == [
-        call(search='bar', all=True, archived=False)
+        call(search='bar', all=True, simple=True, archived=False)
     ]
 
 
@@ -235,17 +311,18 @@ def test_mergerequestmanager_show(mock_manager_merge_requests, mock_print):
 
 
 @patch('builtins.print')
-@patch('builtins.input', return_value='y')
+@patch('builtins.input', side_effect=['7', '2'])
 @patch.object(MergeRequestMock, 'merge')
 @patch.object(MergeRequestManager, 'merge_requests', return_value=[
     MergeRequestMock(title='Foo', references=mock_ref(3)),
     MergeRequestMock(title='Bar', merge_status='cannot_be_merged'),
     MergeRequestMock(title='Baz', references=mock_ref(17), pipelines=mock_pipelines('failed')),  # noqa
+    MergeRequestMock(title='Qux', references=mock_ref(21)),
 ])
 def test_mergerequestmanager_merge_yes(mock_manager_merge_requests,
                                        mock_merge, mock_input, mock_print):
     """
-    Does merge_all() method call merge_requests() and input() and print()?
+    Does merge_all() show a table of mergeable MRs and merge the selection?
     """
     mr_manager = MergeRequestManager(
         group_filter='',
@@ -257,18 +334,34 @@ def test_mergerequestmanager_merge_yes(mock_manager_merge_requests,
 
     mr_manager.merge_all()
     assert mock_manager_merge_requests.called
-    assert mock_input.mock_calls == [
-        call('Proceed with merging ✓✓ mockedgroup/mockedproject!3: Foo ? (y/n) [n] '),  # noqa
-    ]
-    assert mock_merge.called
+    assert mock_input.call_count == 2
+    assert mock_merge.call_count == 1
     assert mock_print.mock_calls == [
         call('Merging merge requests:'),
         call("Ignoring mockedgroup/mockedproject!42: Bar ✗ Can't be merged"),
         call('Skipping mockedgroup/mockedproject!17: Baz ✗ Pipeline not succeeded'),  # noqa
+        call('   1 ✓✓ mockedgroup/mockedproject!3: Foo'),
+        call('   2 ✓✓ mockedgroup/mockedproject!21: Qux'),
+        call('Out of range (1-2): 7'),
+        call('Merging mockedgroup/mockedproject!21: Qux'),
         call('1 MRs merged.'),
     ]
 
 
+def test_parse_selection():
+    """
+    Are indices, ranges, "all" and an empty answer turned into indices?
+    """
+    assert parse_selection('', 5) == []
+    assert parse_selection('all', 3) == [1, 2, 3]
+    assert parse_selection('4, 1-2,2', 5) == [1, 2, 4]
+
+    with pytest.raises(ValueError):
+        parse_selection('1-x', 5)
+    with pytest.raises(ValueError):
+        parse_selection('0', 5)
+
+
 @patch('builtins.print')
 @patch.object(MergeRequestMock, 'merge')
 @patch.object(MergeRequestManager, 'merge_requests', return_value=[
@@ -301,6 +394,152 @@ def test_mergerequestmanager_merge_automatic(mock_manager_merge_requests,
     ]
 
 
+@patch('builtins.print')
+@patch.object(MergeRequestManager, 'merge_requests', return_value=[
+    MergeRequestMock(title='Foo', references=mock_ref(3)),
+    MergeRequestMock(title='Baz', references=mock_ref(17), pipelines=mock_pipelines('running')),  # noqa
+    MergeRequestMock(title='Qux', references=mock_ref(21), pipelines=mock_pipelines('failed')),  # noqa
+])
+def test_mergerequestmanager_merge_when_pipeline_succeeds(
+        mock_manager_merge_requests, mock_print):
+    """
+    Are MRs with a running pipeline handed over to GitLab for merging?
+    """
+    mr_manager = MergeRequestManager(
+        group_filter='',
+        project_filter='',
+        labels=[],
+        merge_style='automatic',
+        when_pipeline_succeeds=True,
+    )
+
+    with patch.object(MergeRequestMock, 'merge') as mock_merge:
+        mr_manager.merge_all()
+
+    assert mock_merge.call_args_list == [
+        call(should_remove_source_branch=True),
+        call(should_remove_source_branch=True,
+             merge_when_pipeline_succeeds=True),
+    ]
+    assert mock_print.mock_calls == [
+        call('Merging merge requests:'),
+        call('Merging mockedgroup/mockedproject!3: Foo'),
+        call('Merging mockedgroup/mockedproject!17: Baz when pipeline succeeds'),  # noqa
+        call('Skipping mockedgroup/mockedproject!21: Qux ✗ Pipeline not succeeded'),  # noqa
+        call('1 MRs merged.'),
+        call('1 MRs set to merge when pipeline succeeds.'),
+    ]
+
+
+@patch('builtins.print')
+@patch('concierge_cli.merging.sleep')
+@patch.object(MergeRequestMock, 'merge')
+def test_mergerequestmanager_watch(mock_merge, mock_sleep, mock_print):
+    """
+    Does watch() list projects once, then poll only for updated MRs and
+    re-check MRs waiting for a pipeline, or for their merge status?
+    """
+    unchecked_mr = MergeRequestMock(title='Qux', iid=21,
+                                    references=mock_ref(21),
+                                    merge_status='checking',
+                                    manager=Mock())
+    unchecked_mr.manager.get.return_value = MergeRequestMock(
+        title='Qux', iid=21, references=mock_ref(21))
+    waiting_mr = MergeRequestMock(title='Baz', iid=17,
+                                  references=mock_ref(17),
+                                  pipelines=Mock(side_effect=[
+                                      [dict(status='running')],
+                                      [dict(status='success')],
+                                  ]))
+    mock_project = Mock(project_id=1)
+    mock_project.get_mergerequests.return_value = [
+        MergeRequestMock(title='Foo', iid=3, references=mock_ref(3)),
+        waiting_mr,
+        MergeRequestMock(title='Bar', merge_status='cannot_be_merged'),
+        unchecked_mr,
+    ]
+    mock_project.bind_mergerequest.side_effect = lambda mr: mr
+
+    mr_manager = MergeRequestManager(
+        group_filter='',
+        project_filter='',
+        labels=[],
+        merge_style='automatic',
+    )
+    mr_manager.api = Mock()
+    group = Mock(id=5, full_path='mockedgroup')
+    subgroup = Mock(id=6, full_path='mockedgroup/sub')
+    group.mergerequests.list.return_value = [
+        MergeRequestMock(title='Other', project_id=99),
+    ]
+    mr_manager.listed_groups = {5: group, 6: subgroup}
+
+    with patch.object(MergeRequestManager, 'projects',
+                      return_value=[mock_project]) as mock_projects:
+        mr_manager.watch(interval=10, polls=2)
+
+    assert mock_projects.call_count == 1
+    assert mock_project.get_mergerequests.call_count == 1
+    assert mock_project.get_mergerequests.call_args[1][
+        'with_merge_status_recheck']
+    assert not mr_manager.api.mergerequests.list.called
+    assert not subgroup.mergerequests.list.called
+    assert group.mergerequests.list.call_count == 1
+    assert 'updated_after' in group.mergerequests.list.call_args[1]
+    assert group.mergerequests.list.call_args[1][
+        'with_merge_status_recheck']
+    assert unchecked_mr.manager.get.call_args == call(21)
+    assert mock_sleep.call_count == 2
+    assert call('Merging mockedgroup/mockedproject!3: Foo') \
+        in mock_print.mock_calls
+    assert call('Merging mockedgroup/mockedproject!17: Baz') \
+        in mock_print.mock_calls
+    assert call('Merging mockedgroup/mockedproject!21: Qux') \
+        in mock_print.mock_calls
+    assert call('3 MRs merged.') in mock_print.mock_calls
+
+
+@patch('builtins.print')
+@patch('concierge_cli.merging.sleep')
+def test_mergerequestmanager_watch_failures(mock_sleep, mock_print):
+    """
+    Does watch() go on after a failed merge and a failed poll?
+    """
+    closed_mr = MergeRequestMock(
+        title='Foo', iid=3, references=mock_ref(3),
+        merge=Mock(side_effect=GitlabMRClosedError('Method Not Allowed')))
+    other_mr = MergeRequestMock(title='Bar', iid=4, references=mock_ref(4),
+                                merge=Mock())
+    mock_project = Mock(project_id=1)
+    mock_project.get_mergerequests.return_value = [closed_mr, other_mr]
+
+    mr_manager = MergeRequestManager(
+        group_filter='',
+        project_filter='',
+        labels=[],
+        merge_style='automatic',
+    )
+    group = Mock(id=5, full_path='mockedgroup')
+    group.mergerequests.list.side_effect = RequestsConnectionError('reset')
+    mr_manager.listed_groups = {5: group}
+
+    with patch.object(MergeRequestManager, 'projects',
+                      return_value=[mock_project]):
+        mr_manager.watch(interval=10, polls=2)
+
+    assert other_mr.merge.called
+    assert mock_print.mock_calls == [
+        call('Watching merge requests every 10 seconds:'),
+        call('Merging mockedgroup/mockedproject!3: Foo'),
+        call('Failed merging mockedgroup/mockedproject!3: Foo'
+             ' ✗ Method Not Allowed'),
+        call('Merging mockedgroup/mockedproject!4: Bar'),
+        call('Failed polling merge requests ✗ reset'),
+        call('1 MRs merged.'),
+        call('1 MRs failed to merge.'),
+    ]
+
+
 @patch('concierge_cli.adapter.GroupMembership')
 def test_groupmanager_show(mock_membership):
     """
@@ -357,3 +596,344 @@ def test_groupmanager_set(mock_membership, mock_gitlabapi):
         # group_manager.set('none')
         # assert mock_manager_groups.called
         # assert mock_membership.set_membership.call_count == 3
+
+
+def test_groupmanager_set_concurrent(capsys):
+    """
+    Are memberships changed concurrently, reported in the order of the
+    groups along with failed lookups, and failures summarized instead of
+    aborting?
+    """
+    def mock_lookup(group_id, delay=0, error=None, lookup_error=None):
+        group = Mock(id=group_id, full_path=f"group{group_id}")
+        if lookup_error:
+            return group, None, lookup_error
+
+        group_user = Mock(group_id=group_id, full_path=f"group{group_id}")
+        group_user.change.side_effect = \
+            lambda permission_name: \
+            f"Group group{group_id}: Adding {permission_name}"
+
+        def set_membership(permission_name):
+            sleep(delay)
+            if error:
+                raise error
+
+        group_user.set_membership.side_effect = set_membership
+        return group, group_user, None
+
+    api = Mock()
+    api.users.list.return_value = [Mock(username='jane')]
+    with patch('concierge_cli.manager.Gitlab', return_value=api):
+        group_manager = GroupManager(group_filter='', username='jane',
+                                     uri=TEST_URI)
+
+    with patch.object(GroupManager, 'lookups', return_value=[
+            mock_lookup(1, delay=0.2),
+            mock_lookup(2, error=GitlabCreateError('denied')),
+            mock_lookup(3, lookup_error=GitlabGetError('boom', 500)),
+            mock_lookup(4, error=RequestsConnectionError('reset')),
+            mock_lookup(5)]):
+        group_manager.set('developer')
+
+    assert capsys.readouterr().out.splitlines() == [
+        'Group group1: Adding developer',
+        'Group group2: Adding developer',
+        'Group group2: Failed setting access level ✗ denied',
+        'Group group3: Failed looking up access level ✗ boom',
+        'Group group4: Adding developer',
+        'Group group4: Failed setting access level ✗ reset',
+        'Group group5: Adding developer',
+        '3 groups failed.',
+    ]
+
+
+def test_groupmanager_groups_lookup_failed(capsys):
+    """
+    Are groups whose access level can't be looked up reported and counted,
+    without aborting the run?
+    """
+    def mock_group(group_id, error=None):
+        group = Mock(id=group_id, full_path=f"group{group_id}")
+        group.members.get.return_value = Mock(access_level=30)
+        group.members.get.side_effect = error
+        return group
+
+    api = Mock()
+    api.users.list.return_value = [Mock(id=7, username='jane')]
+    with patch('concierge_cli.manager.Gitlab', return_value=api):
+        group_manager = GroupManager(group_filter='', username='jane',
+                                     uri=TEST_URI)
+
+    with patch.object(GroupManager, 'list_groups', return_value=[
+            mock_group(1),
+            mock_group(2, error=GitlabGetError('boom', 500)),
+            mock_group(3, error=RequestsConnectionError('reset')),
+            mock_group(4)]):
+        group_manager.show()
+
+    assert capsys.readouterr().out.splitlines() == [
+        "Group group1: jane has access level 'developer'",
+        'Group group2: Failed looking up access level ✗ boom',
+        'Group group3: Failed looking up access level ✗ reset',
+        "Group group4: jane has access level 'developer'",
+        '2 groups failed.',
+    ]
+
+
+def test_topicmanager_set_concurrent(capsys):
+    """
+    Are projects updated concurrently, each once, and reported in order?
+    """
+    def mock_project(project_id, delay=0):
+        project = Mock(project_id=project_id, topic_list=[])
+        project.name = f"puppet/module-{project_id}"
+        project.set_topics.side_effect = lambda topics: sleep(delay)
+        return project
+
+    projects = [mock_project(1, delay=0.2), mock_project(2), mock_project(3)]
+    topic_manager = TopicManager(group_filter='', project_filter='',
+                                 empty=True, uri=TEST_URI, writers=3)
+
+    with patch.object(TopicManager, 'projects',
+                      return_value=projects + [mock_project(2)]):
+        topic_manager.set(['Puppet'])
+
+    assert capsys.readouterr().out.splitlines() == [
+        f"Setting new topics on puppet/module-{project_id}: ['Puppet']"
+        for project_id in [1, 2, 3]]
+    assert projects[1].set_topics.call_count == 0
+
+
+@patch('builtins.print')
+@patch('concierge_cli.merging.sleep')
+def test_mergerequestmanager_merge_queued(mock_sleep, mock_print):
+    """
+    Are the remaining MRs of a queue rebased after a merge, and merged once
+    their pipeline for the rebased commit succeeded?
+    """
+    def mock_mr(iid, project_id, *versions):
+        """An MR, refreshed to each of a few versions in turn."""
+        merge_request = MergeRequestMock(
+            iid=iid, project_id=project_id, target_branch='main',
+            references=mock_ref(iid), title=f"MR {iid}", rebase=Mock(),
+            merge=Mock(), manager=Mock())
+        merge_request.manager.get.side_effect = [
+            MergeRequestMock(iid=iid, project_id=project_id,
+                             references=mock_ref(iid), title=f"MR {iid}",
+                             merge=merge_request.merge,
+                             manager=merge_request.manager,
+                             attributes=dict(attributes), **fields)
+            for attributes, fields in versions]
+        return merge_request
+
+    first = mock_mr(1, 1, ({}, {}))
+    second = mock_mr(2, 1, ({'rebase_in_progress': True}, {}),
+                     ({}, dict(sha='new', pipelines=Mock(return_value=[
+                         dict(status='success', sha='old')]))),
+                     ({}, dict(sha='new', pipelines=Mock(return_value=[
+                         dict(status='success', sha='new')]))))
+    other = mock_mr(3, 2, ({}, dict(merge_status='cannot_be_merged')))
+
+    mr_manager = MergeRequestManager(group_filter='', project_filter='',
+                                     labels=[], merge_style='automatic',
+                                     queue_timeout=60)
+    with patch.object(MergeRequestManager, 'merge_requests',
+                      return_value=[first, second, other]):
+        mr_manager.merge_all()
+
+    assert first.merge.call_count == 1
+    assert second.rebase.call_count == 1
+    assert second.merge.call_count == 1
+    assert not other.merge.called
+    assert mock_sleep.call_count == 2
+    assert call('Rebasing mockedgroup/mockedproject!2: MR 2') \
+        in mock_print.mock_calls
+    assert call('2 MRs merged.') in mock_print.mock_calls
+
+
+@patch('concierge_cli.merging.sleep')
+def test_mergerequestmanager_merge_queued_tagged(mock_sleep, capsys):
+    """
+    Is the output of merge queues tagged like the output of the instance
+    they belong to?
+    """
+    def mock_mr(iid, project_id):
+        merge_request = MergeRequestMock(
+            iid=iid, project_id=project_id, target_branch='main',
+            references=mock_ref(iid), title=f"MR {iid}", merge=Mock(),
+            manager=Mock(), attributes={})
+        merge_request.manager.get.return_value = merge_request
+        return merge_request
+
+    mr_manager = MergeRequestManager(group_filter='', project_filter='',
+                                     labels=[], merge_style='automatic',
+                                     queue_timeout=60)
+    with patch.object(MergeRequestManager, 'merge_requests',
+                      return_value=[mock_mr(iid, iid) for iid in range(8)]), \
+            tagged_stdout() as output:
+        output.tag('a')
+        mr_manager.merge_all()
+        output.tag(None)
+
+    lines = capsys.readouterr().out.splitlines()
+    assert len(lines) == 10
+    assert all(line.startswith('[a] ') for line in lines)
+    assert not mock_sleep.called
+
+
+def test_mergerequestmanager_filters():
+    """
+    Are MR filters passed on to the API, and the source branch prefix
+    applied to the MRs listed?
+    """
+    mock_project = Mock()
+    mock_project.get_mergerequests.return_value = [
+        MergeRequestMock(iid=1, source_branch='renovate/foo'),
+        MergeRequestMock(iid=2, source_branch='feature/bar'),
+    ]
+    mr_manager = MergeRequestManager(
+        group_filter='', project_filter='', labels=['deps'],
+        merge_style='no', source_branch_prefix='renovate/',
+        filters={'author_username': 'renovate-bot', 'wip': 'yes'})
+
+    with patch.object(MergeRequestManager, 'projects',
+                      return_value=[mock_project]):
+        merge_requests = mr_manager.merge_requests()
+
+    assert [merge_request.iid for merge_request in merge_requests] == [1]
+    assert mock_project.get_mergerequests.call_args == call(
+        labels=['deps'], author_username='renovate-bot', wip='yes',
+        with_merge_status_recheck=True)
+
+
+@patch('concierge_cli.merging.sleep')
+def test_mergerequestmanager_recheck(mock_sleep):
+    """
+    Are only MRs with an undetermined merge status fetched again, until
+    GitLab has determined it?
+    """
+    mock_manager = Mock()
+    mock_manager.get.side_effect = [
+        MergeRequestMock(iid=2, merge_status='checking',
+                         manager=mock_manager),
+        MergeRequestMock(iid=2, merge_status='can_be_merged'),
+    ]
+    determined = MergeRequestMock(iid=1, manager=Mock())
+    mr_manager = MergeRequestManager(group_filter='', project_filter='',
+                                     labels=[], merge_style='no')
+
+    merge_requests = mr_manager.recheck([
+        determined,
+        MergeRequestMock(iid=2, merge_status='unchecked',
+                         manager=mock_manager),
+    ])
+
+    assert merge_requests[0] is determined
+    assert merge_requests[1].merge_status == 'can_be_merged'
+    assert mock_manager.get.call_args_list == [call(2), call(2)]
+    assert mock_sleep.call_count == 2
+    assert not determined.manager.get.called
+
+
+def test_in_shard():
+    """
+    Does every ID belong to exactly one shard?
+    """
+    for item_id in range(100):
+        assert sum(in_shard(item_id, (index, 3))
+                   for index in range(1, 4)) == 1
+
+
+def test_topicmanager_shards(capsys):
+    """
+    Do merged outputs of all shards equal the output of a single run?
+    """
+    api = Mock()
+    api.groups.list.return_value = []
+    for group_id in range(10):
+        group = Mock(id=group_id)
+        group.projects.list.return_value = [Mock(id=group_id, attributes={
+            'path_with_namespace': f"group{group_id}/project",
+            'tag_list': [],
+        })]
+        api.groups.list.return_value.append(group)
+
+    def run(shard=None):
+        topic_manager = TopicManager(group_filter='', project_filter='',
+                                     empty=True, uri=TEST_URI, shard=shard)
+        topic_manager.api = api
+        with tagged_stdout():
+            topic_manager.show()
+        return capsys.readouterr().out
+
+    single_run = run().splitlines()
+    shard_runs = [io.StringIO(run((index, 3))) for index in range(1, 4)]
+
+    assert len(single_run) == 10
+    assert merge_shards(shard_runs) == single_run
+
+
+def mock_group(group_id, full_path):
+    """Fake group API object."""
+    return Mock(id=group_id, full_path=full_path,
+                attributes={'id': group_id, 'full_path': full_path})
+
+
+def test_topmost_groups():
+    """
+    Are groups nested in other groups found left out?
+    """
+    groups = [mock_group(1, 'customers'), mock_group(2, 'customers/acme'),
+              mock_group(3, 'internal/customers-legacy'),
+              mock_group(4, 'customers-archive')]
+
+    assert topmost_groups(groups) == [groups[0], groups[2], groups[3]]
+
+
+def test_groupmanager_subgroups():
+    """
+    Are the nested groups of the topmost groups found crawled, once?
+    """
+    api = Mock()
+    customers = mock_group(1, 'customers')
+    customers.descendant_groups.list.return_value = [
+        mock_group(3, 'customers/acme/prod'), mock_group(2, 'customers/acme'),
+    ]
+    api.groups.list.return_value = [customers, mock_group(2, 'customers/acme')]
+    api.users.list.return_value = [Mock(username='jane')]
+
+    with patch('concierge_cli.manager.Gitlab', return_value=api):
+        group_manager = GroupManager(group_filter='customers',
+                                     username='jane', uri=TEST_URI,
+                                     subgroups=True)
+        groups = list(group_manager.list_groups('customers'))
+
+    assert [group.full_path for group in groups] == \
+        ['customers', 'customers/acme', 'customers/acme/prod']
+    assert groups[1].manager is api.groups
+    customers.descendant_groups.list.assert_called_once_with(all=True)
+
+
+def test_topicmanager_subgroups():
+    """
+    Are projects of nested groups listed with their topmost group only?
+    """
+    api = Mock()
+    customers = mock_group(1, 'customers')
+    customers.projects.list.return_value = [Mock(id=11, attributes={
+        'path_with_namespace': 'customers/acme/website', 'tag_list': [],
+    })]
+    acme = mock_group(2, 'customers/acme')
+    api.groups.list.return_value = [customers, acme]
+
+    topic_manager = TopicManager(group_filter='customers', project_filter='',
+                                 empty=True, uri=TEST_URI, subgroups=True)
+    topic_manager.api = api
+
+    assert [str(project) for project in topic_manager.projects()] == \
+        ['customers/acme/website']
+    customers.projects.list.assert_called_once_with(
+        search='', all=True, simple=True, include_subgroups=True)
+    assert not acme.projects.list.called
+    assert not customers.descendant_groups.list.called
@@ -0,0 +1,82 @@
+"""
+Tests for concierge-cli's output helpers
+"""
+import io
+import sys
+
+from threading import Thread
+
+from concierge_cli.output import (
+    TaggedOutput,
+    merge_shards,
+    output_tag,
+    tag_output,
+    tagged_stdout,
+)
+
+
+def test_tagged_output():
+    """
+    Are lines of tagged threads prefixed, and others passed through?
+    """
+    stream = io.StringIO()
+    output = TaggedOutput(stream)
+
+    def worker():
+        output.tag('git.example.com')
+        output.write('first line\nsecond ')
+        output.write('line\nincomplete')
+        output.flush()
+
+    thread = Thread(target=worker)
+    thread.start()
+    thread.join()
+    output.write('untagged\n')
+
+    assert stream.getvalue() == (
+        '[git.example.com] first line\n'
+        '[git.example.com] second line\n'
+        '[git.example.com] incomplete'
+        'untagged\n'
+    )
+
+
+def test_tagged_stdout():
+    """
+    Is sys.stdout replaced temporarily only, and is the tag of the current
+    thread known?
+    """
+    original_stdout = sys.stdout
+
+    with tagged_stdout() as output:
+        assert sys.stdout is output
+        assert isinstance(output, TaggedOutput)
+        tag_output('git.example.com')
+        assert output_tag() == 'git.example.com'
+        tag_output(None)
+
+    assert sys.stdout is original_stdout
+    assert output_tag() is None
+
+
+def test_merge_shards():
+    """
+    Are tagged lines of several shards ordered by their tag, with the
+    leading lines taken once?
+    """
+    shard_1 = io.StringIO('Merging merge requests:\n'
+                          '[2] Merging foo!3: Foo\n'
+                          '[0] Merging bar!1: Bar\n'
+                          '1 MRs merged.\n')
+    shard_2 = io.StringIO('Merging merge requests:\n'
+                          '[1] Merging baz!7: Baz\n'
+                          'No MRs merged.\n')
+
+    assert merge_shards([shard_1, shard_2]) == [
+        'Merging merge requests:',
+        'Merging bar!1: Bar',
+        'Merging baz!7: Baz',
+        'Merging foo!3: Foo',
+        '1 MRs merged.',
+        'No MRs merged.',
+    ]
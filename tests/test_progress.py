@@ -0,0 +1,83 @@
+"""
+Tests for concierge-cli's progress display
+"""
+import pytest
+
+from io import StringIO
+from types import SimpleNamespace
+from unittest.mock import Mock, patch
+
+from gitlab.exceptions import GitlabUpdateError
+from requests import Session
+
+from concierge_cli.manager import TopicManager
+from concierge_cli.progress import Progress
+
+from conftest import mock_project
+
+
+def test_disabled():
+    """
+    Is nothing installed, counted or displayed without a stream?
+    """
+    api = SimpleNamespace(session=Session())
+    progress = Progress()
+    progress.install(api)
+    progress.scanned(1, 10)
+    with pytest.raises(GitlabUpdateError), progress.write():
+        raise GitlabUpdateError('boom')
+    progress.finish()
+
+    assert api.session.hooks['response'] == []
+    assert (progress.group_count, progress.failed_count) == (0, 0)
+
+
+def test_status():
+    """
+    Are counts, the request rate and the ETA displayed?
+    """
+    stream = StringIO()
+    progress = Progress(stream, interval=3600)
+    response = Mock(headers={'X-Total': '4'})
+    response.request.url = 'https://gitlab.example.com/api/v4/groups?page=1'
+
+    with patch('concierge_cli.progress.monotonic', return_value=0):
+        progress.reset()
+        progress.record(response)
+        progress.scanned(1, 3)
+        with progress.write():
+            pass
+        with pytest.raises(GitlabUpdateError), progress.write():
+            raise GitlabUpdateError('boom')
+    assert stream.getvalue() == ''
+
+    status = '1/4 groups, 3 projects scanned, 0.5 req/s, 1 written,' \
+        ' 1 failed, ETA 6s'
+    with patch('concierge_cli.progress.monotonic', return_value=2):
+        assert progress.status() == status
+        progress.finish()
+
+    assert stream.getvalue() == f"{status}\n"
+    assert progress.group_total is None
+
+
+def test_topicmanager_set_progress():
+    """
+    Are groups and projects scanned, and topics written, counted?
+    """
+    api = Mock()
+    group = Mock()
+    group.projects.list.return_value = [mock_project(11, 'apache'),
+                                        mock_project(12, 'nginx')]
+    api.groups.list.return_value = [group]
+    progress = Progress(StringIO(), interval=3600)
+
+    topic_manager = TopicManager(group_filter='', project_filter='',
+                                 empty=True, progress=progress,
+                                 uri='https://some.gitlab.host')
+    topic_manager.api = api
+    topic_manager.set(['Puppet'])
+
+    assert progress.status().startswith(
+        '1/1 groups, 2 projects scanned, ')
+    assert progress.status().endswith(', 2 written, 0 failed')
@@ -0,0 +1,76 @@
+"""
+Tests for concierge-cli's records of projects, topics, MRs and memberships
+"""
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+from concierge_cli.records import (
+    Membership, MergeRequestStatus, ProjectRecord, TopicSet, merge_state,
+)
+
+
+def test_project_record():
+    """
+    Is a project adapter turned into a record, displayed by its name?
+    """
+    project = SimpleNamespace(project_id=11, name='puppet/apache',
+                              topic_list=['Puppet'])
+
+    record = ProjectRecord.from_project(project)
+
+    assert record == (11, 'puppet/apache', ['Puppet'])
+    assert record.topics == ['Puppet']
+    assert str(record) == 'puppet/apache'
+
+
+def test_topic_set():
+    """
+    Are new and replaced topics displayed?
+    """
+    assert str(TopicSet(11, 'puppet/apache', [], ['Puppet'], None)) == \
+        "Setting new topics on puppet/apache: ['Puppet']"
+    assert str(TopicSet(11, 'puppet/apache', ['foo'], ['Puppet'], None)) \
+        == "Replacing topics on puppet/apache: ['foo'] -> ['Puppet']"
+
+
+def test_merge_request_status():
+    """
+    Is a merge request turned into a record with the status of its latest
+    pipeline, and its state determined?
+    """
+    merge_request = SimpleNamespace(
+        project_id=1, iid=3, references={'full': 'group/project!3'},
+        title='Update nginx', labels=['renovate'],
+        merge_status='can_be_merged',
+        pipelines=Mock(return_value=[{'status': 'running'},
+                                     {'status': 'success'}]))
+
+    status = MergeRequestStatus.from_merge_request(merge_request)
+
+    assert status.pipeline_status == 'running'
+    assert status.state == 'pending'
+    assert str(status) == '✓✗ group/project!3: Update nginx [renovate]'
+
+
+def test_merge_state():
+    """
+    Are the merge and pipeline statuses turned into a state?
+    """
+    assert merge_state('can_be_merged', 'success') == 'eligible'
+    assert merge_state('can_be_merged', 'pending') == 'pending'
+    assert merge_state('can_be_merged', 'failed') == 'failed'
+    assert merge_state('can_be_merged') == 'failed'
+    assert merge_state('checking') == 'unchecked'
+    assert merge_state('cannot_be_merged', 'success') == 'unmergeable'
+
+
+def test_membership():
+    """
+    Are access levels and non-membership displayed?
+    """
+    member = Membership(7, 'puppet', 42, 'my.user', 'developer')
+    outsider = member._replace(access_level=None)
+
+    assert member.is_member and not outsider.is_member
+    assert str(member) == "Group puppet: my.user has access level 'developer'"
+    assert str(outsider) == 'Group puppet: my.user is not a member.'
@@ -0,0 +1,115 @@
+"""
+Tests for concierge-cli's retry policy and circuit breaker
+"""
+import pytest
+
+from gitlab.exceptions import GitlabHttpError
+from requests.exceptions import ConnectTimeout, ReadTimeout
+from unittest.mock import Mock, patch
+
+from concierge_cli.retry import CircuitOpenError, RetryPolicy
+
+
+def http_error(code):
+    """A GitLab HTTP error with a status code."""
+    return GitlabHttpError(f"{code} error", response_code=code)
+
+
+@patch('concierge_cli.retry.sleep')
+def test_retry_reads(mock_sleep):
+    """
+    Are reads retried on transient errors, and retries counted?
+    """
+    api = Mock()
+    api.http_request.side_effect = [http_error(502), ReadTimeout(), 'ok']
+    policy = RetryPolicy(retries=3)
+    policy.install(api)
+
+    assert api.http_request('get', '/groups/42/members/7') == 'ok'
+    assert mock_sleep.call_count == 2
+    assert policy.retry_count == 2
+
+
+@patch('concierge_cli.retry.sleep')
+def test_retry_writes_only_when_safe(mock_sleep):
+    """
+    Are writes retried only when they were certainly not carried out?
+    """
+    request = Mock(side_effect=[http_error(503), ConnectTimeout(), 'ok'])
+    policy = RetryPolicy(retries=3)
+    assert policy.call('put', '/projects/1', request) == 'ok'
+
+    request = Mock(side_effect=[http_error(502), 'ok'])
+    with pytest.raises(GitlabHttpError):
+        policy.call('put', '/projects/1', request)
+    assert request.call_count == 1
+
+
+@patch('concierge_cli.retry.sleep')
+def test_no_retry_on_client_errors(mock_sleep):
+    """
+    Are errors like "404 Not found" passed on without retrying?
+    """
+    request = Mock(side_effect=http_error(404))
+    policy = RetryPolicy(retries=3)
+
+    with pytest.raises(GitlabHttpError):
+        policy.call('get', '/groups/1/members/2', request)
+    assert request.call_count == 1
+    assert not mock_sleep.called
+
+
+@patch('concierge_cli.retry.sleep')
+def test_circuit_breaker(mock_sleep):
+    """
+    Does an endpoint that keeps failing fail fast, while others still work?
+    """
+    request = Mock(side_effect=http_error(502))
+    policy = RetryPolicy(retries=1, failure_threshold=2)
+
+    for member_id in [1, 2]:
+        with pytest.raises(GitlabHttpError):
+            policy.call('get', f"/groups/7/members/{member_id}", request)
+    assert request.call_count == 4
+
+    with pytest.raises(CircuitOpenError):
+        policy.call('get', '/groups/8/members/3', request)
+    assert request.call_count == 4
+
+    assert policy.call('get', '/groups/7', Mock(return_value='ok')) == 'ok'
+
+
+def test_endpoint_names():
+    """
+    Are IDs and the API prefix of paginated URLs stripped from endpoints?
+    """
+    assert RetryPolicy.endpoint('get', '/groups/42/projects') == \
+        RetryPolicy.endpoint(
+            'get', 'https://gitlab.com/api/v4/groups/7/projects?page=2') == \
+        'GET /groups/:id/projects'
+
+
+def test_delay_jitter():
+    """
+    Is the wait randomized, and capped?
+    """
+    policy = RetryPolicy(backoff=1.0, max_backoff=5.0)
+
+    assert all(0 <= policy.delay(attempt) <= 5.0 for attempt in range(10))
+
+
+@patch('concierge_cli.retry.sleep')
+def test_report(mock_sleep, capsys):
+    """
+    Are retry statistics displayed on stderr?
+    """
+    policy = RetryPolicy()
+    policy.report()
+    assert capsys.readouterr().err == ''
+
+    policy.call('get', '/projects', Mock(side_effect=[ReadTimeout(), 'ok']))
+    policy.report()
+    assert capsys.readouterr().err.startswith('1 API calls retried, ')
+
+    policy.report()
+    assert capsys.readouterr().err == ''
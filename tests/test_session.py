@@ -0,0 +1,49 @@
+"""
+Tests for concierge-cli's session shared by several commands
+"""
+from unittest.mock import Mock, patch
+
+from concierge_cli.manager import ProjectManager, TopicManager
+from concierge_cli.session import Session
+
+TEST_URI = 'https://some.gitlab.host'
+
+
+def test_session_memoize_and_forget():
+    """
+    Is a listing fetched once, and fetched again after it was forgotten?
+    """
+    session = Session()
+    fetch = Mock(side_effect=[['a'], ['b']])
+
+    assert session.memoize(('projects', 1), fetch) == ['a']
+    assert session.memoize(('projects', 1), fetch) == ['a']
+    session.forget('groups')
+    assert session.memoize(('projects', 1), fetch) == ['a']
+    session.forget('projects')
+    assert session.memoize(('projects', 1), fetch) == ['b']
+
+
+@patch('concierge_cli.manager.Gitlab')
+def test_managers_share_session(mock_gitlab):
+    """
+    Do managers in a session connect once and list groups and projects
+    once, until topics are set?
+    """
+    session = Session()
+    api = mock_gitlab.return_value
+    group = Mock()
+    group.projects.list.return_value = []
+    api.groups.list.return_value = [group]
+
+    for _ in range(2):
+        list(ProjectManager(group_filter='', project_filter='', topic_list=[],
+                            uri=TEST_URI, session=session).projects())
+    topic_manager = TopicManager(group_filter='', project_filter='',
+                                 empty=True, uri=TEST_URI, session=session)
+    topic_manager.set(['Puppet'])
+    topic_manager.set(['Puppet'])
+
+    assert mock_gitlab.call_count == 1
+    assert api.groups.list.call_count == 1
+    assert group.projects.list.call_count == 3
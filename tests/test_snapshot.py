@@ -0,0 +1,199 @@
+"""
+Tests for concierge-cli's snapshot export and offline queries
+"""
+import pytest
+
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+from concierge_cli.constants import GITLAB_PERMISSIONS
+from concierge_cli.export import ExportManager
+from concierge_cli.manager import GroupManager, ProjectManager, TopicManager
+from concierge_cli.merging import MergeRequestManager
+
+from conftest import mock_project
+
+TEST_URI = 'https://some.gitlab.host'
+
+
+def mock_merge_request(project_id, iid, labels, pipeline_status):
+    """Fake merge request API object."""
+    return SimpleNamespace(
+        project_id=project_id, iid=iid, title=f"Update {iid}",
+        references=dict(full=f"puppet/apache!{iid}"), labels=labels,
+        merge_status='can_be_merged',
+        pipelines=Mock(return_value=[dict(status=pipeline_status)]),
+    )
+
+
+def mock_api():
+    """Fake GitLab API with a group, two projects and a merge request."""
+    projects = [
+        mock_project(11, 'apache', ['Puppet', 'Web']),
+        mock_project(12, 'legacy', ['Puppet']),
+    ]
+    group = SimpleNamespace(id=1, name='Puppet', path='puppet',
+                            full_path='puppet')
+    group.projects = Mock()
+    group.projects.list.side_effect = \
+        lambda **kwargs: projects[1:] if kwargs.get('archived') else projects
+    group.members = Mock()
+    group.members.list.return_value = [
+        SimpleNamespace(id=23, username='test.user',
+                        access_level=GITLAB_PERMISSIONS['developer']),
+    ]
+
+    api = Mock()
+    api.groups.list.return_value = [group]
+    api.projects.get.return_value.mergerequests.list.side_effect = [
+        [mock_merge_request(11, 3, ['renovate'], 'success')],
+        [],
+    ]
+    return api
+
+
+@pytest.fixture(name='snapshot')
+def fixture_snapshot(tmp_path):
+    """A snapshot file exported from the fake GitLab API."""
+    path = str(tmp_path / 'inventory.sqlite')
+
+    export_manager = ExportManager(group_filter='', project_filter='',
+                                   uri=TEST_URI)
+    export_manager.api = mock_api()
+    export_manager.export(path)
+
+    return path
+
+
+def test_export_summary(tmp_path, capsys):
+    """
+    Does export() report what was written?
+    """
+    path = str(tmp_path / 'inventory.sqlite')
+
+    export_manager = ExportManager(group_filter='', project_filter='',
+                                   uri=TEST_URI)
+    export_manager.api = mock_api()
+    export_manager.export(path)
+
+    assert capsys.readouterr().out == \
+        f"Exported 1 groups, 2 projects and 1 merge requests to {path}.\n"
+
+
+def test_snapshot_topics(snapshot):
+    """
+    Are projects and topics read from a snapshot, with search patterns?
+    """
+    topic_manager = TopicManager(group_filter='PUP', project_filter='ach',
+                                 empty=False, snapshot=snapshot)
+
+    assert [(project.name, project.topic_list)
+            for project in topic_manager.projects()] == [
+        ('puppet/apache', ['Puppet', 'Web']),
+    ]
+
+
+def test_snapshot_projects(snapshot):
+    """
+    Are archived projects ignored, and topics filtered?
+    """
+    project_manager = ProjectManager(group_filter='', project_filter='',
+                                     topic_list=['Puppet'],
+                                     snapshot=snapshot)
+
+    assert [project.name for project in project_manager.projects()] == [
+        'puppet/apache',
+    ]
+
+
+def test_snapshot_topic_index(snapshot):
+    """
+    Are projects carrying several topics looked up in the topic index?
+    """
+    project_manager = ProjectManager(group_filter='', project_filter='',
+                                     topic_list=['Web', 'Puppet'],
+                                     snapshot=snapshot)
+    group, = project_manager.list_groups('')
+
+    assert [project.id for project in project_manager.list_projects(
+        group, '', topic='Web,Puppet')] == [11]
+    assert [project.id for project in project_manager.list_projects(
+        group, '', topic='Web,Ansible')] == []
+
+
+def test_snapshot_topic_stats(snapshot, capsys):
+    """
+    Are topic statistics collected from all projects?
+    """
+    topic_manager = TopicManager(group_filter='', project_filter='',
+                                 empty=True, snapshot=snapshot)
+    topic_manager.show_stats()
+
+    assert capsys.readouterr().out.splitlines() == [
+        '2 projects, 0 without topics.',
+        'Topic frequency:',
+        '     2 Puppet',
+        '     1 Web',
+        'Topics used together:',
+        '     1 Puppet + Web',
+    ]
+
+
+def test_update_snapshot_topics(snapshot):
+    """
+    Are topics set on GitLab also updated in the snapshot, as GitLab
+    stores them?
+    """
+    topic_manager = TopicManager(group_filter='', project_filter='',
+                                 empty=False, update_snapshot=snapshot,
+                                 uri=TEST_URI)
+    topic_manager.api = mock_api()
+    topic_manager.set(['Ansible'])
+
+    project_manager = ProjectManager(group_filter='', project_filter='',
+                                     topic_list=['Ansible'],
+                                     snapshot=snapshot)
+    assert [(project.name, project.topic_list)
+            for project in project_manager.projects()] == [
+        ('puppet/apache', ['Ansible']),
+    ]
+
+    topic_manager.set([''])
+
+    empty_topics = TopicManager(group_filter='', project_filter='',
+                                empty=True, snapshot=snapshot)
+    assert [(project.name, project.topic_list)
+            for project in empty_topics.projects()] == [
+        ('puppet/apache', []),
+        ('puppet/legacy', []),
+    ]
+
+
+def test_snapshot_mrs(snapshot, capsys):
+    """
+    Are merge requests and their status read from a snapshot?
+    """
+    mr_manager = MergeRequestManager(group_filter='', project_filter='',
+                                     labels=['renovate'], merge_style='no',
+                                     snapshot=snapshot)
+    mr_manager.show()
+
+    assert capsys.readouterr().out.splitlines() == [
+        'Open merge requests matching labels: [renovate]',
+        '✓✓ puppet/apache!3: Update 3 [renovate]',
+    ]
+
+
+def test_snapshot_groups(snapshot):
+    """
+    Are group memberships read from a snapshot?
+    """
+    group_manager = GroupManager(group_filter='', username='test.user',
+                                 snapshot=snapshot)
+
+    assert [str(group_user) for group_user in group_manager.groups()] == [
+        "Group puppet: test.user has access level 'developer'",
+    ]
+
+    with pytest.raises(ValueError):
+        GroupManager(group_filter='', username='nobody', snapshot=snapshot)
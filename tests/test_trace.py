@@ -0,0 +1,95 @@
+"""
+Tests for concierge-cli's trace of commands, manager methods and requests
+"""
+import json
+
+from datetime import timedelta
+from unittest.mock import Mock
+
+from click.testing import CliRunner
+
+from concierge_cli.cli import concierge_cli
+from concierge_cli.trace import Tracer
+
+
+def spans(tracer, category):
+    """Names of the spans of a category, in the order they ended."""
+    return [event['name'] for event in tracer.events
+            if event.get('cat') == category]
+
+
+def test_traced_generator():
+    """
+    Does a generator's span last until its last item, and enclose the
+    spans of work done while enumerating?
+    """
+    tracer = Tracer()
+
+    def numbers():
+        with tracer.span('inner', 'manager'):
+            yield 1
+        yield 2
+
+    traced = tracer.traced(numbers, 'Manager.numbers')
+    assert list(traced()) == [1, 2]
+
+    inner, outer = [event for event in tracer.events if event['ph'] == 'X']
+    assert (inner['name'], outer['name']) == ('inner', 'Manager.numbers')
+    assert outer['ts'] <= inner['ts']
+    assert inner['ts'] + inner['dur'] <= outer['ts'] + outer['dur']
+    assert tracer.events[0]['ph'] == 'M'
+
+
+def test_record():
+    """
+    Is an HTTP request recorded with its endpoint, status and size, and
+    started by the time it took?
+    """
+    tracer = Tracer()
+    response = Mock(status_code=200, content=b'[]',
+                    elapsed=timedelta(milliseconds=20))
+    response.request.method = 'GET'
+    response.request.url = \
+        'https://gitlab.example.com/api/v4/groups?private_token=secret'
+    tracer.record(response)
+
+    event = tracer.events[-1]
+    assert event['name'] == 'GET /api/v4/groups'
+    assert event['args'] == {'status': 200, 'bytes': 2}
+    assert event['dur'] >= 20000
+
+
+def test_cli_trace(tmp_path):
+    """
+    Does --trace write the command, manager and request spans of a run?
+    """
+    cassette = tmp_path / 'groups.json'
+    cassette.write_text(json.dumps({'interactions': [
+        {'request': 'GET /api/v4/groups?per_page=100&search=',
+         'status': 200, 'headers': {'Content-Type': 'application/json'},
+         'body': json.dumps([{'id': 1, 'full_path': 'group1'}]),
+         'elapsed': 0.01},
+        {'request': 'GET /api/v4/groups/1/projects'
+                    '?per_page=100&search=&simple=True',
+         'status': 200, 'headers': {'Content-Type': 'application/json'},
+         'body': '[]', 'elapsed': 0.01},
+    ]}))
+    trace = tmp_path / 'trace.json'
+
+    result = CliRunner().invoke(concierge_cli, [
+        'gitlab', '--replay', str(cassette), '--trace', str(trace),
+        'topics'])
+
+    assert result.exit_code == 0
+    tracer = Tracer()
+    tracer.events = json.loads(trace.read_text())['traceEvents']
+    assert spans(tracer, 'command') == ['concierge-cli gitlab topics']
+    assert spans(tracer, 'manager') == [
+        'TopicManager.list_groups',
+        'TopicManager.list_projects',
+        'TopicManager.projects',
+    ]
+    assert spans(tracer, 'http') == [
+        'GET /api/v4/groups',
+        'GET /api/v4/groups/1/projects',
+    ]
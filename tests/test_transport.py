@@ -0,0 +1,71 @@
+"""
+Tests for concierge-cli's HTTP transport settings and statistics
+"""
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+from requests import Session
+
+from concierge_cli.transport import Transport
+
+
+def mock_response(size, wire_size, encoding=None):
+    """Fake response of ``size`` bytes, ``wire_size`` bytes on the wire."""
+    headers = {'Content-Encoding': encoding} if encoding else {}
+    return Mock(content=b'x' * size, headers=headers,
+                raw=Mock(tell=Mock(return_value=wire_size)))
+
+
+def test_install():
+    """
+    Are pool size, compression, keep-alive and timeouts applied?
+    """
+    api = SimpleNamespace(session=Session(), timeout=None)
+    transport = Transport(keep_alive=False, connect_timeout=5.0,
+                          read_timeout=30.0)
+    transport.install(api, workers=16)
+
+    adapter = api.session.get_adapter('https://gitlab.example.com/api/v4')
+    assert adapter is transport.adapter
+    assert adapter.poolmanager.connection_pool_kw['maxsize'] == 16
+    assert adapter.poolmanager.connection_pool_kw['block'] is True
+    assert api.session.headers['Accept-Encoding'] == 'gzip, deflate'
+    assert api.session.headers['Connection'] == 'close'
+    assert api.timeout == (5.0, 30.0)
+    assert transport.record in api.session.hooks['response']
+
+
+def test_install_no_compression():
+    """
+    Are uncompressed responses asked for, and timeouts left alone?
+    """
+    api = SimpleNamespace(session=Session(), timeout=None)
+    Transport(pool_size=4, compression=False).install(api, workers=16)
+
+    adapter = api.session.get_adapter('https://gitlab.example.com/api/v4')
+    assert adapter.poolmanager.connection_pool_kw['maxsize'] == 4
+    assert api.session.headers['Accept-Encoding'] == 'identity'
+    assert api.session.headers['Connection'] == 'keep-alive'
+    assert api.timeout is None
+
+
+def test_report(capsys):
+    """
+    Are responses counted, and is missing compression pointed out?
+    """
+    transport = Transport()
+    transport.report()
+    assert capsys.readouterr().err == ''
+
+    transport.record(mock_response(4096, 1024, 'gzip'))
+    transport.record(mock_response(1024, 1024))
+    transport.record(mock_response(1024, 1024), stream=True)
+    transport.report()
+    assert capsys.readouterr().err == (
+        '2 responses over 0 new connections, 1 compressed:'
+        ' 2.0 KiB received, 5.0 KiB decoded.\n')
+
+    transport.record(mock_response(1024, 1024))
+    transport.report()
+    assert 'Warning: No response came back compressed.' in \
+        capsys.readouterr().err
@@ -0,0 +1,161 @@
+"""
+Tests for concierge-cli's receiver of GitLab webhook events
+"""
+from threading import Thread
+from unittest.mock import Mock, call, patch
+
+import requests
+
+from gitlab.exceptions import GitlabMRClosedError
+
+from concierge_cli.merging import MergeRequestManager
+from concierge_cli.webhook import WebhookServer, parse_event
+
+MR_UPDATED = {
+    'object_kind': 'merge_request',
+    'project': {'id': 1},
+    'object_attributes': {'iid': 3, 'state': 'opened', 'action': 'update'},
+}
+MR_MERGED = {
+    'object_kind': 'merge_request',
+    'project': {'id': 1},
+    'object_attributes': {'iid': 4, 'state': 'merged', 'action': 'merge'},
+}
+MR_PIPELINE_SUCCEEDED = {
+    'object_kind': 'pipeline',
+    'project': {'id': 1},
+    'object_attributes': {'ref': 'feature', 'status': 'success'},
+    'merge_request': {'iid': 17},
+}
+BRANCH_PIPELINE_SUCCEEDED = {
+    'object_kind': 'pipeline',
+    'project': {'id': 2},
+    'object_attributes': {'ref': 'feature', 'status': 'success'},
+    'merge_request': None,
+}
+PIPELINE_FAILED = {
+    'object_kind': 'pipeline',
+    'project': {'id': 1},
+    'object_attributes': {'ref': 'feature', 'status': 'failed'},
+}
+
+
+def post_events(port, payloads, token='s3cret'):
+    """Stand-in for GitLab, posting recorded webhook payloads."""
+    return [requests.post(f"http://127.0.0.1:{port}/", json=payload,
+                          headers={'X-Gitlab-Token': token}, timeout=5)
+            for payload in payloads]
+
+
+class MergeRequestMock:
+    """Fake merge request API object."""
+    labels = []
+    merge_status = 'can_be_merged'
+    pipelines = Mock(return_value=[dict(status='success')])
+    title = 'My mocked merge request'
+
+    def __init__(self, iid):
+        self.iid = iid
+        self.references = dict(full=f"mockedgroup/mockedproject!{iid}")
+
+    def merge(self, **_):
+        pass
+
+
+def test_parse_event():
+    """
+    Are events of open MRs and succeeded pipelines turned into MR filters?
+    """
+    assert parse_event(MR_UPDATED) == (1, {'iids': [3]})
+    assert parse_event(MR_PIPELINE_SUCCEEDED) == (1, {'iids': [17]})
+    assert parse_event(BRANCH_PIPELINE_SUCCEEDED) == \
+        (2, {'source_branch': 'feature'})
+    assert parse_event(MR_MERGED) is None
+    assert parse_event(PIPELINE_FAILED) is None
+    assert parse_event({'object_kind': 'push'}) is None
+
+
+def test_server():
+    """
+    Are events with a wrong token or invalid payload refused, and only
+    the ones of interest queued?
+    """
+    with WebhookServer(0, secret='s3cret') as server:
+        responses = post_events(server.port, [MR_UPDATED, PIPELINE_FAILED])
+        wrong_token, = post_events(server.port, [MR_UPDATED], token='x')
+        invalid = requests.post(f"http://127.0.0.1:{server.port}/",
+                                data='[1]', timeout=5,
+                                headers={'X-Gitlab-Token': 's3cret'})
+
+        assert [response.status_code for response in responses] == \
+            [200, 200]
+        assert wrong_token.status_code == 401
+        assert invalid.status_code == 400
+        assert list(server.events(timeout=0.1)) == [(1, {'iids': [3]})]
+
+
+@patch('builtins.print')
+def test_mergerequestmanager_listen(mock_print):
+    """
+    Are the MRs affected by events of projects in scope checked and merged,
+    with the label filters applied?
+    """
+    class GitLabStandIn(WebhookServer):
+        """A webhook server, receiving recorded events once started."""
+
+        def __enter__(self):
+            server = super().__enter__()
+            Thread(target=post_events, args=(server.port, [
+                MR_UPDATED, MR_MERGED, BRANCH_PIPELINE_SUCCEEDED,
+                MR_PIPELINE_SUCCEEDED,
+            ])).start()
+            return server
+
+    mock_project = Mock(project_id=1)
+    mock_project.get_mergerequests.side_effect = \
+        lambda iids, **_: [MergeRequestMock(iid) for iid in iids]
+
+    mr_manager = MergeRequestManager(group_filter='', project_filter='',
+                                     labels=['bot'], merge_style='automatic')
+
+    with patch.object(MergeRequestManager, 'projects',
+                      return_value=[mock_project]), \
+            patch('concierge_cli.merging.WebhookServer', GitLabStandIn):
+        mr_manager.listen(0, secret='s3cret', limit=3)
+
+    assert mock_project.get_mergerequests.call_args_list == [
+        call(labels=['bot'], with_merge_status_recheck=True, iids=[3]),
+        call(labels=['bot'], with_merge_status_recheck=True, iids=[17]),
+    ]
+    assert call('Merging mockedgroup/mockedproject!3: My mocked merge'
+                ' request') in mock_print.mock_calls
+    assert call('2 MRs merged.') in mock_print.mock_calls
+
+
+@patch('builtins.print')
+def test_mergerequestmanager_merge_on_event_failures(mock_print):
+    """
+    Do a failed merge and a failed listing leave the listener running?
+    """
+    closed_mr = MergeRequestMock(3)
+    closed_mr.merge = Mock(side_effect=GitlabMRClosedError('Not Allowed'))
+    mock_project = Mock(project_id=1)
+    mock_project.name = 'mockedgroup/mockedproject'
+    mock_project.get_mergerequests.side_effect = [
+        [closed_mr, MergeRequestMock(4)],
+        requests.ConnectionError('reset'),
+    ]
+
+    mr_manager = MergeRequestManager(group_filter='', project_filter='',
+                                     labels=[], merge_style='automatic')
+    mr_manager.merge_on_event(mock_project, {'iids': [3, 4]})
+    mr_manager.merge_on_event(mock_project, {'iids': [3]})
+
+    assert mock_print.mock_calls == [
+        call('Merging mockedgroup/mockedproject!3: My mocked merge request'),
+        call('Failed merging mockedgroup/mockedproject!3: My mocked merge'
+             ' request ✗ Not Allowed'),
+        call('Merging mockedgroup/mockedproject!4: My mocked merge request'),
+        call('Failed listing merge requests of mockedgroup/mockedproject ✗'
+             ' reset'),
+    ]